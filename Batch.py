@@ -0,0 +1,269 @@
+""" Python script that contains BatchSolver and BatchResult class definitions.
+
+BatchSolver class solves many (start, target) queries against the same Engine in one call.
+Queries are grouped by target and every group is answered by a single search outwards from the
+target, so queries that share a target share all of their search work. The search state lives
+in scratch arrays that are allocated once and reused by every search.
+
+BatchResult class holds the answers in compact arrays: one array of path costs, and one flat
+array of cell indices that holds every path back to back, with offsets marking where each
+path starts.
+"""
+
+from array import array
+import MinPriorityQueue
+
+
+class BatchResult:
+    """ Compact result of a batch of path queries.
+
+    The path of query i is cells[offsets[i]:offsets[i + 1]], listed from start to target.
+    Queries without a path have a cost of BatchResult.NO_PATH and an empty path.
+
+    Attributes:
+        costs: array('I') of path costs, one per query
+        offsets: array('I') of offsets into cells, one more than the number of queries
+        cells: array('I') of the cells of every path, back to back
+
+    Constants:
+        NO_PATH: the cost of queries that have no path
+    """
+
+    NO_PATH = 0xFFFFFFFF
+
+    def __init__(self, costs, offsets, cells):
+        """ Initializes an instance of the BatchResult class. """
+
+        self.__costs = costs
+        self.__offsets = offsets
+        self.__cells = cells
+
+    def __len__(self):
+        """ Returns the number of queries in the batch. """
+
+        return len(self.__costs)
+
+    def get_costs(self):
+        """ Gets the array of path costs. """
+
+        return self.__costs
+
+    def get_offsets(self):
+        """ Gets the array of path offsets into the flat cell array. """
+
+        return self.__offsets
+
+    def get_cells(self):
+        """ Gets the flat array of path cells. """
+
+        return self.__cells
+
+    def get_cost(self, i):
+        """ Gets the path cost of query i, or None if it has no path. """
+
+        cost = self.__costs[i]
+        if cost == BatchResult.NO_PATH:
+            return None
+        return cost
+
+    def get_path(self, i):
+        """ Gets the path of query i as a list of cell indices, or None if it has no path. """
+
+        if self.__costs[i] == BatchResult.NO_PATH:
+            return None
+        return self.__cells[self.__offsets[i]:self.__offsets[i + 1]].tolist()
+
+
+class BatchSolver:
+    """ Solves batches of path queries with shared, reusable search state.
+
+    Every search runs from a target towards all the starts that share it, and stops as soon
+    as all of them have been reached. Movement costs are symmetric, so following the parent
+    pointers from a start leads along a cheapest path to the target. With few starts, the
+    search is guided by the octile distance to the nearest start (A*); with many starts, the
+    heuristic costs more than it saves and plain Dijkstra is used.
+
+    Scratch arrays are stamped with the number of the search that last wrote them, so they
+    never need to be cleared between searches.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        costs: array('I') scratch array of path costs from the target
+        parents: array('I') scratch array of the next cell towards the target
+        stamps: array('I') scratch array of the search that last reached each cell
+        closed: array('I') scratch array of the search that last expanded each cell
+        generation: the number of the current search
+
+    Constants:
+        MAX_GUIDED_STARTS: the largest number of starts for which A* guidance is used
+    """
+
+    MAX_GUIDED_STARTS = 4
+
+    def __init__(self, engine):
+        """ Initializes an instance of the BatchSolver class.
+
+        Args:
+            engine: the Engine object that describes the grid
+        """
+
+        size = engine.get_columns() * engine.get_rows()
+        self.__engine = engine
+        self.__costs = array('I', bytes(4 * size))
+        self.__parents = array('I', bytes(4 * size))
+        self.__stamps = array('I', bytes(4 * size))
+        self.__closed = array('I', bytes(4 * size))
+        self.__generation = 0
+        self.__stats = {}
+
+    def get_stats(self):
+        """ Gets the counters recorded during the most recent batch. """
+
+        return self.__stats
+
+    def solve_many(self, pairs):
+        """ Solves a batch of (start, target) queries.
+
+        Args:
+            pairs: iterable of (start index, target index) tuples
+
+        Returns:
+            The BatchResult holding the answers in the order of pairs
+        """
+
+        pairs = list(pairs)
+        self.__stats = {'queries': len(pairs), 'searches': 0, 'expanded': 0}
+
+        # Group the queries by target
+        groups = {}
+        for i, (start, target) in enumerate(pairs):
+            groups.setdefault(target, []).append(i)
+
+        costs = array('I', [BatchResult.NO_PATH]) * len(pairs)
+        found_cells = array('I')
+        found_offsets = array('I', [0]) * len(pairs)
+        found_lengths = array('I', [0]) * len(pairs)
+
+        for target, queries in groups.items():
+            starts = {pairs[i][0] for i in queries}
+            self.search(target, starts)
+
+            for i in queries:
+                start = pairs[i][0]
+                if self.get_search_cost(start) is None:
+                    continue
+                costs[i] = self.__costs[start]
+                found_offsets[i] = len(found_cells)
+
+                current = start
+                found_cells.append(current)
+                while current != target:
+                    current = self.__parents[current]
+                    found_cells.append(current)
+                found_lengths[i] = len(found_cells) - found_offsets[i]
+
+        # Lay the paths out in query order
+        offsets = array('I', [0]) * (len(pairs) + 1)
+        cells = array('I')
+        for i in range(len(pairs)):
+            offsets[i] = len(cells)
+            cells.extend(found_cells[found_offsets[i]:found_offsets[i] + found_lengths[i]])
+        offsets[len(pairs)] = len(cells)
+
+        return BatchResult(costs, offsets, cells)
+
+    def solve_costs(self, source, targets):
+        """ Finds the path costs from one cell to many cells with a single search.
+
+        Only the costs are read from the search, no paths are built.
+
+        Args:
+            source: the index of the source cell
+            targets: iterable of target cell indices
+
+        Returns:
+            List of the path cost to every target, or BatchResult.NO_PATH if it cannot be
+            reached, in the order of targets
+        """
+
+        targets = list(targets)
+        self.__stats = {'queries': len(targets), 'searches': 0, 'expanded': 0}
+
+        # Movement costs are symmetric, so the source can be the root of the search
+        self.search(source, set(targets))
+
+        costs = []
+        for target in targets:
+            cost = self.get_search_cost(target)
+            costs.append(BatchResult.NO_PATH if cost is None else cost)
+        return costs
+
+    def get_search_cost(self, index):
+        """ Gets the path cost between a cell and the target of the most recent search.
+
+        Returns:
+            The path cost, or None if the search did not expand the cell
+        """
+
+        if self.__stamps[index] != self.__generation:
+            return None
+        if self.__closed[index] != self.__generation:
+            return None
+        return self.__costs[index]
+
+    def search(self, target, starts):
+        """ Searches outwards from a target until every start has been expanded.
+
+        Starts that are obstacles or cannot reach the target are left unexpanded. The results
+        are left in the scratch arrays for the current generation.
+
+        Args:
+            target: the index of the target cell
+            starts: set of the indices of the start cells
+        """
+
+        self.__generation += 1
+        self.__stats['searches'] += 1
+        generation = self.__generation
+        engine = self.__engine
+
+        if not engine.is_walkable(target):
+            return
+
+        remaining = {start for start in starts if engine.is_walkable(start)}
+        if len(remaining) <= BatchSolver.MAX_GUIDED_STARTS:
+            guides = tuple(remaining)
+        else:
+            guides = ()
+
+        def heuristic(index):
+            return min((engine.get_h_cost(index, guide) for guide in guides), default=0)
+
+        opened = MinPriorityQueue.MinPriorityQueue()
+        self.__costs[target] = 0
+        self.__stamps[target] = generation
+        opened.insert(heuristic(target), target)
+
+        while remaining:
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                return
+
+            self.__closed[current] = generation
+            self.__stats['expanded'] += 1
+            remaining.discard(current)
+
+            for adj, cost in engine.get_neighbours(current):
+                if self.__closed[adj] == generation:
+                    continue
+                g_cost = self.__costs[current] + cost
+                if self.__stamps[adj] != generation:
+                    self.__stamps[adj] = generation
+                    self.__costs[adj] = g_cost
+                    self.__parents[adj] = current
+                    opened.insert(g_cost + heuristic(adj), adj)
+                elif g_cost < self.__costs[adj]:
+                    self.__costs[adj] = g_cost
+                    self.__parents[adj] = current
+                    opened.decrease_key(adj, g_cost + heuristic(adj))
@@ -0,0 +1,954 @@
+""" Script that benchmarks the headless pathfinding engines.
+
+Every benchmark runs on randomly generated grids so that results can be reproduced with the
+same seed. Run a single benchmark with, for example:
+
+    python Benchmark.py cooperative --agents 200
+"""
+
+import argparse
+import asyncio
+from collections import deque
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from Engine import Engine
+from Cooperative import CooperativePlanner
+from Landmarks import Landmarks
+from ParallelSolver import ParallelSolver
+import MapIO
+from PrecomputeCache import PrecomputeCache
+from IDAStar import IDAStar
+from DistanceMatrix import DistanceMatrix
+from FlowField import FlowField
+from Isochrone import Isochrone
+from ContractionHierarchy import ContractionHierarchy
+from MovingTargetSearch import MovingTargetSearch
+from Bitboard import Bitboard
+from GoalBounding import GoalBounding
+from Client import PathClient
+from SubgoalGraph import SubgoalGraph
+from Search import Search
+from MemoryProfiler import MemoryProfiler
+from Percentiles import get_percentiles
+
+
+def make_random_engine(columns, rows, density, seed):
+    """ Creates an Engine over a grid with randomly placed obstacles.
+
+    Args:
+        columns: number of columns in the grid
+        rows: number of rows in the grid
+        density: fraction of cells that are obstacles
+        seed: seed of the random number generator
+
+    Returns:
+        The Engine object
+    """
+
+    rng = random.Random(seed)
+    walkable = bytearray(0 if rng.random() < density else 1 for _ in range(columns * rows))
+    return Engine(walkable, columns, rows)
+
+
+def make_walls_engine(columns, rows, walls, seed):
+    """ Creates an Engine over a grid crossed by long horizontal and vertical walls.
+
+    Every wall spans half of the grid, so the walls form long detours without cutting the grid
+    into many separate regions.
+
+    Args:
+        columns: number of columns in the grid
+        rows: number of rows in the grid
+        walls: the number of walls
+        seed: seed of the random number generator
+
+    Returns:
+        The Engine object
+    """
+
+    rng = random.Random(seed)
+    walkable = bytearray([1]) * (columns * rows)
+    for _ in range(walls):
+        if rng.random() < 0.5:
+            row = rng.randrange(1, rows - 1)
+            first = rng.randrange(columns // 2)
+            for col in range(first, first + columns // 2):
+                walkable[row * columns + col] = 0
+        else:
+            col = rng.randrange(1, columns - 1)
+            first = rng.randrange(rows // 2)
+            for row in range(first, first + rows // 2):
+                walkable[row * columns + col] = 0
+    return Engine(walkable, columns, rows)
+
+
+def random_pairs(engine, count, seed, distinct=False):
+    """ Picks random (start, target) pairs of walkable cells.
+
+    Args:
+        engine: the Engine object to pick cells from
+        count: the number of pairs
+        seed: seed of the random number generator
+        distinct: bool that determines if no cell may be used twice
+
+    Returns:
+        List of (start index, target index) tuples
+    """
+
+    rng = random.Random(seed)
+    cells = [i for i in range(engine.get_columns() * engine.get_rows()) if engine.is_walkable(i)]
+    if distinct:
+        picked = rng.sample(cells, 2 * count)
+        return list(zip(picked[:count], picked[count:]))
+    return [(rng.choice(cells), rng.choice(cells)) for _ in range(count)]
+
+
+def print_row(*columns):
+    """ Prints a row of the benchmark output table. """
+
+    print(''.join(str(column).ljust(22) for column in columns))
+
+
+def benchmark_cooperative(args):
+    """ Measures how many agents per second Cooperative A* and WHCA* can plan. """
+
+    engine = make_random_engine(args.size, args.size, args.density, args.seed)
+    pairs = random_pairs(engine, args.agents, args.seed, distinct=True)
+
+    print_row('mode', 'agents', 'seconds', 'agents/sec', 'failed')
+
+    planner = CooperativePlanner(engine)
+    begin = time.perf_counter()
+    paths = planner.plan(pairs)
+    elapsed = time.perf_counter() - begin
+    failed = sum(path is None for path in paths)
+    print_row('CA*', len(pairs), '%.3f' % elapsed, '%.1f' % (len(pairs) / elapsed), failed)
+
+    planner = CooperativePlanner(engine, args.window)
+    planner.start(pairs)
+    begin = time.perf_counter()
+    ticks = 0
+    while not planner.is_finished() and ticks < args.ticks:
+        planner.tick()
+        ticks += 1
+    elapsed = time.perf_counter() - begin
+    planned = planner.get_stats()['planned']
+    print_row('WHCA* (w=%d)' % args.window, len(pairs), '%.3f' % elapsed,
+              '%.1f' % (planned / elapsed), planner.get_stats()['failed'])
+    print('WHCA* ran %d ticks, %.2f ms per tick' % (ticks, 1000 * elapsed / max(ticks, 1)))
+
+
+def benchmark_alt(args):
+    """ Compares A* with the octile heuristic against A* with ALT landmark heuristics. """
+
+    engine = make_walls_engine(args.size, args.size, args.walls, args.seed)
+    pairs = random_pairs(engine, args.queries, args.seed)
+
+    def run_queries(heuristic):
+        costs, expanded = [], 0
+        begin = time.perf_counter()
+        for start, target in pairs:
+            path = engine.find_path(start, target, heuristic)
+            costs.append(None if path is None else engine.get_path_cost(path))
+            expanded += engine.get_stats()['expanded']
+        return costs, expanded, time.perf_counter() - begin
+
+    print_row('heuristic', 'precompute sec', 'expanded/query', 'ms/query')
+    expected, expanded, elapsed = run_queries(None)
+    print_row('octile', '-', expanded // len(pairs), '%.2f' % (1000 * elapsed / len(pairs)))
+
+    for strategy in Landmarks.FARTHEST, Landmarks.AVOID:
+        begin = time.perf_counter()
+        landmarks = Landmarks(engine, args.landmarks, strategy, args.seed)
+        precompute = time.perf_counter() - begin
+
+        costs, expanded, elapsed = run_queries(landmarks.get_h_cost)
+        assert costs == expected, 'ALT found a path of a different cost'
+        print_row('ALT %s (k=%d)' % (strategy, args.landmarks), '%.3f' % precompute,
+                  expanded // len(pairs), '%.2f' % (1000 * elapsed / len(pairs)))
+
+
+def benchmark_batch(args):
+    """ Compares one find_path call per query against a single solve_many call. """
+
+    engine = make_random_engine(args.size, args.size, args.density, args.seed)
+    rng = random.Random(args.seed)
+    targets = [target for _, target in random_pairs(engine, args.targets, args.seed)]
+    pairs = [(start, rng.choice(targets))
+             for start, _ in random_pairs(engine, args.queries, args.seed + 1)]
+
+    print_row('method', 'queries', 'seconds', 'queries/sec')
+
+    begin = time.perf_counter()
+    expected = []
+    for start, target in pairs:
+        path = engine.find_path(start, target)
+        expected.append(None if path is None else engine.get_path_cost(path))
+    elapsed = time.perf_counter() - begin
+    print_row('find_path', len(pairs), '%.3f' % elapsed, '%.1f' % (len(pairs) / elapsed))
+
+    begin = time.perf_counter()
+    result = engine.solve_many(pairs)
+    elapsed = time.perf_counter() - begin
+    assert [result.get_cost(i) for i in range(len(result))] == expected
+    print_row('solve_many', len(pairs), '%.3f' % elapsed, '%.1f' % (len(pairs) / elapsed))
+    print('%d searches, %d cells in the flat path array'
+          % (engine.get_stats()['searches'], len(result.get_cells())))
+
+
+def benchmark_parallel(args):
+    """ Measures how queries per second scale with the number of worker processes. """
+
+    engine = make_random_engine(args.size, args.size, args.density, args.seed)
+    pairs = random_pairs(engine, args.queries, args.seed)
+
+    print_row('processes', 'queries', 'seconds', 'queries/sec', 'speedup')
+
+    begin = time.perf_counter()
+    expected = engine.solve_many(pairs).get_costs()
+    baseline = time.perf_counter() - begin
+    print_row('serial', len(pairs), '%.3f' % baseline, '%.1f' % (len(pairs) / baseline), '1.00')
+
+    processes = 1
+    while processes <= args.max_processes:
+        with ParallelSolver(engine.get_walkable(), args.size, args.size, processes) as solver:
+            begin = time.perf_counter()
+            costs, _ = solver.solve_many(pairs, args.chunk_size)
+            elapsed = time.perf_counter() - begin
+        assert costs == expected, 'workers found paths of a different cost'
+        print_row(processes, len(pairs), '%.3f' % elapsed, '%.1f' % (len(pairs) / elapsed),
+                  '%.2f' % (baseline / elapsed))
+        processes *= 2
+
+
+def benchmark_load(args):
+    """ Compares the time to load a map and answer a first query for every file format. """
+
+    engine = make_walls_engine(args.size, args.size, args.walls, args.seed)
+
+    # A short query near the middle, so the first query only touches a few pages of the map
+    middle = engine.get_index(args.size // 2, args.size // 2)
+    start = next(i for i in range(middle, middle + args.size) if engine.is_walkable(i))
+    target = next(i for i in range(start + 32 * args.size, start + 33 * args.size)
+                  if engine.is_walkable(i))
+
+    print_row('format', 'bytes', 'load ms', 'first query ms')
+    with tempfile.TemporaryDirectory() as directory:
+        formats = [('.map text', 'grid.map', MapIO.write_map)]
+        formats.append(('binary bytes', 'grid.bin', MapIO.write_grid))
+        formats.append(('binary bits', 'grid.bits',
+                        lambda path, engine: MapIO.write_grid(path, engine, packed=True)))
+
+        for name, filename, write in formats:
+            path = os.path.join(directory, filename)
+            write(path, engine)
+
+            begin = time.perf_counter()
+            if filename.endswith('.map'):
+                loaded, grid_file = MapIO.read_map(path), None
+            else:
+                grid_file = MapIO.open_grid(path)
+                loaded = grid_file.get_engine()
+            load = time.perf_counter() - begin
+
+            begin = time.perf_counter()
+            loaded.find_path(start, target)
+            query = time.perf_counter() - begin
+            if grid_file is not None:
+                grid_file.close()
+
+            print_row(name, os.path.getsize(path), '%.2f' % (1000 * load), '%.2f' % (1000 * query))
+
+
+def benchmark_cache(args):
+    """ Compares building landmark tables against loading them from the precompute cache. """
+
+    engine = make_walls_engine(args.size, args.size, args.walls, args.seed)
+
+    print_row('run', 'seconds', 'hits', 'builds')
+    with tempfile.TemporaryDirectory() as directory:
+        for run in 'cold', 'warm':
+            with PrecomputeCache(directory) as cache:
+                begin = time.perf_counter()
+                key = cache.get_key(engine)
+                Landmarks.cached(engine, cache, args.landmarks, seed=args.seed, key=key)
+                elapsed = time.perf_counter() - begin
+                print_row(run, '%.4f' % elapsed, cache.get_stats()['hits'],
+                          cache.get_stats()['builds'])
+        print('%d bytes in the cache' % PrecomputeCache(directory).get_size())
+
+
+def benchmark_bounded(args):
+    """ Compares the peak memory and speed of A* against memory-bounded IDA*. """
+
+    engine = make_random_engine(args.size, args.size, args.density, args.seed)
+    pairs = random_pairs(engine, args.queries, args.seed)
+
+    def run_queries(create):
+        # The engine is created while tracing, so preallocated tables are counted
+        costs = []
+        tracemalloc.start()
+        begin = time.perf_counter()
+        find_path = create()
+        for start, target in pairs:
+            path = find_path(start, target)
+            costs.append(None if path is None else engine.get_path_cost(path))
+        elapsed = time.perf_counter() - begin
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return costs, elapsed, peak
+
+    print_row('engine', 'ms/query', 'traced peak bytes', 'estimated bytes')
+    expected, elapsed, peak = run_queries(lambda: engine.find_path)
+    print_row('A*', '%.2f' % (1000 * elapsed / len(pairs)), peak, '-')
+
+    ida = None
+    def create_ida():
+        nonlocal ida
+        ida = IDAStar(engine, args.max_memory)
+        return ida.find_path
+
+    costs, elapsed, peak = run_queries(create_ida)
+    assert costs == expected, 'IDA* found a path of a different cost'
+    print_row('IDA* (%d slots)' % ida.get_capacity(), '%.2f' % (1000 * elapsed / len(pairs)),
+              peak, ida.get_stats()['estimated_bytes'])
+
+
+def benchmark_matrix(args):
+    """ Compares one A* search per pair of waypoints against DistanceMatrix. """
+
+    engine = make_random_engine(args.size, args.size, args.density, args.seed)
+    waypoints = [start for start, _ in random_pairs(engine, args.waypoints, args.seed)]
+    k = len(waypoints)
+
+    print_row('method', 'searches', 'seconds', 'speedup')
+
+    begin = time.perf_counter()
+    expected = []
+    for source in waypoints:
+        for target in waypoints:
+            path = engine.find_path(source, target)
+            expected.append(DistanceMatrix.NO_PATH if path is None
+                            else engine.get_path_cost(path))
+    baseline = time.perf_counter() - begin
+    print_row('A* per pair', k * k, '%.3f' % baseline, '1.00')
+
+    def run(name, **options):
+        begin = time.perf_counter()
+        matrix = DistanceMatrix(engine, waypoints, **options)
+        elapsed = time.perf_counter() - begin
+        assert matrix.get_costs().tolist() == expected, 'matrix differs from A*'
+        print_row(name, matrix.get_stats()['searches'], '%.3f' % elapsed,
+                  '%.2f' % (baseline / elapsed))
+
+    run('search per source', symmetric=False)
+    run('symmetric')
+    with ParallelSolver(engine.get_walkable(), args.size, args.size, args.processes) as solver:
+        run('symmetric, %d processes' % solver.get_processes(), solver=solver)
+
+
+def benchmark_reach(args):
+    """ Compares a full flow field against bounded reachability queries. """
+
+    engine = make_random_engine(args.size, args.size, args.density, args.seed)
+    source = random_pairs(engine, 1, args.seed)[0][0]
+
+    begin = time.perf_counter()
+    field = FlowField(engine, source)
+    full = time.perf_counter() - begin
+
+    print_row('budget', 'cells', 'full sec', 'bounded sec', 'vectorized sec')
+    for budget in args.budgets:
+        begin = time.perf_counter()
+        area = engine.find_reachable(source, budget)
+        bounded = time.perf_counter() - begin
+        expected = [d if d <= budget else Isochrone.UNREACHABLE for d in field.get_distances()]
+        assert area.get_distances().tolist() == expected, 'bounded search differs'
+
+        vectorized = '-'
+        try:
+            begin = time.perf_counter()
+            result = engine.find_reachable(source, budget, vectorized=True)
+            vectorized = '%.3f' % (time.perf_counter() - begin)
+            assert result.get_distances() == area.get_distances(), 'wavefront differs'
+        except ImportError:
+            pass
+
+        print_row(budget, area.get_count(), '%.3f' % full, '%.3f' % bounded, vectorized)
+
+
+def benchmark_hierarchy(args):
+    """ Compares A* against queries on a contraction hierarchy. """
+
+    engine = make_walls_engine(args.size, args.size, args.walls, args.seed)
+    pairs = random_pairs(engine, args.queries, args.seed)
+
+    hierarchy = ContractionHierarchy(engine)
+    stats = hierarchy.get_stats()
+    print('preprocessing: %.1f sec, %d edges (%d shortcuts), %.1f KiB index'
+          % (stats['build_seconds'], stats['edges'], stats['shortcuts'],
+             hierarchy.get_index_bytes() / 1024))
+
+    def run_queries(solver, counter):
+        costs, settled = [], 0
+        begin = time.perf_counter()
+        for start, target in pairs:
+            path = solver.find_path(start, target)
+            costs.append(None if path is None else engine.get_path_cost(path))
+            settled += solver.get_stats()[counter]
+        return costs, settled, time.perf_counter() - begin
+
+    print_row('method', 'settled/query', 'ms/query', 'speedup')
+    expected, settled, baseline = run_queries(engine, 'expanded')
+    print_row('A*', settled // len(pairs), '%.2f' % (1000 * baseline / len(pairs)), '1.00')
+
+    costs, settled, elapsed = run_queries(hierarchy, 'settled')
+    assert costs == expected, 'contraction hierarchy found a path of a different cost'
+    print_row('hierarchy', settled // len(pairs), '%.2f' % (1000 * elapsed / len(pairs)),
+              '%.2f' % (baseline / elapsed))
+
+
+def benchmark_bounding(args):
+    """ Compares A* against A* with goal bounds, and serial against pooled precomputation. """
+
+    engine = make_walls_engine(args.size, args.size, args.walls, args.seed)
+    pairs = random_pairs(engine, args.queries, args.seed)
+
+    print_row('precompute', 'processes', 'sec')
+    begin = time.perf_counter()
+    bounding = GoalBounding(engine)
+    print_row('serial', 1, '%.2f' % (time.perf_counter() - begin))
+    with ParallelSolver(engine.get_walkable(), args.size, args.size, args.processes) as solver:
+        begin = time.perf_counter()
+        pooled = GoalBounding(engine, solver)
+        print_row('pool', solver.get_processes(), '%.2f' % (time.perf_counter() - begin))
+    assert pooled.get_boxes() == bounding.get_boxes(), 'the pool built different boxes'
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'map.bounds')
+        bounding.save(path)
+        begin = time.perf_counter()
+        GoalBounding.load(path, engine)
+        print('index: %.1f KiB, loaded in %.1f ms'
+              % (bounding.get_index_bytes() / 1024, 1000 * (time.perf_counter() - begin)))
+
+    def run_queries(solver):
+        costs, expanded = [], 0
+        begin = time.perf_counter()
+        for start, target in pairs:
+            path = solver.find_path(start, target)
+            costs.append(None if path is None else engine.get_path_cost(path))
+            expanded += solver.get_stats()['expanded']
+        return costs, expanded, time.perf_counter() - begin
+
+    print_row('method', 'expanded/query', 'ms/query', 'speedup')
+    expected, expanded, baseline = run_queries(engine)
+    print_row('A*', expanded // len(pairs), '%.2f' % (1000 * baseline / len(pairs)), '1.00')
+
+    costs, expanded, elapsed = run_queries(bounding)
+    assert costs == expected, 'goal bounding found a path of a different cost'
+    print_row('goal bounding', expanded // len(pairs), '%.2f' % (1000 * elapsed / len(pairs)),
+              '%.2f' % (baseline / elapsed))
+
+
+def benchmark_subgoal(args):
+    """ Compares A* against queries on a simple subgoal graph, with and without refinement. """
+
+    engine = make_walls_engine(args.size, args.size, args.walls, args.seed)
+    pairs = random_pairs(engine, args.queries, args.seed)
+
+    graph = SubgoalGraph(engine)
+    stats = graph.get_stats()
+    print('preprocessing: %.2f sec, %d subgoals, %d edges, %.1f KiB index'
+          % (stats['build_seconds'], stats['subgoals'], stats['edges'],
+             graph.get_index_bytes() / 1024))
+
+    def run_queries(solver, find):
+        results, expanded = [], 0
+        begin = time.perf_counter()
+        for start, target in pairs:
+            results.append(find(start, target))
+            expanded += solver.get_stats()['expanded']
+        elapsed = time.perf_counter() - begin
+
+        # Subgoals are refined after timing, only to compare the costs
+        costs = [None if path is None else engine.get_path_cost(list(graph.refine(path)))
+                 for path in results]
+        return costs, expanded, elapsed
+
+    print_row('method', 'expanded/query', 'ms/query', 'speedup', 'break-even queries')
+    expected, expanded, baseline = run_queries(engine, engine.find_path)
+    print_row('A*', expanded // len(pairs), '%.2f' % (1000 * baseline / len(pairs)), '1.00', '-')
+
+    for name, find in ('subgoals only', graph.find_subgoals), ('refined path', graph.find_path):
+        costs, expanded, elapsed = run_queries(graph, find)
+        assert costs == expected, 'subgoal graph found a path of a different cost'
+        saved = (baseline - elapsed) / len(pairs)
+        print_row(name, expanded // len(pairs), '%.2f' % (1000 * elapsed / len(pairs)),
+                  '%.2f' % (baseline / elapsed),
+                  '%.0f' % (stats['build_seconds'] / saved) if saved > 0 else '-')
+
+
+def benchmark_moving(args):
+    """ Compares A* from scratch every tick against a moving-target search chasing a target. """
+
+    engine = make_random_engine(args.size, args.size, args.density, args.seed)
+    rng = random.Random(args.seed)
+    start, target = next((start, target) for start, target in random_pairs(engine, 64, args.seed)
+                         if engine.find_path(start, target) is not None)
+
+    # The target wanders randomly and the agent steps along its path every few ticks
+    ticks = []
+    for tick in range(args.ticks):
+        for _ in range(args.target_steps):
+            target = rng.choice(engine.get_neighbours(target))[0]
+        ticks.append((start, target))
+        if tick % args.agent_every == 0:
+            path = engine.find_path(start, target)
+            if path is not None and len(path) > 1:
+                start = path[1]
+
+    def run_ticks(find_path, counter):
+        costs, expanded = [], 0
+        begin = time.perf_counter()
+        for start, target in ticks:
+            path, stats = find_path(start, target)
+            costs.append(None if path is None else engine.get_path_cost(path))
+            expanded += stats[counter]
+        return costs, expanded, time.perf_counter() - begin
+
+    chase = MovingTargetSearch(engine, ticks[0][0], ticks[0][1])
+
+    def find_path_incremental(start, target):
+        chase.set_start(start)
+        chase.set_target(target)
+        return chase.find_path(), chase.get_stats()
+
+    print_row('method', 'expanded/tick', 'ms/tick', 'speedup')
+    expected, expanded, baseline = run_ticks(
+        lambda start, target: (engine.find_path(start, target), engine.get_stats()), 'expanded')
+    print_row('A* per tick', expanded // len(ticks), '%.2f' % (1000 * baseline / len(ticks)),
+              '1.00')
+
+    costs, expanded, elapsed = run_ticks(find_path_incremental, 'expanded')
+    assert costs == expected, 'moving-target search found a path of a different cost'
+    print_row('moving target', expanded // len(ticks), '%.2f' % (1000 * elapsed / len(ticks)),
+              '%.2f' % (baseline / elapsed))
+
+
+def get_step_distances(engine, source):
+    """ Runs a per-cell breadth-first search and gets the number of steps to every cell. """
+
+    distances = [Bitboard.UNREACHABLE] * (engine.get_columns() * engine.get_rows())
+    distances[source] = 0
+    queue = deque([source])
+    while queue:
+        current = queue.popleft()
+        for adj, _ in engine.get_neighbours(current):
+            if distances[adj] == Bitboard.UNREACHABLE:
+                distances[adj] = distances[current] + 1
+                queue.append(adj)
+    return distances
+
+
+def benchmark_bitboard(args):
+    """ Compares per-cell searches against bit-parallel flood fill, BFS and path checks. """
+
+    print_row('size', 'query', 'per-cell sec', 'bitboard sec', 'speedup')
+    for size in args.sizes:
+        engine = make_random_engine(size, size, args.density, args.seed)
+        pairs = random_pairs(engine, args.queries, args.seed)
+        source = pairs[0][0]
+
+        begin = time.perf_counter()
+        board = Bitboard(engine)
+        print_row(size, 'pack', '-', '%.3f' % (time.perf_counter() - begin), '-')
+
+        begin = time.perf_counter()
+        expected = get_step_distances(engine, source)
+        per_cell = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        reached = board.get_reachable(source)
+        elapsed = time.perf_counter() - begin
+        assert board.get_count(reached) == sum(d != Bitboard.UNREACHABLE for d in expected), \
+            'flood fill reached different cells'
+        print_row(size, 'flood fill', '%.3f' % per_cell, '%.3f' % elapsed,
+                  '%.1f' % (per_cell / elapsed))
+
+        begin = time.perf_counter()
+        distances = board.get_step_distances(source)
+        elapsed = time.perf_counter() - begin
+        assert distances.tolist() == expected, 'BFS bands differ'
+        print_row(size, 'BFS distances', '%.3f' % per_cell, '%.3f' % elapsed,
+                  '%.1f' % (per_cell / elapsed))
+
+        begin = time.perf_counter()
+        expected = [engine.find_path(start, target) is not None for start, target in pairs]
+        per_cell = time.perf_counter() - begin
+        begin = time.perf_counter()
+        found = [board.has_path(start, target) for start, target in pairs]
+        elapsed = time.perf_counter() - begin
+        assert found == expected, 'path checks differ'
+        print_row(size, 'has path x%d' % len(pairs), '%.3f' % per_cell, '%.3f' % elapsed,
+                  '%.1f' % (per_cell / elapsed))
+
+
+def benchmark_server(args):
+    """ Load-tests a PathServer process with concurrent clients on a Unix socket. """
+
+    engine = make_random_engine(args.size, args.size, args.density, args.seed)
+    pool = random_pairs(engine, args.distinct, args.seed)
+    rng = random.Random(args.seed)
+    requests = [[rng.choice(pool) for _ in range(args.batch)]
+                for _ in range(args.clients * args.requests)]
+
+    async def run_client(client, protocol, batches, latencies):
+        for pairs in batches:
+            begin = time.perf_counter()
+            if protocol == 'binary':
+                await client.solve_indices('load', pairs)
+            else:
+                await client.solve('load', [engine.get_row_col(start) + engine.get_row_col(target)
+                                            for start, target in pairs])
+            latencies.append(time.perf_counter() - begin)
+
+    async def run_load(path, protocol):
+        clients = [await PathClient.connect(path=path) for _ in range(args.clients)]
+        before = await clients[0].get_metrics()
+        latencies = []
+        begin = time.perf_counter()
+        await asyncio.gather(*(run_client(client, protocol, requests[i::args.clients], latencies)
+                               for i, client in enumerate(clients)))
+        elapsed = time.perf_counter() - begin
+        metrics = await clients[0].get_metrics()
+        for client in clients:
+            await client.close()
+
+        print_row(protocol, '%.0f' % (len(requests) * args.batch / elapsed),
+                  *('%.2f' % value for value
+                    in get_percentiles(latencies, scale=1000).values()),
+                  metrics['coalesced'] - before['coalesced'],
+                  metrics['batches'] - before['batches'])
+
+    with tempfile.TemporaryDirectory() as directory:
+        map_path = os.path.join(directory, 'load.map')
+        socket_path = os.path.join(directory, 'server.sock')
+        MapIO.write_map(map_path, engine)
+
+        main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+        server = subprocess.Popen([sys.executable, main_path, 'serve', map_path,
+                                   '--socket', socket_path, '--processes', str(args.processes)],
+                                  stderr=subprocess.PIPE, text=True)
+        try:
+            # The server prints a line once it is listening
+            print(server.stderr.readline().strip())
+            print_row('protocol', 'queries/sec', 'p50 ms', 'p95 ms', 'p99 ms', 'coalesced',
+                      'batches')
+            for protocol in args.protocols:
+                asyncio.run(run_load(socket_path, protocol))
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+
+def benchmark_memory(args):
+    """ Compares the peak traced memory per solve of the engines and grid representations. """
+
+    # The driver has to be selected before pygame is first imported
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame  # pylint: disable=import-outside-toplevel
+    from Grid import Grid, Node  # pylint: disable=import-outside-toplevel
+
+    engine = make_random_engine(args.size, args.size, args.density, args.seed)
+    pairs = random_pairs(engine, args.queries, args.seed)
+    cells = args.size * args.size
+    size_of = MemoryProfiler.get_deep_size
+
+    def get_index_size(solver):
+        # The engine is shared by every solver, so it is not part of their index
+        seen = set()
+        size_of(engine, seen)
+        return size_of(solver, seen)
+
+    def run_queries(solve, prepare=None):
+        profiler = MemoryProfiler()
+        for start, target in pairs:
+            if prepare is not None:
+                prepare(profiler, start, target)
+            profiler.begin()
+            try:
+                solve(profiler, start, target)
+            finally:
+                profiler.end()
+        largest = max(profiler.get_reports(),
+                      key=lambda report: sum(report['structures'].values()))
+        return profiler.get_peak_bytes(), largest['structures']
+
+    def solve_search(profiler, start, target):
+        search = Search(engine, start, target)
+        search.run()
+        profiler.record(**search.get_structures())
+
+    surface = pygame.Surface((args.size, args.size))
+    Node.set_surface(surface)
+    grid = Grid(surface, surface.get_rect(), args.size, args.size)
+
+    def prepare_grid(profiler, start, target):
+        # The nodes are rebuilt before every solve, like a fresh layout in the visualizer
+        grid.apply_layout(engine.get_walkable())
+        nodes = grid.get_nodes()
+        grid.set_start_node(nodes[start // args.size][start % args.size])
+        grid.set_target_node(nodes[target // args.size][target % args.size])
+        grid.set_memory_profiler(profiler)
+
+    def solve_grid(profiler, start, target):
+        try:
+            grid.find_path_nonvisual()
+        except IndexError:
+            pass
+
+    def measure(find_path):
+        return lambda profiler, start, target: find_path(start, target)
+
+    bitboard = Bitboard(engine)
+    ida = IDAStar(engine, args.max_memory)
+    hierarchy = ContractionHierarchy(engine)
+    subgoals = SubgoalGraph(engine)
+    bounding = GoalBounding(engine)
+    grid.apply_layout(engine.get_walkable())
+    rows = (
+        ('A* (Grid)', 'Node objects', size_of(grid.get_nodes()), 0, solve_grid, prepare_grid),
+        ('A* (Search)', 'walkable bytes', size_of(engine), 0, solve_search),
+        ('A* (Engine)', 'walkable bytes', size_of(engine), 0, measure(engine.find_path)),
+        ('IDA*', 'walkable bytes', size_of(engine), get_index_size(ida), measure(ida.find_path)),
+        ('flow field', 'walkable bytes', size_of(engine), 0,
+         measure(lambda start, target: FlowField(engine, target).get_path(start))),
+        ('contraction hierarchy', 'walkable bytes', size_of(engine), get_index_size(hierarchy),
+         measure(hierarchy.find_path)),
+        ('subgoal graph', 'walkable bytes', size_of(engine), get_index_size(subgoals),
+         measure(subgoals.find_path)),
+        ('goal bounding', 'walkable bytes', size_of(engine), get_index_size(bounding),
+         measure(bounding.find_path)),
+        ('bitboard has_path', 'packed bits', size_of(bitboard), 0,
+         measure(bitboard.has_path)),
+    )
+
+    print('%dx%d grid, %d queries, sizes in KiB' % (args.size, args.size, len(pairs)))
+    print_row('method', 'representation', 'map', 'index', 'peak/solve', 'structures',
+              'peak bytes/cell')
+    breakdowns = []
+    for name, representation, map_bytes, index_bytes, solve, *prepare in rows:
+        peak, structures = run_queries(solve, *prepare)
+        total = sum(structures.values())
+        print_row(name, representation, '%.1f' % (map_bytes / 1024),
+                  '%.1f' % (index_bytes / 1024) if index_bytes else '-', '%.1f' % (peak / 1024),
+                  '%.1f' % (total / 1024) if total else '-', '%.2f' % (peak / cells))
+        if structures:
+            breakdowns.append((name, structures))
+
+    # Node state is counted under nodes, so the containers of the Grid only count themselves
+    for name, structures in breakdowns:
+        print('%s structures of the largest solve: %s' % (name, ', '.join(
+            '%s %s' % (key, MemoryProfiler.format_bytes(size))
+            for key, size in structures.items())))
+
+    batch_profiler = MemoryProfiler()
+    batch_profiler.measure(engine.solve_many, pairs)
+    print('solve_many over all %d queries: peak %s'
+          % (len(pairs), MemoryProfiler.format_bytes(batch_profiler.get_peak_bytes())))
+
+
+def benchmark_render(args):
+    """ Measures the drawing path of the visualizer under the SDL dummy video driver. """
+
+    # The driver has to be selected before pygame is first imported
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import cProfile  # pylint: disable=import-outside-toplevel
+    import pstats  # pylint: disable=import-outside-toplevel
+    from Program import Program  # pylint: disable=import-outside-toplevel
+
+    print_row('grid', 'state', 'p50 ms', 'p95 ms', 'p99 ms', 'draw calls')
+    for columns in args.columns:
+        rows = columns * 2 // 3
+        program = Program(columns, rows)
+        grid = program.get_grid()
+        engine = make_random_engine(columns, rows, args.density, args.seed)
+        grid.apply_layout(engine.get_walkable())
+
+        # Run the search once to know how many expansions make up half of it
+        engine.find_path(grid.get_start_index(), grid.get_target_index())
+        expansions = engine.get_stats()['expanded']
+
+        for state in 'fresh', 'mid-search', 'solved':
+            grid.apply_layout(engine.get_walkable())
+            if state != 'fresh':
+                grid.start_search()
+                grid.step_search(max(1, expansions // 2) if state == 'mid-search' else None)
+
+            # Draw calls are counted in a separate profiled frame, so they do not slow
+            # down the timed frames
+            profiler = cProfile.Profile()
+            profiler.enable()
+            program.draw()
+            program.update()
+            profiler.disable()
+            calls = sum(stats[1] for (filename, _, name), stats
+                        in pstats.Stats(profiler).stats.items()
+                        if filename == '~' and ('pygame.draw.' in name or "'blit'" in name))
+
+            for _ in range(args.warmup):
+                program.draw()
+                program.update()
+
+            times = []
+            for _ in range(args.frames):
+                begin = time.perf_counter()
+                program.draw()
+                program.update()
+                times.append(1000 * (time.perf_counter() - begin))
+
+            print_row('%dx%d' % (columns, rows), state,
+                      *('%.2f' % value for value in get_percentiles(times).values()), calls)
+
+
+def main():
+    """ Parses the command line and runs the selected benchmark. """
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', type=int, default=1)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    cooperative = subparsers.add_parser('cooperative', help=benchmark_cooperative.__doc__)
+    cooperative.add_argument('--size', type=int, default=64)
+    cooperative.add_argument('--density', type=float, default=0.1)
+    cooperative.add_argument('--agents', type=int, default=100)
+    cooperative.add_argument('--window', type=int, default=16)
+    cooperative.add_argument('--ticks', type=int, default=500)
+    cooperative.set_defaults(run=benchmark_cooperative)
+
+    alt = subparsers.add_parser('alt', help=benchmark_alt.__doc__)
+    alt.add_argument('--size', type=int, default=96)
+    alt.add_argument('--walls', type=int, default=12)
+    alt.add_argument('--queries', type=int, default=50)
+    alt.add_argument('--landmarks', type=int, default=8)
+    alt.set_defaults(run=benchmark_alt)
+
+    batch = subparsers.add_parser('batch', help=benchmark_batch.__doc__)
+    batch.add_argument('--size', type=int, default=96)
+    batch.add_argument('--density', type=float, default=0.2)
+    batch.add_argument('--queries', type=int, default=500)
+    batch.add_argument('--targets', type=int, default=5)
+    batch.set_defaults(run=benchmark_batch)
+
+    parallel = subparsers.add_parser('parallel', help=benchmark_parallel.__doc__)
+    parallel.add_argument('--size', type=int, default=256)
+    parallel.add_argument('--density', type=float, default=0.2)
+    parallel.add_argument('--queries', type=int, default=400)
+    parallel.add_argument('--chunk-size', type=int, default=16)
+    parallel.add_argument('--max-processes', type=int, default=multiprocessing.cpu_count())
+    parallel.set_defaults(run=benchmark_parallel)
+
+    load = subparsers.add_parser('load', help=benchmark_load.__doc__)
+    load.add_argument('--size', type=int, default=4096)
+    load.add_argument('--walls', type=int, default=40)
+    load.set_defaults(run=benchmark_load)
+
+    cache = subparsers.add_parser('cache', help=benchmark_cache.__doc__)
+    cache.add_argument('--size', type=int, default=256)
+    cache.add_argument('--walls', type=int, default=20)
+    cache.add_argument('--landmarks', type=int, default=8)
+    cache.set_defaults(run=benchmark_cache)
+
+    bounded = subparsers.add_parser('bounded', help=benchmark_bounded.__doc__)
+    bounded.add_argument('--size', type=int, default=128)
+    bounded.add_argument('--density', type=float, default=0.2)
+    bounded.add_argument('--queries', type=int, default=20)
+    bounded.add_argument('--max-memory', type=int, default=IDAStar.DEFAULT_MAX_BYTES)
+    bounded.set_defaults(run=benchmark_bounded)
+
+    matrix = subparsers.add_parser('matrix', help=benchmark_matrix.__doc__)
+    matrix.add_argument('--size', type=int, default=128)
+    matrix.add_argument('--density', type=float, default=0.2)
+    matrix.add_argument('--waypoints', type=int, default=24)
+    matrix.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    matrix.set_defaults(run=benchmark_matrix)
+
+    reach = subparsers.add_parser('reach', help=benchmark_reach.__doc__)
+    reach.add_argument('--size', type=int, default=512)
+    reach.add_argument('--density', type=float, default=0.2)
+    reach.add_argument('--budgets', type=int, nargs='+', default=[100, 500, 2000])
+    reach.set_defaults(run=benchmark_reach)
+
+    hierarchy = subparsers.add_parser('hierarchy', help=benchmark_hierarchy.__doc__)
+    hierarchy.add_argument('--size', type=int, default=64)
+    hierarchy.add_argument('--walls', type=int, default=12)
+    hierarchy.add_argument('--queries', type=int, default=200)
+    hierarchy.set_defaults(run=benchmark_hierarchy)
+
+    bounding = subparsers.add_parser('bounding', help=benchmark_bounding.__doc__)
+    bounding.add_argument('--size', type=int, default=48)
+    bounding.add_argument('--walls', type=int, default=12)
+    bounding.add_argument('--queries', type=int, default=200)
+    bounding.add_argument('--processes', type=int, default=None)
+    bounding.set_defaults(run=benchmark_bounding)
+
+    subgoal = subparsers.add_parser('subgoal', help=benchmark_subgoal.__doc__)
+    subgoal.add_argument('--size', type=int, default=256)
+    subgoal.add_argument('--walls', type=int, default=40)
+    subgoal.add_argument('--queries', type=int, default=100)
+    subgoal.set_defaults(run=benchmark_subgoal)
+
+    moving = subparsers.add_parser('moving', help=benchmark_moving.__doc__)
+    moving.add_argument('--size', type=int, default=256)
+    moving.add_argument('--density', type=float, default=0.2)
+    moving.add_argument('--ticks', type=int, default=200)
+    moving.add_argument('--target-steps', type=int, default=1)
+    moving.add_argument('--agent-every', type=int, default=2)
+    moving.set_defaults(run=benchmark_moving)
+
+    bitboard = subparsers.add_parser('bitboard', help=benchmark_bitboard.__doc__)
+    bitboard.add_argument('--sizes', type=int, nargs='+', default=[256, 512, 1024])
+    bitboard.add_argument('--density', type=float, default=0.3)
+    bitboard.add_argument('--queries', type=int, default=20)
+    bitboard.set_defaults(run=benchmark_bitboard)
+
+    server = subparsers.add_parser('server', help=benchmark_server.__doc__)
+    server.add_argument('--size', type=int, default=256)
+    server.add_argument('--density', type=float, default=0.2)
+    server.add_argument('--clients', type=int, default=16)
+    server.add_argument('--requests', type=int, default=50)
+    server.add_argument('--batch', type=int, default=32)
+    server.add_argument('--distinct', type=int, default=2000)
+    server.add_argument('--processes', type=int, default=1)
+    server.add_argument('--protocols', nargs='+', choices=('json', 'binary'),
+                        default=['json', 'binary'])
+    server.set_defaults(run=benchmark_server)
+
+    memory = subparsers.add_parser('memory', help=benchmark_memory.__doc__)
+    memory.add_argument('--size', type=int, default=48)
+    memory.add_argument('--density', type=float, default=0.2)
+    memory.add_argument('--queries', type=int, default=20)
+    memory.add_argument('--max-memory', type=int, default=IDAStar.DEFAULT_MAX_BYTES)
+    memory.set_defaults(run=benchmark_memory)
+
+    render = subparsers.add_parser('render', help=benchmark_render.__doc__)
+    render.add_argument('--columns', type=int, nargs='+', default=[30, 60, 120, 240])
+    render.add_argument('--density', type=float, default=0.2)
+    render.add_argument('--frames', type=int, default=100)
+    render.add_argument('--warmup', type=int, default=10)
+    render.set_defaults(run=benchmark_render)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+""" Python script that contains the Bitboard class definition.
+
+Bitboard class answers unit-cost questions about a grid (which cells can be reached, how many
+steps away they are, whether there is any path at all) without visiting cells one at a time.
+The walkability of the grid is packed into a single Python integer, one bit per cell, and a
+breadth-first search advances its whole frontier with a few shifts, ORs and ANDs over every
+row at once.
+"""
+
+from array import array
+import re
+
+
+class Bitboard:
+    """ Packed walkability bits of a grid with bit-parallel breadth-first search.
+
+    Row r of the grid occupies bits r * width to r * width + columns - 1 of a mask, where
+    width = columns + 1. The extra bit at the end of every row is always clear in the
+    walkable mask, so horizontal shifts never carry a cell into the next row. Masks are
+    Python ints with one bit set for every cell of a set of cells.
+
+    Movement matches Engine: a cell reaches all eight adjacent walkable cells in one step.
+
+    Attributes:
+        columns: number of columns in the grid
+        rows: number of rows in the grid
+        width: number of bits per row of a mask
+        walkable: mask of the walkable cells
+
+    Constants:
+        UNREACHABLE: step count of cells that cannot be reached
+    """
+
+    UNREACHABLE = 0xFFFFFFFF
+
+    # Maps cell values to the digits of the binary string of a row
+    DIGITS = bytes([48] + [49] * 255)
+
+    # Finds the runs of bytes of a mask that hold at least one cell
+    NONZERO = re.compile(rb'[^\x00]+')
+
+    # The positions of the set bits of every byte value
+    BYTE_BITS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+    def __init__(self, engine):
+        """ Initializes an instance of the Bitboard class over a snapshot of an Engine grid.
+
+        Args:
+            engine: the Engine object that describes the grid
+
+        Raises:
+            ValueError: the grid has more than one layer
+        """
+
+        if engine.get_layers() > 1:
+            raise ValueError('Bitboards do not follow links between layers')
+
+        self.__columns = engine.get_columns()
+        self.__rows = engine.get_rows()
+        self.__width = self.__columns + 1
+
+        walkable = engine.get_walkable()
+        try:
+            view = memoryview(walkable)
+        except TypeError:
+            view = None
+        if view is not None and view.itemsize == 1 and view.c_contiguous:
+            cells = bytes(view.cast('B'))
+        else:
+            cells = bytes(1 if cell else 0 for cell in walkable)
+
+        # The last digit of a binary string is bit 0, so rows are joined in reverse order
+        digits = cells.translate(Bitboard.DIGITS)
+        columns = self.__columns
+        rows = [b'0' + digits[r * columns:(r + 1) * columns][::-1]
+                for r in range(self.__rows - 1, -1, -1)]
+        self.__walkable = int(b''.join(rows) or b'0', 2)
+
+    def get_columns(self):
+        """ Gets the number of columns in the grid. """
+
+        return self.__columns
+
+    def get_rows(self):
+        """ Gets the number of rows in the grid. """
+
+        return self.__rows
+
+    def get_walkable(self):
+        """ Gets the mask of the walkable cells. """
+
+        return self.__walkable
+
+    def get_bit(self, index):
+        """ Gets the mask of a single cell given its row-major index. """
+
+        row, col = divmod(index, self.__columns)
+        return 1 << (row * self.__width + col)
+
+    def get_cells(self, mask):
+        """ Gets the row-major indices of the cells of a mask in increasing order. """
+
+        cells = []
+        width, byte_bits = self.__width, Bitboard.BYTE_BITS
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+
+        # Empty bytes are skipped in C, so the loop only visits bytes that hold cells. Bit
+        # position p is on row p // width, and every row before it has one extra bit.
+        for run in Bitboard.NONZERO.finditer(data):
+            for offset in range(run.start(), run.end()):
+                base = offset * 8
+                for bit in byte_bits[data[offset]]:
+                    position = base + bit
+                    cells.append(position - position // width)
+        return cells
+
+    @staticmethod
+    def get_count(mask):
+        """ Gets the number of cells of a mask. """
+
+        return bin(mask).count('1')
+
+    def expand(self, frontier):
+        """ Gets the walkable cells that are in or adjacent to the cells of a mask. """
+
+        grown = frontier | frontier << 1 | frontier >> 1
+        grown |= grown << self.__width | grown >> self.__width
+        return grown & self.__walkable
+
+    def get_reachable(self, source):
+        """ Flood fills the cells that can be reached from a source cell.
+
+        Args:
+            source: the row-major index of the source cell
+
+        Returns:
+            The mask of the reachable cells, including the source if it is walkable
+        """
+
+        reached = self.get_bit(source) & self.__walkable
+        frontier = reached
+        while frontier:
+            grown = self.expand(frontier)
+            frontier = grown & ~reached
+            reached |= grown
+        return reached
+
+    def get_bands(self, source, max_steps=None):
+        """ Runs a breadth-first search and gets the cells at every number of steps.
+
+        Args:
+            source: the row-major index of the source cell
+            max_steps: the largest number of steps to search, or None for no limit
+
+        Returns:
+            List of masks where mask k holds the cells exactly k steps from the source
+        """
+
+        frontier = self.get_bit(source) & self.__walkable
+        reached = frontier
+        bands = []
+        while frontier:
+            bands.append(frontier)
+            if max_steps is not None and len(bands) > max_steps:
+                break
+            frontier = self.expand(frontier) & ~reached
+            reached |= frontier
+        return bands
+
+    def get_step_distances(self, source, max_steps=None):
+        """ Gets the number of steps from a source cell to every cell.
+
+        Args:
+            source: the row-major index of the source cell
+            max_steps: the largest number of steps to search, or None for no limit
+
+        Returns:
+            array('I') with the number of steps to every cell, UNREACHABLE for cells that
+            cannot be reached within max_steps
+        """
+
+        distances = array('I', [Bitboard.UNREACHABLE]) * (self.__columns * self.__rows)
+        for steps, band in enumerate(self.get_bands(source, max_steps)):
+            for index in self.get_cells(band):
+                distances[index] = steps
+        return distances
+
+    def has_path(self, start, target):
+        """ Checks if there is any path between two cells.
+
+        The search grows from both cells in turn and stops as soon as the two searches
+        touch, so only about half of the steps of a one-sided search are needed.
+
+        Args:
+            start: the row-major index of the start cell
+            target: the row-major index of the target cell
+
+        Returns:
+            True if both cells are walkable and connected, False otherwise
+        """
+
+        forward = self.get_bit(start) & self.__walkable
+        backward = self.get_bit(target) & self.__walkable
+        if not forward or not backward:
+            return False
+
+        forward_front, backward_front = forward, backward
+        while not forward & backward:
+            if not forward_front or not backward_front:
+                return False
+            grown = self.expand(forward_front)
+            forward_front = grown & ~forward
+            forward |= grown
+            forward, backward = backward, forward
+            forward_front, backward_front = backward_front, forward_front
+        return True
+
+    def get_components(self):
+        """ Splits the walkable cells into connected components.
+
+        Returns:
+            List of masks, one per connected component, in order of their lowest cell
+        """
+
+        components = []
+        remaining = self.__walkable
+        while remaining:
+            lowest = remaining & -remaining
+            component = lowest
+            frontier = lowest
+            while frontier:
+                grown = self.expand(frontier) & remaining
+                frontier = grown & ~component
+                component |= grown
+            components.append(component)
+            remaining &= ~component
+        return components
+
+    def to_bytes(self, mask):
+        """ Gets a mask as a bytearray with one entry per cell in row-major order. """
+
+        cells = bytearray(self.__columns * self.__rows)
+        for index in self.get_cells(mask):
+            cells[index] = 1
+        return cells
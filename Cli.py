@@ -0,0 +1,311 @@
+""" Command-line mode for running scenario files through the headless engines.
+
+Scenario queries are read lazily, solved in batches and written as JSON Lines while the run is
+in progress, so runs with millions of queries use a bounded amount of memory. A summary line
+with the throughput and the number of failures is printed to stderr at the end.
+
+Example:
+
+    python main.py run maps/arena.scen --engine batch --processes 4 --output results.jsonl
+
+With --trace-dir, the astar engine also saves a search trace of every query, which can be
+replayed in the visualizer with Ctrl+R after copying it to search.trace.
+
+The serve command keeps maps in memory and answers path queries from other processes on the
+same host (see Server.py and Client.py):
+
+    python main.py serve maps/arena.map --socket /tmp/pathfinder.sock --processes 4
+
+Exit codes:
+    0: every query was solved
+    1: at least one query had no path or was outside of its map
+    2: the command line or an input file was invalid
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import MapIO
+import Server
+from ParallelSolver import ParallelSolver
+from ThetaStar import ThetaStar
+from IDAStar import IDAStar
+from SearchTrace import SearchTrace
+
+ENGINES = ('batch', 'astar', 'theta', 'ida')
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_INVALID = 2
+
+
+def parse_args(argv):
+    """ Parses the arguments of the command-line mode. """
+
+    parser = argparse.ArgumentParser(prog='main.py', description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help='solve the queries of MovingAI scenario files')
+    run.add_argument('scenarios', nargs='+', help='MovingAI .scen files')
+    run.add_argument('--map', help='.map file to use instead of the maps named in the scenarios')
+    run.add_argument('--map-dir', help='directory of the maps named in the scenarios '
+                                       '(defaults to the directory of each scenario file)')
+    run.add_argument('--engine', choices=ENGINES, default='batch')
+    run.add_argument('--processes', type=int, default=1,
+                     help='number of worker processes (batch engine only)')
+    run.add_argument('--max-memory', type=int, default=IDAStar.DEFAULT_MAX_BYTES,
+                     help='bytes of memory for the transposition table (ida engine only)')
+    run.add_argument('--batch-size', type=int, default=1024,
+                     help='number of queries read and solved at a time')
+    run.add_argument('--output', help='file to write JSON Lines to (defaults to stdout)')
+    run.add_argument('--trace-dir', help='directory to save a search trace of every query to '
+                                         '(astar engine only)')
+
+    serve = subparsers.add_parser('serve', help='answer path queries over a local socket')
+    serve.add_argument('maps', nargs='+', help='MovingAI .map files, named after their file')
+    serve.add_argument('--socket', help='Unix socket to listen on instead of TCP')
+    serve.add_argument('--host', default='127.0.0.1', help='address to listen on for TCP')
+    serve.add_argument('--port', type=int, default=8750, help='TCP port to listen on')
+    serve.add_argument('--processes', type=int, default=1,
+                       help='number of worker processes per map')
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        return args
+    if args.processes > 1 and args.engine != 'batch':
+        parser.error('--processes requires the batch engine')
+    if args.trace_dir and args.engine != 'astar':
+        parser.error('--trace-dir requires the astar engine')
+    if args.batch_size < 1:
+        parser.error('--batch-size must be positive')
+    return args
+
+
+class ScenarioRunner:
+    """ Solves scenario queries in batches and streams the results as JSON Lines.
+
+    Attributes:
+        args: the parsed command line
+        output: the file object to write results to
+        maps: dict mapping map paths to their loaded Engine objects
+        solvers: dict mapping map paths to their ParallelSolver, if worker processes are used
+        layers: dict mapping map paths to the walkability bytes stored in their search traces
+        stats: dict with the number of queries, solved queries and failed queries
+    """
+
+    def __init__(self, args, output):
+        """ Initializes an instance of the ScenarioRunner class. """
+
+        self.__args = args
+        self.__output = output
+        self.__maps = {}
+        self.__solvers = {}
+        self.__layers = {}
+        self.__stats = {'queries': 0, 'solved': 0, 'failed': 0}
+
+    def get_stats(self):
+        """ Gets the number of queries, solved queries and failed queries so far. """
+
+        return self.__stats
+
+    def close(self):
+        """ Shuts down all worker processes. """
+
+        for solver in self.__solvers.values():
+            solver.close()
+        self.__solvers.clear()
+
+    def get_map_path(self, scenario_path, map_name):
+        """ Gets the path of the map used by a scenario line. """
+
+        if self.__args.map:
+            return self.__args.map
+        directory = self.__args.map_dir or os.path.dirname(scenario_path)
+        return os.path.join(directory, os.path.basename(map_name))
+
+    def get_engine(self, map_path):
+        """ Gets the Engine of a map, reading the map the first time it is used. """
+
+        engine = self.__maps.get(map_path)
+        if engine is None:
+            engine = MapIO.read_map(map_path)
+            self.__maps[map_path] = engine
+        return engine
+
+    def run(self, scenario_path):
+        """ Solves all queries of a scenario file, batch by batch. """
+
+        queries = MapIO.read_scenarios(scenario_path)
+
+        # Consecutive queries on the same map are solved together
+        for map_name, group in itertools.groupby(queries, key=lambda query: query[0]):
+            map_path = self.get_map_path(scenario_path, map_name)
+            engine = self.get_engine(map_path)
+            while True:
+                batch = list(itertools.islice(group, self.__args.batch_size))
+                if not batch:
+                    break
+                self.solve_batch(map_path, engine, batch)
+
+    def solve_batch(self, map_path, engine, batch):
+        """ Solves one batch of queries on a map and writes their results. """
+
+        columns, rows = engine.get_columns(), engine.get_rows()
+        pairs = []
+        valid = []
+        for _, start_row, start_col, target_row, target_col in batch:
+            inside = (0 <= start_row < rows and 0 <= start_col < columns and
+                      0 <= target_row < rows and 0 <= target_col < columns)
+            valid.append(inside)
+            if inside:
+                pairs.append((engine.get_index(start_row, start_col),
+                              engine.get_index(target_row, target_col)))
+
+        results = iter(self.solve_pairs(map_path, engine, pairs))
+
+        lines = []
+        for query, inside in zip(batch, valid):
+            cost, length = next(results) if inside else (None, 0)
+            record = {
+                'id': self.__stats['queries'],
+                'map': os.path.basename(map_path),
+                'start': [query[1], query[2]],
+                'target': [query[3], query[4]],
+                'cost': cost,
+                'length': length
+                }
+            if not inside:
+                record['error'] = 'outside of map'
+            lines.append(json.dumps(record))
+
+            self.__stats['queries'] += 1
+            if cost is None:
+                self.__stats['failed'] += 1
+            else:
+                self.__stats['solved'] += 1
+
+        self.__output.write('\n'.join(lines) + '\n')
+        self.__output.flush()
+
+    def solve_pairs(self, map_path, engine, pairs):
+        """ Solves (start, target) pairs with the selected engine.
+
+        Returns:
+            List of (cost, number of cells or waypoints) tuples, with a cost of None for
+            queries that have no path
+        """
+
+        if self.__args.engine == 'batch':
+            if self.__args.processes > 1:
+                solver = self.__solvers.get(map_path)
+                if solver is None:
+                    solver = ParallelSolver(engine.get_walkable(), engine.get_columns(),
+                                            engine.get_rows(), self.__args.processes)
+                    self.__solvers[map_path] = solver
+                costs, lengths = solver.solve_many(pairs)
+            else:
+                result = engine.solve_many(pairs)
+                costs = result.get_costs()
+                offsets = result.get_offsets()
+                lengths = [offsets[i + 1] - offsets[i] for i in range(len(pairs))]
+            return [(None if length == 0 else cost, length)
+                    for cost, length in zip(costs, lengths)]
+
+        results = []
+        theta = ThetaStar(engine) if self.__args.engine == 'theta' else None
+        ida = IDAStar(engine, self.__args.max_memory) if self.__args.engine == 'ida' else None
+        for start, target in pairs:
+            if theta is not None:
+                path = theta.find_path(start, target)
+                cost = None if path is None else round(theta.get_path_cost(path), 3)
+            elif ida is not None:
+                path = ida.find_path(start, target)
+                cost = None if path is None else engine.get_path_cost(path)
+            elif self.__args.trace_dir:
+                path = self.trace_path(map_path, engine, start, target)
+                cost = None if path is None else engine.get_path_cost(path)
+            else:
+                path = engine.find_path(start, target)
+                cost = None if path is None else engine.get_path_cost(path)
+            results.append((cost, 0 if path is None else len(path)))
+        return results
+
+    def trace_path(self, map_path, engine, start, target):
+        """ Finds a path with A* and saves a search trace of it to the trace directory.
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if there is no path
+        """
+
+        walkable = self.__layers.get(map_path)
+        if walkable is None:
+            walkable = MapIO.as_bytes(engine.get_walkable())
+            self.__layers[map_path] = walkable
+
+        trace = SearchTrace.capture(engine, start, target, walkable=walkable)
+        name = '{0}-{1}-{2}.trace'.format(os.path.splitext(os.path.basename(map_path))[0],
+                                          start, target)
+        os.makedirs(self.__args.trace_dir, exist_ok=True)
+        trace.save(os.path.join(self.__args.trace_dir, name))
+        return trace.get_path()
+
+
+def serve(args):
+    """ Runs the serve command until it is interrupted.
+
+    Returns:
+        The exit code of the server
+    """
+
+    try:
+        maps = Server.PathServer.read_maps(args.maps)
+    except (OSError, ValueError) as error:
+        print('error: {0}'.format(error), file=sys.stderr)
+        return EXIT_INVALID
+
+    def on_ready(address):
+        print('serving {0} maps on {1}'.format(len(maps), address), file=sys.stderr, flush=True)
+
+    Server.serve(maps, args.socket, args.host, args.port, args.processes, on_ready)
+    return EXIT_OK
+
+
+def main(argv):
+    """ Runs the command-line mode.
+
+    Args:
+        argv: list of command-line arguments, without the program name
+
+    Returns:
+        The exit code of the run
+    """
+
+    args = parse_args(argv)
+    if args.command == 'serve':
+        return serve(args)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    runner = ScenarioRunner(args, output)
+
+    begin = time.perf_counter()
+    try:
+        for scenario_path in args.scenarios:
+            runner.run(scenario_path)
+    except (OSError, ValueError) as error:
+        print('error: {0}'.format(error), file=sys.stderr)
+        return EXIT_INVALID
+    finally:
+        runner.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - begin
+
+    stats = runner.get_stats()
+    print('{0} queries, {1} solved, {2} failed in {3:.3f} s ({4:.1f} queries/sec)'.format(
+        stats['queries'], stats['solved'], stats['failed'], elapsed,
+        stats['queries'] / elapsed if elapsed > 0 else 0.0), file=sys.stderr)
+
+    return EXIT_FAILURES if stats['failed'] else EXIT_OK
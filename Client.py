@@ -0,0 +1,196 @@
+""" Python script that contains the PathClient class definition.
+
+PathClient class is the client of a PathServer (see Server.py). It sends requests over one
+connection without waiting for the previous answers, and matches every response to its request
+by id, so many coroutines can share a client. Queries on rows and columns are sent as JSON and
+queries on cell indices as binary frames, which are much cheaper to encode for large batches.
+
+Example:
+
+    async def main():
+        client = await PathClient.connect(path='/tmp/pathfinder.sock')
+        costs, lengths = await client.solve('arena', [(0, 0, 3, 4)])
+        await client.close()
+
+    asyncio.run(main())
+"""
+
+import asyncio
+from array import array
+import itertools
+import json
+from ParallelSolver import QUERY_RECORD, RESULT_RECORD
+from Server import PathServer
+
+
+class PathClient:
+    """ Asyncio connection to a PathServer with pipelined requests.
+
+    Attributes:
+        reader: the StreamReader of the connection
+        writer: the StreamWriter of the connection
+        ids: iterator of the ids of new requests
+        waiting: dict mapping the ids of unanswered requests to their futures
+        receiver: the task reading responses from the connection
+    """
+
+    def __init__(self, reader, writer):
+        """ Initializes an instance of the PathClient class over an open connection. """
+
+        self.__reader = reader
+        self.__writer = writer
+        self.__ids = itertools.count(1)
+        self.__waiting = {}
+        self.__receiver = asyncio.create_task(self.receive())
+
+    @staticmethod
+    async def connect(path=None, host='127.0.0.1', port=None):
+        """ Connects to a PathServer.
+
+        Args:
+            path: the path of the Unix socket of the server, or None to connect over TCP
+            host: the address of the server for TCP connections
+            port: the TCP port of the server
+
+        Returns:
+            The PathClient object
+        """
+
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(
+                path, limit=PathServer.STREAM_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(
+                host, port, limit=PathServer.STREAM_LIMIT)
+        return PathClient(reader, writer)
+
+    async def close(self):
+        """ Closes the connection. Requests that have not been answered raise ConnectionError. """
+
+        self.__writer.close()
+        try:
+            await self.__writer.wait_closed()
+        except ConnectionError:
+            pass
+        await self.__receiver
+
+    async def receive(self):
+        """ Reads responses and resolves the futures of their requests until the connection
+        is closed. """
+
+        reader = self.__reader
+        header = PathServer.RESPONSE_HEADER
+        try:
+            while True:
+                first = await reader.readexactly(1)
+                if first == PathServer.RESPONSE_MAGIC[:1]:
+                    _, request_id, status, count = header.unpack(
+                        first + await reader.readexactly(header.size - 1))
+                    if status == PathServer.OK:
+                        result = await reader.readexactly(count * RESULT_RECORD.size)
+                    else:
+                        result = ValueError((await reader.readexactly(count)).decode())
+                else:
+                    response = json.loads(first + await reader.readline())
+                    request_id = response.pop('id', None)
+                    result = response
+                    if 'error' in response:
+                        result = ValueError(response['error'])
+
+                future = self.__waiting.pop(request_id, None)
+                if future is not None and not future.done():
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for future in self.__waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('Connection to the server was closed'))
+            self.__waiting.clear()
+
+    async def request(self, data, request_id):
+        """ Sends the bytes of a request and waits for its response. """
+
+        if self.__receiver.done():
+            raise ConnectionError('Connection to the server was closed')
+        future = asyncio.get_running_loop().create_future()
+        self.__waiting[request_id] = future
+        self.__writer.write(data)
+        await self.__writer.drain()
+        return await future
+
+    async def request_json(self, **fields):
+        """ Sends a JSON request and waits for its response.
+
+        Raises:
+            ValueError: the server could not answer the request
+
+        Returns:
+            dict of the fields of the response other than its id
+        """
+
+        request_id = next(self.__ids)
+        fields['id'] = request_id
+        return await self.request(json.dumps(fields).encode() + b'\n', request_id)
+
+    async def solve(self, map_name, queries):
+        """ Finds the cheapest paths for queries given by rows and columns.
+
+        Args:
+            map_name: the name of the map on the server
+            queries: list of (start row, start column, target row, target column) tuples
+
+        Raises:
+            ValueError: the map is unknown or a query is outside of the map
+
+        Returns:
+            (costs, lengths) lists of the path cost and number of cells of every path, in the
+            order of queries. Queries without a path have a cost of None and a length of 0.
+        """
+
+        response = await self.request_json(map=map_name, queries=[list(query) for query
+                                                                   in queries])
+        return response['costs'], response['lengths']
+
+    async def solve_indices(self, map_name, pairs):
+        """ Finds the cheapest paths for queries given by cell indices, with a binary request.
+
+        Args:
+            map_name: the name of the map on the server
+            pairs: list of (start index, target index) tuples
+
+        Raises:
+            ValueError: the map is unknown or a query is outside of the map
+
+        Returns:
+            (costs, lengths) arrays of the path cost and number of cells of every path, in the
+            order of pairs. Queries without a path have a cost of BatchResult.NO_PATH.
+        """
+
+        request_id = next(self.__ids)
+        name = map_name.encode()
+        data = bytearray(PathServer.REQUEST_HEADER.pack(PathServer.REQUEST_MAGIC, request_id,
+                                                        len(name), len(pairs)))
+        data += name
+        for pair in pairs:
+            data += QUERY_RECORD.pack(*pair)
+
+        records = await self.request(bytes(data), request_id)
+        costs, lengths = array('I'), array('I')
+        for cost, length in RESULT_RECORD.iter_unpack(records):
+            costs.append(cost)
+            lengths.append(length)
+        return costs, lengths
+
+    async def get_metrics(self):
+        """ Gets the counters, queue depth and latency percentiles of the server. """
+
+        return (await self.request_json(op='metrics'))['metrics']
+
+    async def get_maps(self):
+        """ Gets a dict mapping the names of the maps of the server to their [columns, rows]. """
+
+        return (await self.request_json(op='maps'))['maps']
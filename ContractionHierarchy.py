@@ -0,0 +1,418 @@
+""" Python script that contains the ContractionHierarchy class definition.
+
+ContractionHierarchy class answers repeated path queries on a static grid much faster than A*,
+in exchange for a preprocessing step. Every walkable cell is contracted in turn, from the least
+to the most important: it is removed from the graph of 8-connected moves, and a shortcut edge
+is added between two of its neighbours whenever the cheapest path between them went through
+the contracted cell. A query then runs two Dijkstra searches, from the start and from the
+target, that only follow edges towards more important cells, so each search settles a small
+cone of cells instead of the whole area between start and target.
+"""
+
+from array import array
+import time
+import MinPriorityQueue
+
+
+class ContractionHierarchy:
+    """ Contraction hierarchy over the walkability array of an Engine.
+
+    Movement costs are symmetric, so every edge is stored once, with the less important of its
+    two cells, and both searches of a query follow the same upward edges. The upward edges of
+    cell i are targets[offsets[i]:offsets[i + 1]] (compressed sparse row layout), with their
+    costs in costs and, for shortcuts, the contracted cell they skip in middles. A shortcut is
+    unpacked into grid cells by replacing it with its two halves until no shortcut is left.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        ranks: array('I') of the contraction order of every cell, or UNRANKED for obstacles
+        offsets: array('I') of columns * rows + 1 offsets into targets
+        targets: array('I') of the more important cell of every upward edge
+        costs: array('I') of the cost of every upward edge
+        middles: array('I') of the cell skipped by every shortcut, or NO_MIDDLE for moves
+        stats: dict of counters recorded by preprocessing and by the most recent query
+
+    Constants:
+        UNRANKED: rank of cells that are not part of the hierarchy
+        NO_MIDDLE: middle of edges that are moves between adjacent cells
+        WITNESS_SETTLE_LIMIT: the largest number of cells settled by the search that looks for
+            a path around a cell being contracted. Smaller limits preprocess faster but add
+            shortcuts that are not needed.
+    """
+
+    UNRANKED = 0xFFFFFFFF
+    NO_MIDDLE = 0xFFFFFFFF
+
+    WITNESS_SETTLE_LIMIT = 40
+
+    def __init__(self, engine, index=None):
+        """ Initializes an instance of the ContractionHierarchy class.
+
+        The hierarchy is built, unless index is given (for example when loading it from a
+        PrecomputeCache).
+
+        Args:
+            engine: the Engine object that describes the grid
+            index: optional (ranks, offsets, targets, costs, middles) tuple of precomputed
+                arrays or memoryviews
+        """
+
+        self.__engine = engine
+        self.__stats = {}
+
+        if index is not None:
+            self.__ranks, self.__offsets, self.__targets, self.__costs, self.__middles = index
+            return
+
+        begin = time.perf_counter()
+        self.build()
+        self.__stats = {'build_seconds': time.perf_counter() - begin,
+                        'edges': len(self.__targets),
+                        'shortcuts': sum(m != ContractionHierarchy.NO_MIDDLE
+                                         for m in self.__middles)}
+
+    def get_ranks(self):
+        """ Gets the array of the contraction order of every cell. """
+
+        return self.__ranks
+
+    def get_stats(self):
+        """ Gets the counters recorded by preprocessing or by the most recent query. """
+
+        return self.__stats
+
+    def get_index_bytes(self):
+        """ Gets the number of bytes of the arrays of the hierarchy. """
+
+        arrays = (self.__ranks, self.__offsets, self.__targets, self.__costs, self.__middles)
+        return sum(memoryview(values).nbytes for values in arrays)
+
+    def get_arrays(self):
+        """ Gets the (ranks, offsets, targets, costs, middles) arrays of the hierarchy. """
+
+        return self.__ranks, self.__offsets, self.__targets, self.__costs, self.__middles
+
+
+    # -------------------------------------
+    # Methods related to preprocessing
+    # -------------------------------------
+
+    def build(self):
+        """ Contracts every walkable cell and stores the upward edges in CSR arrays.
+
+        Cells are contracted in order of their edge difference (the number of shortcuts their
+        contraction adds minus the number of edges it removes) plus the number of neighbours
+        already contracted and their depth in the hierarchy, which spreads contraction evenly
+        over the grid. Priorities are updated lazily: a cell whose priority has grown by the
+        time it is extracted is put back into the queue.
+        """
+
+        engine = self.__engine
+        size = engine.get_columns() * engine.get_rows()
+
+        # The remaining graph: cell -> {neighbour: [cost, middle]}
+        graph = {}
+        for cell in range(size):
+            if engine.is_walkable(cell):
+                graph[cell] = {adj: [cost, ContractionHierarchy.NO_MIDDLE]
+                               for adj, cost in engine.get_neighbours(cell)}
+
+        deleted = dict.fromkeys(graph, 0)
+        levels = dict.fromkeys(graph, 0)
+        priorities = {}
+        queue = MinPriorityQueue.MinPriorityQueue()
+        for cell in graph:
+            priorities[cell] = self.get_priority(graph, cell, deleted, levels)
+            queue.insert(priorities[cell], cell)
+
+        ranks = array('I', [ContractionHierarchy.UNRANKED]) * size
+        upward = {}
+        rank = 0
+        while True:
+            try:
+                cell = queue.extract_min()
+            except IndexError:
+                break
+
+            shortcuts = self.find_shortcuts(graph, cell)
+            priority = self.get_priority(graph, cell, deleted, levels, shortcuts)
+            if priority > priorities[cell]:
+                priorities[cell] = priority
+                queue.insert(priority, cell)
+                continue
+
+            # Every remaining neighbour is contracted later, so all edges left are upward
+            ranks[cell] = rank
+            rank += 1
+            edges = graph.pop(cell)
+            upward[cell] = edges
+            for adj in edges:
+                del graph[adj][cell]
+                deleted[adj] += 1
+                levels[adj] = max(levels[adj], levels[cell] + 1)
+            for source, target, cost in shortcuts:
+                for a, b in (source, target), (target, source):
+                    edge = graph[a].get(b)
+                    if edge is None or cost < edge[0]:
+                        graph[a][b] = [cost, cell]
+
+        offsets = array('I', [0]) * (size + 1)
+        targets, costs, middles = array('I'), array('I'), array('I')
+        for cell in range(size):
+            for adj, (cost, middle) in sorted(upward.get(cell, {}).items()):
+                targets.append(adj)
+                costs.append(cost)
+                middles.append(middle)
+            offsets[cell + 1] = len(targets)
+
+        self.__ranks = ranks
+        self.__offsets, self.__targets, self.__costs, self.__middles = (
+            offsets, targets, costs, middles)
+
+    def get_priority(self, graph, cell, deleted, levels, shortcuts=None):
+        """ Gets the contraction priority of a cell; cells with lower priorities go first.
+
+        Args:
+            graph: the remaining graph
+            cell: the index of the cell
+            deleted: dict of the number of contracted neighbours of every cell
+            levels: dict of the depth in the hierarchy of every cell
+            shortcuts: the shortcuts needed to contract the cell, found if not given
+        """
+
+        if shortcuts is None:
+            shortcuts = self.find_shortcuts(graph, cell)
+        return len(shortcuts) - len(graph[cell]) + deleted[cell] + levels[cell]
+
+    def find_shortcuts(self, graph, cell):
+        """ Finds the shortcuts needed to contract a cell.
+
+        A shortcut between two neighbours of the cell is needed unless a witness search from
+        the first neighbour, which avoids the cell, finds a path to the second neighbour that
+        is no more expensive than the path through the cell.
+
+        Args:
+            graph: the remaining graph
+            cell: the index of the cell to contract
+
+        Returns:
+            List of (neighbour, neighbour, cost) shortcuts
+        """
+
+        edges = graph[cell]
+        neighbours = sorted(edges)
+        shortcuts = []
+        for i, source in enumerate(neighbours):
+            via = edges[source][0]
+            targets = {target: via + edges[target][0] for target in neighbours[i + 1:]}
+            if not targets:
+                break
+
+            witnesses = self.witness_search(graph, source, cell, max(targets.values()))
+            for target, cost in targets.items():
+                if witnesses.get(target, cost + 1) > cost:
+                    shortcuts.append((source, target, cost))
+        return shortcuts
+
+    def witness_search(self, graph, source, avoid, max_cost):
+        """ Runs a bounded Dijkstra search in the remaining graph that avoids one cell.
+
+        Args:
+            graph: the remaining graph
+            source: the index of the cell to search from
+            avoid: the index of the cell that must not be used
+            max_cost: the largest path cost worth settling
+
+        Returns:
+            Dict mapping cells to the cheapest path cost found from source
+        """
+
+        costs = {source: 0}
+        closed = set()
+        opened = MinPriorityQueue.MinPriorityQueue()
+        opened.insert(0, source)
+
+        while len(closed) < ContractionHierarchy.WITNESS_SETTLE_LIMIT:
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                break
+            if costs[current] > max_cost:
+                break
+            closed.add(current)
+
+            for adj, (cost, _) in graph[current].items():
+                if adj == avoid or adj in closed:
+                    continue
+                g_cost = costs[current] + cost
+                if adj not in costs:
+                    costs[adj] = g_cost
+                    opened.insert(g_cost, adj)
+                elif g_cost < costs[adj]:
+                    costs[adj] = g_cost
+                    opened.decrease_key(adj, g_cost)
+
+        return costs
+
+
+    # -------------------------------------
+    # Methods related to queries
+    # -------------------------------------
+
+    def find_path(self, start, target):
+        """ Finds the cheapest path from the start cell to the target cell.
+
+        Args:
+            start: the index of the start cell
+            target: the index of the target cell
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if there is no path
+        """
+
+        self.__stats['settled'] = 0
+        unranked = ContractionHierarchy.UNRANKED
+        if self.__ranks[start] == unranked or self.__ranks[target] == unranked:
+            return None
+        if start == target:
+            return [start]
+
+        searches = [({start: 0}, {start: None}, MinPriorityQueue.MinPriorityQueue()),
+                    ({target: 0}, {target: None}, MinPriorityQueue.MinPriorityQueue())]
+        searches[0][2].insert(0, start)
+        searches[1][2].insert(0, target)
+        best, meeting = None, None
+        active = [True, True]
+
+        side = 0
+        while active[0] or active[1]:
+            if not active[side]:
+                side ^= 1
+            costs, prev, opened = searches[side]
+            other = searches[side ^ 1][0]
+
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                active[side] = False
+                continue
+            cost = costs[current]
+            if best is not None and cost >= best:
+                active[side] = False
+                continue
+            self.__stats['settled'] += 1
+
+            if current in other and (best is None or cost + other[current] < best):
+                best, meeting = cost + other[current], current
+
+            edges = range(self.__offsets[current], self.__offsets[current + 1])
+
+            # Stall cells that are reached more cheaply from a more important cell, since no
+            # cheapest path can continue upwards from them
+            if any(self.__targets[e] in costs
+                   and costs[self.__targets[e]] + self.__costs[e] < cost for e in edges):
+                side ^= 1
+                continue
+
+            for e in edges:
+                adj = self.__targets[e]
+                g_cost = cost + self.__costs[e]
+                if adj not in costs:
+                    costs[adj] = g_cost
+                    prev[adj] = current
+                    opened.insert(g_cost, adj)
+                elif g_cost < costs[adj] and opened.element_exists(adj):
+                    costs[adj] = g_cost
+                    prev[adj] = current
+                    opened.decrease_key(adj, g_cost)
+            side ^= 1
+
+        if meeting is None:
+            return None
+
+        # Edges of the hierarchy from start up to the meeting cell and down to target
+        hops = [meeting]
+        while searches[0][1][hops[-1]] is not None:
+            hops.append(searches[0][1][hops[-1]])
+        hops.reverse()
+        while searches[1][1][hops[-1]] is not None:
+            hops.append(searches[1][1][hops[-1]])
+
+        path = [start]
+        for a, b in zip(hops, hops[1:]):
+            path.extend(self.unpack(a, b)[1:])
+        return path
+
+    def get_edge(self, a, b):
+        """ Gets the index into targets of the edge between two cells. """
+
+        low, high = (a, b) if self.__ranks[a] < self.__ranks[b] else (b, a)
+        for e in range(self.__offsets[low], self.__offsets[low + 1]):
+            if self.__targets[e] == high:
+                return e
+        raise KeyError('No edge between cells {0} and {1}'.format(a, b))
+
+    def unpack(self, a, b):
+        """ Unpacks an edge of the hierarchy into the grid cells it stands for.
+
+        Returns:
+            List of cell indices from a to b (inclusive) where consecutive cells are adjacent
+        """
+
+        path = [a]
+        stack = [b]
+        current = a
+        while stack:
+            following = stack[-1]
+            middle = self.__middles[self.get_edge(current, following)]
+            if middle == ContractionHierarchy.NO_MIDDLE:
+                path.append(following)
+                current = stack.pop()
+            else:
+                stack.append(middle)
+        return path
+
+    def get_path_cost(self, path):
+        """ Gets the cost of a path of adjacent cells. """
+
+        return self.__engine.get_path_cost(path)
+
+
+    # ---------------------------------------------
+    # Methods related to caching the hierarchy
+    # ---------------------------------------------
+
+    @staticmethod
+    def cached(engine, cache, key=None):
+        """ Gets a hierarchy from a PrecomputeCache, building it only if the entry is stale.
+
+        The entry holds the number of edges followed by the five arrays of the hierarchy, and
+        the returned ContractionHierarchy reads them from the mapped file.
+
+        Args:
+            engine: the Engine object that describes the grid
+            cache: the PrecomputeCache object to use
+            key: the content hash of the map, computed from engine if not given
+
+        Returns:
+            The ContractionHierarchy object
+        """
+
+        def build():
+            ranks, offsets, targets, costs, middles = ContractionHierarchy(engine).get_arrays()
+            table = array('I', [len(targets)])
+            for values in ranks, offsets, targets, costs, middles:
+                table.extend(values)
+            return table
+
+        if key is None:
+            key = cache.get_key(engine)
+        table = cache.get(key, 'contraction-hierarchy', build)
+
+        size = engine.get_columns() * engine.get_rows()
+        edges = table[0]
+        bounds = [1, 1 + size, 2 + 2 * size]
+        for _ in range(3):
+            bounds.append(bounds[-1] + edges)
+        index = tuple(table[a:b] for a, b in zip(bounds, bounds[1:]))
+        return ContractionHierarchy(engine, index=index)
@@ -0,0 +1,425 @@
+""" Python script that contains ReservationTable and CooperativePlanner class definitions.
+
+CooperativePlanner class plans collision-free paths for many agents on the same grid using
+Cooperative A* (CA*) and its windowed variant (WHCA*). Agents are planned one after the other
+in space-time, and every planned path is written into a shared ReservationTable that later
+agents must avoid.
+
+ReservationTable class records which agent occupies which cell at which time step.
+"""
+
+import MinPriorityQueue
+from Engine import Engine
+from FlowField import FlowField
+
+
+class ReservationTable:
+    """ Hashed space-time reservation table.
+
+    Reservations are stored per cell as a dict mapping time steps to agents, so that looking up
+    a (cell, time) pair is O(1) and memory is proportional to the number of reservations rather
+    than to the size of the grid times the length of the plans.
+
+    Attributes:
+        cells: dict mapping a cell index to a dict of {time step: agent}
+        parked: dict mapping a cell index to (time step, agent) for agents that stay on the cell
+            forever from that time step onwards
+        agent_cells: dict mapping an agent to the list of (cell, time step) it has reserved
+    """
+
+    def __init__(self):
+        """ Initializes an empty ReservationTable. """
+
+        self.__cells = {}
+        self.__parked = {}
+        self.__agent_cells = {}
+
+    def reserve(self, cell, time, agent):
+        """ Reserves a cell at a single time step for an agent. """
+
+        self.__cells.setdefault(cell, {})[time] = agent
+        self.__agent_cells.setdefault(agent, []).append((cell, time))
+
+    def reserve_path(self, path, start_time, agent):
+        """ Reserves every (cell, time step) of a path for an agent.
+
+        Args:
+            path: list of cell indices, one per time step
+            start_time: the time step of the first cell in path
+            agent: the agent the path belongs to
+        """
+
+        for time, cell in enumerate(path, start_time):
+            self.reserve(cell, time, agent)
+
+    def park(self, cell, time, agent):
+        """ Reserves a cell for an agent from a time step onwards. """
+
+        self.__parked[cell] = (time, agent)
+        self.__agent_cells.setdefault(agent, []).append((cell, None))
+
+    def release(self, agent):
+        """ Removes every reservation held by an agent. """
+
+        for cell, time in self.__agent_cells.pop(agent, []):
+            if time is None:
+                if self.__parked.get(cell, (None, None))[1] == agent:
+                    del self.__parked[cell]
+            else:
+                times = self.__cells.get(cell)
+                if times is not None and times.get(time) == agent:
+                    del times[time]
+                    if not times:
+                        del self.__cells[cell]
+
+    def prune(self, before_time):
+        """ Removes all single time step reservations earlier than a given time step. """
+
+        for agent, reserved in self.__agent_cells.items():
+            kept = []
+            for cell, time in reserved:
+                if time is not None and time < before_time:
+                    times = self.__cells.get(cell)
+                    if times is not None and times.get(time) == agent:
+                        del times[time]
+                        if not times:
+                            del self.__cells[cell]
+                else:
+                    kept.append((cell, time))
+            self.__agent_cells[agent] = kept
+
+    def is_free(self, cell, time, agent):
+        """ Returns True if no other agent occupies a cell at a time step. """
+
+        occupant = self.__cells.get(cell, {}).get(time)
+        if occupant is not None and occupant != agent:
+            return False
+
+        parked = self.__parked.get(cell)
+        if parked is not None and parked[1] != agent and time >= parked[0]:
+            return False
+
+        return True
+
+    def is_parked(self, cell, agent):
+        """ Returns True if an agent stays on a cell forever from some time step onwards. """
+
+        parked = self.__parked.get(cell)
+        return parked is not None and parked[1] == agent
+
+    def is_swap(self, cell, adj, time, agent):
+        """ Returns True if moving from cell to adj at a time step swaps places with another agent.
+        """
+
+        occupant = self.__cells.get(adj, {}).get(time)
+        if occupant is None or occupant == agent:
+            return False
+        return self.__cells.get(cell, {}).get(time + 1) == occupant
+
+    def get_last_time(self, cell, agent):
+        """ Gets the latest time step at which another agent occupies a cell.
+
+        Returns:
+            The latest reserved time step, or -1 if no other agent ever occupies the cell
+        """
+
+        parked = self.__parked.get(cell)
+        if parked is not None and parked[1] != agent:
+            return float('inf')
+
+        times = self.__cells.get(cell, {})
+        return max((time for time, other in times.items() if other != agent), default=-1)
+
+    def __len__(self):
+        """ Returns the number of single time step reservations in the table. """
+
+        return sum(len(times) for times in self.__cells.values())
+
+
+class CooperativePlanner:
+    """ Plans collision-free paths for many agents with Cooperative A* or WHCA*.
+
+    Every agent is searched in space-time, where a state is a (cell, time step) pair and an
+    agent may move to any walkable neighbour or wait in place. The true distance to the target,
+    read from a FlowField that is shared by all agents with the same target, is used as the
+    heuristic.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        window: number of time steps that are planned cooperatively in windowed mode, or None
+            to plan full paths
+        max_steps: the longest plan, in time steps, that will be searched for
+        table: the ReservationTable shared by all agents
+        fields: dict mapping target indices to their FlowField
+
+    Constants:
+        WAIT_COST: Cost of staying on the same cell for one time step
+    """
+
+    WAIT_COST = Engine.VERT_HORZ_COST
+
+    def __init__(self, engine, window=None, max_steps=None):
+        """ Initializes an instance of the CooperativePlanner class.
+
+        Args:
+            engine: the Engine object that describes the grid
+            window: number of time steps to plan cooperatively before replanning, or None
+            max_steps: the longest plan to search for (defaults to 4 * (rows + columns))
+        """
+
+        self.__engine = engine
+        self.__window = window
+        self.__max_steps = max_steps
+        if max_steps is None:
+            self.__max_steps = 4 * (engine.get_rows() + engine.get_columns())
+
+        self.__table = ReservationTable()
+        self.__fields = {}
+        self.__stats = {'expanded': 0, 'planned': 0, 'failed': 0, 'blocked': 0}
+
+        # State of the windowed replanning mode
+        self.__time = 0
+        self.__positions = []
+        self.__targets = []
+        self.__plans = []
+        self.__plan_starts = []
+
+    def get_table(self):
+        """ Gets the ReservationTable shared by all agents. """
+
+        return self.__table
+
+    def get_stats(self):
+        """ Gets the counters recorded since the planner was created. """
+
+        return self.__stats
+
+    def get_flow_field(self, target):
+        """ Gets the FlowField of a target, computing it the first time it is requested. """
+
+        field = self.__fields.get(target)
+        if field is None:
+            field = FlowField(self.__engine, target)
+            self.__fields[target] = field
+        return field
+
+    def plan(self, agents):
+        """ Plans full collision-free paths for all agents with Cooperative A*.
+
+        Agents are planned in the given order. Once an agent reaches its target it stays there,
+        so later agents plan around it. An agent whose path cannot be found stays on its start
+        cell.
+
+        Args:
+            agents: list of (start index, target index) tuples
+
+        Returns:
+            List with, for every agent, the list of cells it occupies at each time step
+            starting at time step 0, or None if no path was found
+        """
+
+        paths = []
+        for agent, (start, target) in enumerate(agents):
+            path = self.find_path(agent, start, target, 0)
+            if path is None:
+                self.__table.park(start, 0, agent)
+            else:
+                self.__table.reserve_path(path, 0, agent)
+                self.__table.park(target, len(path) - 1, agent)
+            paths.append(path)
+
+        return paths
+
+    def find_path(self, agent, start, target, start_time, window=None):
+        """ Finds a path for one agent in space-time that avoids all reservations.
+
+        Args:
+            agent: the agent to plan for
+            start: the index of the cell the agent is on at start_time
+            target: the index of the target cell
+            start_time: the time step at which the agent is on start
+            window: if given, the search stops once it is window time steps deep and the
+                remainder of the route is left to the heuristic
+
+        Returns:
+            List of cells the agent occupies at each time step from start_time, or None if no
+            path was found
+        """
+
+        field = self.get_flow_field(target)
+        if field.get_distance(start) is None:
+            self.__stats['failed'] += 1
+            return None
+
+        opened = MinPriorityQueue.MinPriorityQueue()
+        closed = set()
+        state = (start, start_time)
+        g_costs = {state: 0}
+        prev = {}
+
+        opened.insert(field.get_distance(start), state)
+
+        while True:
+            try:
+                state = opened.extract_min()
+            except IndexError:
+                self.__stats['failed'] += 1
+                return None
+
+            cell, time = state
+            depth = time - start_time
+
+            # The agent may stop on the target once nobody else needs the cell later on
+            at_goal = cell == target and self.__table.get_last_time(target, agent) < time
+            if at_goal or (window is not None and depth >= window):
+                self.__stats['planned'] += 1
+                return [c for c, _ in self.__engine.build_path(prev, (start, start_time), state)]
+
+            closed.add(state)
+            self.__stats['expanded'] += 1
+            if depth >= self.__max_steps:
+                continue
+
+            moves = self.__engine.get_neighbours(cell)
+            moves.append((cell, CooperativePlanner.WAIT_COST))
+
+            for adj, cost in moves:
+                adj_state = (adj, time + 1)
+                if adj_state in closed:
+                    continue
+                if not self.__table.is_free(adj, time + 1, agent):
+                    continue
+                if self.__table.is_swap(cell, adj, time, agent):
+                    continue
+
+                g_cost = g_costs[state] + cost
+                if adj_state not in g_costs or g_cost < g_costs[adj_state]:
+                    g_costs[adj_state] = g_cost
+                    prev[adj_state] = state
+                    f_cost = g_cost + field.get_distance(adj)
+                    if opened.element_exists(adj_state):
+                        opened.decrease_key(adj_state, f_cost)
+                    else:
+                        opened.insert(f_cost, adj_state)
+
+
+    # ---------------------------------------
+    # Methods related to windowed replanning
+    # ---------------------------------------
+
+    def start(self, agents):
+        """ Starts a windowed (WHCA*) run for the given agents.
+
+        In windowed mode only the next window time steps of every agent are planned
+        cooperatively. Agents replan after executing half of their window, so the cost of a
+        single tick stays bounded no matter how long the paths are.
+
+        Args:
+            agents: list of (start index, target index) tuples
+
+        Raises:
+            ValueError: the planner was created without a window
+        """
+
+        if self.__window is None:
+            raise ValueError('Windowed replanning requires a window')
+
+        self.__table = ReservationTable()
+        self.__time = 0
+        self.__positions = [start for start, _ in agents]
+        self.__targets = [target for _, target in agents]
+        self.__plans = [None] * len(agents)
+        self.__plan_starts = [0] * len(agents)
+
+    def tick(self):
+        """ Advances every agent by one time step, replanning those that need it.
+
+        Returns:
+            List of the cell every agent is on after the tick
+        """
+
+        for agent in range(len(self.__positions)):
+            if self.needs_replan(agent):
+                self.replan(agent)
+
+        self.__time += 1
+        for agent, plan in enumerate(self.__plans):
+            step = self.__time - self.__plan_starts[agent]
+            if step < len(plan):
+                self.__positions[agent] = plan[step]
+
+        # Reservations in the past can never conflict again
+        if self.__time % self.__window == 0:
+            self.__table.prune(self.__time)
+
+        return list(self.__positions)
+
+    def needs_replan(self, agent):
+        """ Returns True if an agent has executed half of its window or has no plan. """
+
+        plan = self.__plans[agent]
+        if plan is None:
+            return True
+
+        # Agents that have arrived stay parked on their target
+        target = self.__targets[agent]
+        if self.__positions[agent] == target and self.__table.is_parked(target, agent):
+            return False
+
+        # Plans cut short by another agent end before half of the window
+        step = self.__time - self.__plan_starts[agent]
+        return step >= min(len(plan) - 1, max(1, self.__window // 2))
+
+    def replan(self, agent):
+        """ Releases the reservations of an agent and plans its next window. """
+
+        self.__table.release(agent)
+        position = self.__positions[agent]
+        target = self.__targets[agent]
+
+        plan = self.find_path(agent, position, target, self.__time, self.__window)
+        if plan is None:
+            plan = self.wait_in_place(agent, position)
+
+        # Only park on the target once no other agent needs the cell afterwards
+        self.__table.reserve_path(plan, self.__time, agent)
+        arrival = self.__time + len(plan) - 1
+        if plan[-1] == target and self.__table.get_last_time(target, agent) < arrival:
+            self.__table.park(target, arrival, agent)
+
+        self.__plans[agent] = plan
+        self.__plan_starts[agent] = self.__time
+
+    def wait_in_place(self, agent, position):
+        """ Gets a plan that waits on the current cell for at most a whole window.
+
+        The wait ends before the first time step at which another agent has reserved the cell,
+        so no reservation of another agent is overwritten. An agent that cannot wait for the
+        whole window is counted as blocked and replans as soon as its wait ends.
+
+        Args:
+            agent: the agent that waits
+            position: the cell the agent is on
+
+        Returns:
+            List with the cell once per time step, starting at the current time step
+        """
+
+        plan = [position]
+        while (len(plan) <= self.__window
+               and self.__table.is_free(position, self.__time + len(plan), agent)):
+            plan.append(position)
+
+        if len(plan) <= self.__window:
+            self.__stats['blocked'] += 1
+        return plan
+
+    def is_finished(self):
+        """ Returns True if every agent in the windowed run is on its target. """
+
+        return self.__positions == self.__targets
+
+    def get_time(self):
+        """ Gets the current time step of the windowed run. """
+
+        return self.__time
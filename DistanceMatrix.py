@@ -0,0 +1,132 @@
+""" Python script that contains the DistanceMatrix class definition.
+
+DistanceMatrix class computes the path costs between every pair of a list of waypoints, for
+example to decide in which order to visit them. Instead of one A* search per pair, a single
+search runs from every waypoint and stops as soon as every other waypoint has been settled
+(see Engine.solve_costs), so k waypoints need k searches instead of k * k. Movement costs are
+symmetric, so the search from each waypoint can skip the waypoints whose searches already ran.
+"""
+
+from array import array
+from Batch import BatchResult
+import ParallelSolver
+
+
+def solve_costs_in_worker(task):
+    """ Runs Engine.solve_costs for a (source, targets) task in a ParallelSolver worker. """
+
+    source, targets = task
+    return ParallelSolver.get_worker_engine().solve_costs(source, targets)
+
+
+class DistanceMatrix:
+    """ Dense matrix of the path costs between every pair of waypoints.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        waypoints: list of the indices of the waypoint cells
+        costs: array('I') of k * k path costs in row-major order, where entry i * k + j is the
+            cost from waypoint i to waypoint j
+        paths: dict caching the paths retrieved with get_path
+        stats: dict with the number of searches that were run
+
+    Constants:
+        NO_PATH: the cost of pairs of waypoints that are not connected
+    """
+
+    NO_PATH = BatchResult.NO_PATH
+
+    def __init__(self, engine, waypoints, symmetric=True, solver=None):
+        """ Initializes an instance of the DistanceMatrix class and computes the costs.
+
+        Args:
+            engine: the Engine object that describes the grid
+            waypoints: list of the indices of the waypoint cells
+            symmetric: bool that determines if the search from waypoint i only settles the
+                waypoints after i, and the rest of the matrix is mirrored
+            solver: optional ParallelSolver over the same grid whose worker processes run
+                the searches
+        """
+
+        self.__engine = engine
+        self.__waypoints = list(waypoints)
+        self.__paths = {}
+
+        k = len(self.__waypoints)
+        self.__costs = array('I', [DistanceMatrix.NO_PATH]) * (k * k)
+        for i, waypoint in enumerate(self.__waypoints):
+            if engine.is_walkable(waypoint):
+                self.__costs[i * k + i] = 0
+
+        # The search from waypoint i settles the waypoints it still needs
+        tasks = []
+        for i in range(k):
+            columns = [j for j in range(i + 1 if symmetric else 0, k) if j != i]
+            if columns:
+                tasks.append((i, columns))
+        self.__stats = {'searches': len(tasks)}
+
+        queries = [(self.__waypoints[i], [self.__waypoints[j] for j in columns])
+                   for i, columns in tasks]
+        if solver is not None:
+            rows = solver.map_tasks(solve_costs_in_worker, queries)
+        else:
+            rows = [engine.solve_costs(source, targets) for source, targets in queries]
+
+        for (i, columns), row in zip(tasks, rows):
+            for j, cost in zip(columns, row):
+                self.__costs[i * k + j] = cost
+                if symmetric:
+                    self.__costs[j * k + i] = cost
+
+    def __len__(self):
+        """ Returns the number of waypoints. """
+
+        return len(self.__waypoints)
+
+    def get_waypoints(self):
+        """ Gets the list of the indices of the waypoint cells. """
+
+        return self.__waypoints
+
+    def get_costs(self):
+        """ Gets the array of k * k path costs in row-major order. """
+
+        return self.__costs
+
+    def get_stats(self):
+        """ Gets the number of searches that were run. """
+
+        return self.__stats
+
+    def get_cost(self, i, j):
+        """ Gets the path cost from waypoint i to waypoint j, or None if there is no path. """
+
+        cost = self.__costs[i * len(self.__waypoints) + j]
+        if cost == DistanceMatrix.NO_PATH:
+            return None
+        return cost
+
+    def get_row(self, i):
+        """ Gets the list of path costs from waypoint i to every waypoint. """
+
+        k = len(self.__waypoints)
+        return self.__costs[i * k:(i + 1) * k].tolist()
+
+    def get_path(self, i, j):
+        """ Gets a cheapest path from waypoint i to waypoint j.
+
+        Paths are not kept by the searches that fill the matrix, so they are found with A*
+        when they are first asked for and cached.
+
+        Returns:
+            List of cell indices from waypoint i to waypoint j (inclusive), or None if there is
+            no path
+        """
+
+        if self.get_cost(i, j) is None:
+            return None
+        if (i, j) not in self.__paths:
+            self.__paths[(i, j)] = self.__engine.find_path(self.__waypoints[i],
+                                                           self.__waypoints[j])
+        return self.__paths[(i, j)]
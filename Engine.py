@@ -0,0 +1,365 @@
+""" Python script that contains the Engine class definition.
+
+Engine class is a headless implementation of the A* pathfinding algorithm. Instead of the
+two-dimensional list of Node objects used by the Grid class, it works on a compact row-major
+walkability array, so it can be used without pygame and on grids that are far larger than
+what the visualizer can display.
+"""
+
+import Search
+import Batch
+import Isochrone
+import Bitboard
+
+
+class Engine:
+    """ Headless A* pathfinding over a compact walkability array.
+
+    Cells are identified by their row-major index (row * columns + column). The movement
+    model matches the Grid class: 8-connected movement where vertical/horizontal steps cost
+    VERT_HORZ_COST and diagonal steps cost DIAG_COST.
+
+    Attributes:
+        walkable: sequence or flat memoryview with one entry per cell, truthy if walkable
+        columns: number of columns in the grid
+        rows: number of rows in the grid
+        stats: dict of counters recorded during the most recent search
+
+    Constants:
+        VERT_HORZ_COST: Cost of vertical/horizontal path movement
+        DIAG_COST: Cost of diagonal path movement
+        DIRECTIONS: (row offset, column offset, cost) of the eight movement directions. The
+            opposite of direction d is always d ^ 1.
+    """
+
+    VERT_HORZ_COST = 10
+    DIAG_COST = 14
+
+    DIRECTIONS = (
+        (-1, 0, VERT_HORZ_COST), (1, 0, VERT_HORZ_COST),
+        (0, -1, VERT_HORZ_COST), (0, 1, VERT_HORZ_COST),
+        (-1, -1, DIAG_COST), (1, 1, DIAG_COST),
+        (1, -1, DIAG_COST), (-1, 1, DIAG_COST)
+        )
+
+    def __init__(self, walkable, columns, rows):
+        """ Initializes an instance of the Engine class.
+
+        Args:
+            walkable: sequence with one entry per cell in row-major order, truthy if walkable,
+                or any object supporting the buffer protocol (see Engine.as_layer)
+            columns: number of columns in the grid
+            rows: number of rows in the grid
+
+        Raises:
+            ValueError: walkable does not contain exactly columns * rows entries, or is a
+                buffer that cannot be used without copying
+        """
+
+        self.__walkable = Engine.as_layer(walkable, columns, rows)
+        self.__columns = columns
+        self.__rows = rows
+        self.__stats = {}
+        self.__batch_solver = None
+
+    @staticmethod
+    def as_layer(layer, columns, rows):
+        """ Validates a per-cell layer once and gets a flat view of it.
+
+        Objects that support the buffer protocol (NumPy arrays, bytes, bytearray, array,
+        memoryview, mmap) are used in place through a one-dimensional memoryview. They may be
+        flat with columns * rows entries or two-dimensional with shape (rows, columns), and
+        must be C-contiguous so that index row * columns + column addresses the right cell.
+        Other sequences are used as they are.
+
+        Args:
+            layer: the per-cell layer in row-major order
+            columns: number of columns in the grid
+            rows: number of rows in the grid
+
+        Raises:
+            ValueError: the layer has the wrong size or shape, is not C-contiguous, or has an
+                item format that memoryview cannot index
+
+        Returns:
+            A flat memoryview over the buffer, or layer itself if it is not a buffer
+        """
+
+        try:
+            # Existing views are kept, so their owner can still release them
+            view = layer if isinstance(layer, memoryview) else memoryview(layer)
+        except TypeError:
+            if len(layer) != columns * rows:
+                raise ValueError('layer must contain exactly columns * rows entries')
+            return layer
+
+        if view.ndim == 2 and view.shape != (rows, columns):
+            raise ValueError('layer has shape {0} instead of ({1}, {2})'.format(
+                view.shape, rows, columns))
+        if view.ndim not in (1, 2) or view.ndim == 1 and len(view) != columns * rows:
+            raise ValueError('layer must contain exactly columns * rows entries')
+        if not view.c_contiguous:
+            raise ValueError('layer must be C-contiguous')
+
+        try:
+            if view.ndim == 2:
+                view = view.cast('B').cast(view.format)
+            view[0:0].tolist()
+        except (TypeError, ValueError, NotImplementedError):
+            raise ValueError('layer item format {0!r} is not supported'.format(view.format))
+        return view
+
+    def get_columns(self):
+        """ Gets the number of columns in the grid. """
+
+        return self.__columns
+
+    def get_rows(self):
+        """ Gets the number of rows in the grid. """
+
+        return self.__rows
+
+    def get_walkable(self):
+        """ Gets the walkability array of the grid. """
+
+        return self.__walkable
+
+    def get_stats(self):
+        """ Gets the counters recorded during the most recent search. """
+
+        return self.__stats
+
+    def get_index(self, row, col):
+        """ Gets the row-major index of the cell at the given row and column. """
+
+        return row * self.__columns + col
+
+    def get_row_col(self, index):
+        """ Gets the (row, column) of the cell with the given row-major index. """
+
+        return divmod(index, self.__columns)
+
+    def get_layers(self):
+        """ Gets the number of layers of the grid. An Engine grid has a single layer. """
+
+        return 1
+
+    def get_layer(self, index):
+        """ Gets the layer of the cell with the given index. """
+
+        return 0
+
+    def get_links(self, index):
+        """ Gets the (index, cost) of the cells linked to the given cell besides its neighbours.
+
+        Cells of an Engine grid have no links. Solvers that move by direction with
+        get_neighbour follow the links of layered grids (see LayeredEngine) through this method.
+        """
+
+        return ()
+
+    def get_all_links(self):
+        """ Gets every link of the grid as an (index, index, cost) tuple. There are none. """
+
+        return []
+
+    def is_walkable(self, index):
+        """ Returns True if the cell with the given index is walkable. """
+
+        return bool(self.__walkable[index])
+
+    def get_neighbour(self, index, direction):
+        """ Gets the walkable cell adjacent to a cell in a given direction.
+
+        Args:
+            index: the index of the cell
+            direction: index into Engine.DIRECTIONS
+
+        Returns:
+            The index of the adjacent cell, or None if it is off the grid or an obstacle
+        """
+
+        row, col = divmod(index, self.__columns)
+        i, j, _ = Engine.DIRECTIONS[direction]
+        row += i
+        col += j
+        if 0 <= row < self.__rows and 0 <= col < self.__columns:
+            adj = row * self.__columns + col
+            if self.__walkable[adj]:
+                return adj
+        return None
+
+    def get_neighbours(self, index):
+        """ Gets all walkable cells adjacent to the given cell.
+
+        Args:
+            index: the index of the cell
+
+        Returns:
+            adjacent: list of (index, cost) tuples for every walkable adjacent cell
+        """
+
+        adjacent = []
+        row, col = divmod(index, self.__columns)
+
+        for i, j, cost in Engine.DIRECTIONS:
+            if 0 <= row + i < self.__rows and 0 <= col + j < self.__columns:
+                adj = (row + i) * self.__columns + col + j
+                if self.__walkable[adj]:
+                    adjacent.append((adj, cost))
+
+        return adjacent
+
+    def get_h_cost(self, index, target):
+        """ Gets the octile distance between two cells.
+
+        Args:
+            index: the index of the first cell
+            target: the index of the second cell
+
+        Returns:
+            The cost of the cheapest path between the cells if there were no obstacles
+        """
+
+        row, col = divmod(index, self.__columns)
+        target_row, target_col = divmod(target, self.__columns)
+        vdist = abs(row - target_row)
+        hdist = abs(col - target_col)
+
+        diag = min(vdist, hdist)
+        updown = max(vdist, hdist) - diag
+        return diag * Engine.DIAG_COST + updown * Engine.VERT_HORZ_COST
+
+    def find_path(self, start, target, heuristic=None):
+        """ Find a path from the start cell to the target cell.
+
+        Finds the cheapest path between the two cells using the A* pathfinding algorithm.
+
+        Args:
+            start: the index of the start cell
+            target: the index of the target cell
+            heuristic: function taking (index, target) that returns an admissible estimate of
+                the path cost between the cells (defaults to Engine.get_h_cost)
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if there is no path
+        """
+
+        search = Search.Search(self, start, target, heuristic)
+        path = search.run()
+        self.__stats = search.get_stats()
+        return path
+
+    def solve_many(self, pairs):
+        """ Finds the cheapest paths for a batch of (start, target) queries.
+
+        Queries that share a target are answered by a single search, and the search buffers
+        are reused across calls.
+
+        Args:
+            pairs: iterable of (start index, target index) tuples
+
+        Returns:
+            A Batch.BatchResult holding the path costs and paths in the order of pairs
+        """
+
+        solver = self.get_batch_solver()
+        result = solver.solve_many(pairs)
+        self.__stats = solver.get_stats()
+        return result
+
+    def solve_costs(self, source, targets):
+        """ Finds the path costs from one cell to many cells with a single search.
+
+        Args:
+            source: the index of the source cell
+            targets: iterable of target cell indices
+
+        Returns:
+            List of the path cost to every target, or Batch.BatchResult.NO_PATH if it cannot be
+            reached, in the order of targets
+        """
+
+        solver = self.get_batch_solver()
+        costs = solver.solve_costs(source, targets)
+        self.__stats = solver.get_stats()
+        return costs
+
+    def get_batch_solver(self):
+        """ Gets the BatchSolver whose search buffers are reused by solve_many and solve_costs.
+        """
+
+        if self.__batch_solver is None:
+            self.__batch_solver = Batch.BatchSolver(self)
+        return self.__batch_solver
+
+    def has_path(self, start, target):
+        """ Checks if there is any path between two cells with a bit-parallel search.
+
+        The walkability of the grid is packed into a new Bitboard on every call, one bit per
+        cell, so edits to the walkability array are always seen. Many queries over a grid that
+        does not change are cheaper on a single Bitboard.
+
+        Args:
+            start: the index of the start cell
+            target: the index of the target cell
+
+        Returns:
+            True if both cells are walkable and connected, False otherwise
+        """
+
+        return Bitboard.Bitboard(self).has_path(start, target)
+
+    def find_reachable(self, source, budget, vectorized=False):
+        """ Finds every cell that can be reached from a source cell within a path cost budget.
+
+        Args:
+            source: the index of the source cell
+            budget: the largest path cost of a reachable cell
+            vectorized: bool that determines if the NumPy wavefront should be used
+
+        Returns:
+            An Isochrone.Isochrone holding the mask and path costs of the reachable cells
+        """
+
+        return Isochrone.Isochrone(self, source, budget, vectorized)
+
+    def build_path(self, prev, start, target):
+        """ Walks prev pointers back from target to start.
+
+        Args:
+            prev: mapping (dict or array) from a cell index to the index it was reached from
+            start: the index of the start cell
+            target: the index of the target cell
+
+        Returns:
+            List of cell indices from start to target (inclusive)
+        """
+
+        path = [target]
+        current = target
+        while current != start:
+            current = prev[current]
+            path.append(current)
+        path.reverse()
+        return path
+
+    def get_path_cost(self, path):
+        """ Gets the total movement cost of a path of adjacent cells.
+
+        Args:
+            path: list of cell indices where consecutive cells are adjacent
+
+        Returns:
+            The sum of the costs of every step in the path
+        """
+
+        cost = 0
+        for a, b in zip(path, path[1:]):
+            a_row, a_col = divmod(a, self.__columns)
+            b_row, b_col = divmod(b, self.__columns)
+            if a_row != b_row and a_col != b_col:
+                cost += Engine.DIAG_COST
+            else:
+                cost += Engine.VERT_HORZ_COST
+        return cost
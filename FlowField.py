@@ -0,0 +1,237 @@
+""" Python script that contains the FlowField class definition.
+
+FlowField class holds the result of a single reverse Dijkstra search from a target cell over
+the whole grid. It stores the path cost to the target and the next step towards the target for
+every cell in compact arrays, so any number of agents heading to the same target can read
+their path without searching again.
+"""
+
+from array import array
+import MinPriorityQueue
+from Engine import Engine
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class FlowField:
+    """ Distance field and next-step directions towards a single target cell.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        target: the index of the target cell
+        distances: array of unsigned 32-bit path costs to the target, one entry per cell
+        directions: bytearray holding, for every cell, the index into Engine.DIRECTIONS of
+            the next step towards the target, or LINK if the next step follows a link
+
+    Constants:
+        UNREACHABLE: distance of cells that have no path to the target
+        NO_DIRECTION: direction of the target cell and of unreachable cells
+        LINK: direction of cells whose next step is a link between layers (see LayeredEngine)
+    """
+
+    UNREACHABLE = 0xFFFFFFFF
+    NO_DIRECTION = 255
+    LINK = 254
+
+    def __init__(self, engine, target, vectorized=False):
+        """ Initializes an instance of the FlowField class.
+
+        Args:
+            engine: the Engine object that describes the grid
+            target: the index of the target cell
+            vectorized: bool that determines if the NumPy wavefront should be used instead
+                of Dijkstra's algorithm. It is faster on grids with few obstacles.
+
+        Raises:
+            ImportError: vectorized is True but NumPy is not installed
+            ValueError: vectorized is True and the grid has more than one layer
+        """
+
+        self.__engine = engine
+        self.__target = target
+
+        if vectorized:
+            self.__distances, self.__directions = self.build_vectorized()
+        else:
+            self.__distances, self.__directions = self.build()
+
+    def build(self):
+        """ Runs Dijkstra's algorithm outwards from the target cell.
+
+        Movement costs are symmetric, so the cost of reaching a cell from the target is also
+        the cost of reaching the target from that cell.
+
+        Returns:
+            (distances, directions) arrays of the flow field
+        """
+
+        size = self.__engine.get_columns() * self.__engine.get_rows()
+        distances = array('I', [FlowField.UNREACHABLE]) * size
+        directions = bytearray([FlowField.NO_DIRECTION]) * size
+
+        opened = MinPriorityQueue.MinPriorityQueue()
+        distances[self.__target] = 0
+        opened.insert(0, self.__target)
+
+        while True:
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                break
+
+            for direction in range(len(Engine.DIRECTIONS)):
+                adj = self.__engine.get_neighbour(current, direction)
+                if adj is None:
+                    continue
+                distance = distances[current] + Engine.DIRECTIONS[direction][2]
+                if distance < distances[adj]:
+                    if distances[adj] == FlowField.UNREACHABLE:
+                        opened.insert(distance, adj)
+                    else:
+                        opened.decrease_key(adj, distance)
+                    distances[adj] = distance
+                    # The step from adj back to current is the opposite direction
+                    directions[adj] = direction ^ 1
+
+            for adj, cost in self.__engine.get_links(current):
+                distance = distances[current] + cost
+                if distance < distances[adj]:
+                    if distances[adj] == FlowField.UNREACHABLE:
+                        opened.insert(distance, adj)
+                    else:
+                        opened.decrease_key(adj, distance)
+                    distances[adj] = distance
+                    directions[adj] = FlowField.LINK
+
+        return distances, directions
+
+    def build_vectorized(self):
+        """ Computes the flow field with a NumPy wavefront.
+
+        Every iteration relaxes all cells against all eight neighbours at once, so the number
+        of iterations is the length (in steps) of the longest shortest path. This is much faster
+        than Dijkstra's algorithm on open grids, but slow on maze-like grids.
+
+        Raises:
+            ImportError: NumPy is not installed
+            ValueError: the grid has more than one layer
+
+        Returns:
+            (distances, directions) arrays of the flow field
+        """
+
+        if numpy is None:
+            raise ImportError('The vectorized flow field requires NumPy')
+        if self.__engine.get_layers() > 1:
+            raise ValueError('The vectorized flow field does not follow links between layers')
+
+        rows = self.__engine.get_rows()
+        columns = self.__engine.get_columns()
+        walkable = numpy.asarray(self.__engine.get_walkable()).reshape(rows, columns) != 0
+
+        infinity = numpy.int64(FlowField.UNREACHABLE)
+        distances = numpy.full((rows, columns), infinity, dtype=numpy.int64)
+        distances.flat[self.__target] = 0
+
+        while True:
+            relaxed = distances.copy()
+            for i, j, cost in Engine.DIRECTIONS:
+                dst, src = FlowField.shifted_slices(i, j, rows, columns)
+                numpy.minimum(relaxed[dst], distances[src] + cost, out=relaxed[dst])
+            relaxed[~walkable] = infinity
+            relaxed.flat[self.__target] = 0
+            if numpy.array_equal(relaxed, distances):
+                break
+            distances = relaxed
+
+        # Lowest direction index wins ties, so assign directions in reverse order
+        directions = numpy.full((rows, columns), FlowField.NO_DIRECTION, dtype=numpy.uint8)
+        for direction in range(len(Engine.DIRECTIONS) - 1, -1, -1):
+            i, j, cost = Engine.DIRECTIONS[direction]
+            dst, src = FlowField.shifted_slices(i, j, rows, columns)
+            step = (distances[src] + cost == distances[dst]) & walkable[src]
+            step &= distances[dst] < infinity
+            directions[dst][step] = direction
+        directions.flat[self.__target] = FlowField.NO_DIRECTION
+
+        distances = array('I', distances.astype(numpy.uint32).tobytes())
+        return distances, bytearray(directions.tobytes())
+
+    @staticmethod
+    def shifted_slices(i, j, rows, columns):
+        """ Gets the slices that pair every cell with its neighbour at offset (i, j).
+
+        Returns:
+            (dst, src) tuples of slices such that array[src] holds the neighbours of array[dst]
+        """
+
+        dst = (slice(max(0, -i), rows - max(0, i)), slice(max(0, -j), columns - max(0, j)))
+        src = (slice(max(0, i), rows + min(0, i)), slice(max(0, j), columns + min(0, j)))
+        return dst, src
+
+    def get_target(self):
+        """ Gets the index of the target cell. """
+
+        return self.__target
+
+    def get_distances(self):
+        """ Gets the array of path costs to the target. """
+
+        return self.__distances
+
+    def get_directions(self):
+        """ Gets the array of next-step directions. """
+
+        return self.__directions
+
+    def get_distance(self, index):
+        """ Gets the path cost from a cell to the target, or None if it is unreachable. """
+
+        distance = self.__distances[index]
+        if distance == FlowField.UNREACHABLE:
+            return None
+        return distance
+
+    def get_max_distance(self):
+        """ Gets the largest path cost of any cell that can reach the target. """
+
+        return max((d for d in self.__distances if d != FlowField.UNREACHABLE), default=0)
+
+    def get_next_step(self, index):
+        """ Gets the next cell on the path from a cell to the target.
+
+        Returns:
+            The index of the next cell, or None for the target and for unreachable cells
+        """
+
+        direction = self.__directions[index]
+        if direction == FlowField.NO_DIRECTION:
+            return None
+        if direction == FlowField.LINK:
+            distance = self.__distances[index]
+            return next(adj for adj, cost in self.__engine.get_links(index)
+                        if self.__distances[adj] + cost == distance)
+        return self.__engine.get_neighbour(index, direction)
+
+    def get_path(self, start):
+        """ Reads the path from a start cell to the target in O(path length).
+
+        Args:
+            start: the index of the start cell
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if there is no path
+        """
+
+        if self.__distances[start] == FlowField.UNREACHABLE:
+            return None
+
+        path = [start]
+        current = start
+        while current != self.__target:
+            current = self.get_next_step(current)
+            path.append(current)
+        return path
@@ -0,0 +1,203 @@
+""" Python script that contains the FrameProfiler class definition.
+
+FrameProfiler class records how long every phase of a frame of the visualizer takes (event
+handling, solver steps, drawing and the display update) together with the number of cells the
+solver expanded. The most recent frames are kept in fixed-size ring buffers, so profiling can
+stay enabled for a whole session, and rolling percentiles of any phase can be read at any time.
+"""
+
+from array import array
+import csv
+import time
+from Percentiles import PERCENTILES, get_percentile
+
+
+class FrameProfiler:
+    """ Ring buffers of per-phase frame times.
+
+    Frame i of the buffers is stored in slot i % capacity. Phase times of frame f are
+    times[f % capacity * len(phases) + p] for the p-th phase, in seconds.
+
+    Attributes:
+        phases: tuple of the names of the timed phases of a frame
+        capacity: the number of frames kept
+        times: array('d') of the time of every phase of the kept frames
+        durations: array('d') of the wall time between the start of every kept frame and the
+            start of the next one
+        expansions: array('I') of the number of cells expanded in every kept frame
+        frames: the number of frames recorded so far
+        current: dict of the time of every phase of the frame in progress
+        frame_start: the time.perf_counter() value at the start of the frame in progress
+
+    Constants:
+        DEFAULT_CAPACITY: the default number of frames kept
+    """
+
+    DEFAULT_CAPACITY = 600
+
+    def __init__(self, phases, capacity=DEFAULT_CAPACITY):
+        """ Initializes an instance of the FrameProfiler class.
+
+        Args:
+            phases: list of the names of the timed phases of a frame
+            capacity: the number of frames kept
+
+        Raises:
+            ValueError: capacity is not positive
+        """
+
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+
+        self.__phases = tuple(phases)
+        self.__capacity = capacity
+        self.__times = array('d', [0.0]) * (capacity * len(self.__phases))
+        self.__durations = array('d', [0.0]) * capacity
+        self.__expansions = array('I', [0]) * capacity
+        self.__frames = 0
+        self.__current = dict.fromkeys(self.__phases, 0.0)
+        self.__current_expansions = 0
+        self.__frame_start = None
+
+    def get_phases(self):
+        """ Gets the names of the timed phases of a frame. """
+
+        return self.__phases
+
+    def get_frames(self):
+        """ Gets the number of frames recorded so far. """
+
+        return self.__frames
+
+    def __len__(self):
+        """ Returns the number of frames kept in the buffers. """
+
+        return min(self.__frames, self.__capacity)
+
+    def begin_frame(self):
+        """ Ends the previous frame, if any, and starts timing a new one. """
+
+        now = time.perf_counter()
+        if self.__frame_start is not None:
+            self.end_frame(now)
+        self.__frame_start = now
+
+    def end_frame(self, now=None):
+        """ Stores the frame in progress in the ring buffers.
+
+        Args:
+            now: the time.perf_counter() value at the end of the frame
+        """
+
+        if self.__frame_start is None:
+            return
+        if now is None:
+            now = time.perf_counter()
+
+        slot = self.__frames % self.__capacity
+        base = slot * len(self.__phases)
+        for p, phase in enumerate(self.__phases):
+            self.__times[base + p] = self.__current[phase]
+            self.__current[phase] = 0.0
+        self.__durations[slot] = now - self.__frame_start
+        self.__expansions[slot] = self.__current_expansions
+        self.__current_expansions = 0
+        self.__frames += 1
+        self.__frame_start = None
+
+    def measure(self, phase, function, *args):
+        """ Calls a function and adds the time it took to a phase of the frame in progress.
+
+        Args:
+            phase: the name of the phase
+            function: the function to call
+            args: the arguments of the function
+
+        Returns:
+            The return value of the function
+        """
+
+        begin = time.perf_counter()
+        result = function(*args)
+        self.__current[phase] += time.perf_counter() - begin
+        return result
+
+    def add_expansions(self, count):
+        """ Adds cells expanded by the solver to the frame in progress. """
+
+        self.__current_expansions += count
+
+    def get_slots(self):
+        """ Gets the slots of the kept frames from the oldest to the most recent. """
+
+        if self.__frames <= self.__capacity:
+            return range(self.__frames)
+        first = self.__frames % self.__capacity
+        return [(first + i) % self.__capacity for i in range(self.__capacity)]
+
+    def get_times(self, phase):
+        """ Gets the times of a phase, or the durations of the frames for 'frame', in seconds.
+
+        Raises:
+            ValueError: phase is not one of the phases
+
+        Returns:
+            List of the times of the kept frames from the oldest to the most recent
+        """
+
+        if phase == 'frame':
+            return [self.__durations[slot] for slot in self.get_slots()]
+        p = self.__phases.index(phase)
+        width = len(self.__phases)
+        return [self.__times[slot * width + p] for slot in self.get_slots()]
+
+    def get_fps(self):
+        """ Gets the number of frames per second over the kept frames. """
+
+        total = sum(self.__durations[slot] for slot in self.get_slots())
+        return len(self) / total if total > 0 else 0.0
+
+    def get_expansion_rate(self):
+        """ Gets the number of cells expanded per second over the kept frames. """
+
+        slots = self.get_slots()
+        total = sum(self.__durations[slot] for slot in slots)
+        expanded = sum(self.__expansions[slot] for slot in slots)
+        return expanded / total if total > 0 else 0.0
+
+    def get_summary(self):
+        """ Gets lines of text describing the kept frames, for an on-screen overlay.
+
+        Returns:
+            List of strings: the frame rate, one line of percentiles in milliseconds for the
+            frame and for every phase, and the expansion rate of the solver
+        """
+
+        lines = ['{0:.1f} FPS over {1} frames'.format(self.get_fps(), len(self))]
+        for phase in ('frame',) + self.__phases:
+            times = self.get_times(phase)
+            lines.append('{0:<7} '.format(phase) + ' '.join(
+                'p{0:g} {1:6.2f}'.format(100 * fraction,
+                                         1000 * get_percentile(times, fraction))
+                for fraction in PERCENTILES))
+        lines.append('{0:.0f} expansions/sec'.format(self.get_expansion_rate()))
+        return lines
+
+    def write_csv(self, path):
+        """ Writes the kept frames to a CSV file, one row per frame, times in milliseconds.
+
+        Args:
+            path: the path of the file to write
+        """
+
+        width = len(self.__phases)
+        first = self.__frames - len(self)
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(('frame', 'frame_ms') + tuple(phase + '_ms' for phase in
+                                                         self.__phases) + ('expansions',))
+            for i, slot in enumerate(self.get_slots()):
+                writer.writerow([first + i, '%.3f' % (1000 * self.__durations[slot])]
+                                + ['%.3f' % (1000 * self.__times[slot * width + p])
+                                   for p in range(width)]
+                                + [self.__expansions[slot]])
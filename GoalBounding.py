@@ -0,0 +1,359 @@
+""" Python script that contains the GoalBounding class definition.
+
+GoalBounding class prunes the edges that A* has to follow on a static map. For every cell and
+every one of its eight movement directions, it precomputes the bounding box of all the cells
+whose cheapest path from that cell starts with a step in that direction. During a search, a step
+whose box does not contain the target cannot start a cheapest path to it and is skipped, so the
+search stays close to the cheapest path instead of flooding around obstacles.
+
+The boxes take one Dijkstra search per cell to build, which is spread over the worker processes
+of a ParallelSolver and stored with save or in a PrecomputeCache so it is done once per map.
+"""
+
+from array import array
+import struct
+import sys
+import MinPriorityQueue
+import ParallelSolver
+from Engine import Engine
+from Landmarks import Landmarks
+
+
+def bound_sources(engine, sources):
+    """ Computes the bounding boxes of the cheapest paths starting at a list of cells.
+
+    Every source runs Dijkstra's algorithm over the whole grid, and every cell it reaches
+    inherits the first step of the path to the cell it was reached from. Steps only cost
+    VERT_HORZ_COST or DIAG_COST, so the open list is a ring of DIAG_COST + 1 buckets indexed
+    by distance instead of a heap.
+
+    Args:
+        engine: the Engine object that describes the grid
+        sources: list of the indices of the source cells
+
+    Returns:
+        array('h') of the boxes of every source in the order of sources, laid out as in
+        GoalBounding
+    """
+
+    columns = engine.get_columns()
+    size = columns * engine.get_rows()
+    count = len(Engine.DIRECTIONS)
+    boxes = array('h', GoalBounding.EMPTY_BOX) * (count * len(sources))
+
+    # The neighbours of every cell are looked up once for all sources
+    adjacent = []
+    for cell in range(size):
+        steps = []
+        for direction in range(count):
+            adj = engine.get_neighbour(cell, direction)
+            if adj is not None:
+                steps.append((adj, Engine.DIRECTIONS[direction][2], direction))
+        adjacent.append(steps)
+    positions = [divmod(cell, columns) for cell in range(size)]
+    width = Engine.DIAG_COST + 1
+
+    for s, source in enumerate(sources):
+        if not engine.is_walkable(source):
+            continue
+
+        base = s * count * 4
+        distances = {source: 0}
+        first = {}
+        buckets = [[] for _ in range(width)]
+        buckets[0].append(source)
+        pending = 1
+        distance = 0
+        while pending:
+            bucket = buckets[distance % width]
+            while bucket:
+                current = bucket.pop()
+                pending -= 1
+                # Cells are added again when their distance improves, so stale entries are
+                # skipped
+                if distances[current] != distance:
+                    continue
+
+                if current != source:
+                    row, col = positions[current]
+                    box = base + first[current] * 4
+                    if row < boxes[box]:
+                        boxes[box] = row
+                    if col < boxes[box + 1]:
+                        boxes[box + 1] = col
+                    if row > boxes[box + 2]:
+                        boxes[box + 2] = row
+                    if col > boxes[box + 3]:
+                        boxes[box + 3] = col
+
+                for adj, cost, direction in adjacent[current]:
+                    new_distance = distance + cost
+                    old_distance = distances.get(adj)
+                    if old_distance is None or new_distance < old_distance:
+                        distances[adj] = new_distance
+                        first[adj] = direction if current == source else first[current]
+                        buckets[new_distance % width].append(adj)
+                        pending += 1
+            distance += 1
+
+    return boxes
+
+
+def bound_sources_in_worker(sources):
+    """ Runs bound_sources for a range of source cells in a ParallelSolver worker. """
+
+    return bound_sources(ParallelSolver.get_worker_engine(), list(sources)).tobytes()
+
+
+class GoalBounding:
+    """ Precomputed goal bounds of every edge of a grid and A* search that uses them.
+
+    The boxes are stored in a single array of signed 16-bit integers. The box of direction d of
+    cell v is the four entries starting at (v * 8 + d) * 4: its smallest row, smallest column,
+    largest row and largest column. Directions that start no cheapest path have EMPTY_BOX.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        boxes: array('h') or memoryview of the bounding boxes of every cell and direction
+        stats: dict of counters recorded during the most recent search
+
+    Constants:
+        EMPTY_BOX: the box of a direction that starts no cheapest path, which contains no cell
+        MAX_SIZE: the largest number of rows or columns a box can describe
+        CHUNK_SIZE: the number of source cells sent to a worker at a time
+        MAGIC: the first bytes of a saved goal bounding file
+        HEADER: struct of the header of a saved goal bounding file: magic, version, columns,
+            rows and the checksum of the walkability array
+    """
+
+    EMPTY_BOX = (0x7FFF, 0x7FFF, -1, -1)
+    MAX_SIZE = 0x7FFF
+    CHUNK_SIZE = 64
+
+    MAGIC = b'PFGB'
+    HEADER = struct.Struct('<4sIIII')
+
+    def __init__(self, engine, solver=None, boxes=None):
+        """ Initializes an instance of the GoalBounding class and computes the boxes.
+
+        Args:
+            engine: the Engine object that describes the grid
+            solver: optional ParallelSolver over the same grid whose worker processes compute
+                the boxes
+            boxes: array('h') or memoryview of precomputed boxes (for example when loading
+                them from disk)
+
+        Raises:
+            ValueError: the grid has more than one layer or more than MAX_SIZE rows or columns
+        """
+
+        if engine.get_layers() > 1:
+            raise ValueError('Goal bounds do not follow links between layers')
+        if max(engine.get_columns(), engine.get_rows()) > GoalBounding.MAX_SIZE:
+            raise ValueError('Goal bounds hold at most {0} rows and columns'.format(
+                GoalBounding.MAX_SIZE))
+
+        self.__engine = engine
+        self.__stats = {}
+        self.__boxes = boxes if boxes is not None else self.build(solver)
+
+    def build(self, solver=None):
+        """ Computes the boxes of every cell, in the worker processes of solver if given.
+
+        Returns:
+            array('h') of the boxes
+        """
+
+        size = self.__engine.get_columns() * self.__engine.get_rows()
+        if solver is None:
+            return bound_sources(self.__engine, range(size))
+
+        chunks = [range(first, min(size, first + GoalBounding.CHUNK_SIZE))
+                  for first in range(0, size, GoalBounding.CHUNK_SIZE)]
+        boxes = array('h')
+        for data in solver.map_tasks(bound_sources_in_worker, chunks):
+            boxes.frombytes(data)
+        return boxes
+
+    def get_boxes(self):
+        """ Gets the array of the bounding boxes. """
+
+        return self.__boxes
+
+    def get_box(self, index, direction):
+        """ Gets the bounding box of a direction of a cell.
+
+        Args:
+            index: the index of the cell
+            direction: index into Engine.DIRECTIONS
+
+        Returns:
+            (smallest row, smallest column, largest row, largest column) of the cells whose
+            cheapest path starts in direction, or None if there are none
+        """
+
+        offset = (index * len(Engine.DIRECTIONS) + direction) * 4
+        box = tuple(self.__boxes[offset:offset + 4])
+        if box[0] > box[2]:
+            return None
+        return box
+
+    def get_index_bytes(self):
+        """ Gets the size of the boxes in bytes. """
+
+        return len(self.__boxes) * 2
+
+    def get_stats(self):
+        """ Gets the counters recorded during the most recent search. """
+
+        return self.__stats
+
+    # ---------------------------------------------
+    # Methods related to searching with goal bounds
+    # ---------------------------------------------
+
+    def find_path(self, start, target, heuristic=None):
+        """ Finds the cheapest path between two cells with A*, skipping out-of-bounds steps.
+
+        A step is only followed if its box contains the target. The first step of a cheapest
+        path from every cell to the target is always kept, so the path is as cheap as the one
+        found by Engine.find_path.
+
+        Args:
+            start: the index of the start cell
+            target: the index of the target cell
+            heuristic: function taking (index, target) that returns an admissible estimate of
+                the path cost between the cells (defaults to Engine.get_h_cost)
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if there is no path
+        """
+
+        engine = self.__engine
+        heuristic = heuristic if heuristic is not None else engine.get_h_cost
+        self.__stats = {'expanded': 0, 'pruned': 0}
+        if not engine.is_walkable(start) or not engine.is_walkable(target):
+            return None
+
+        boxes = self.__boxes
+        target_row, target_col = engine.get_row_col(target)
+        count = len(Engine.DIRECTIONS)
+
+        opened = MinPriorityQueue.MinPriorityQueue((heuristic(start, target), start))
+        g_costs = {start: 0}
+        prev = {}
+        closed = set()
+        while True:
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                return None
+            if current == target:
+                return engine.build_path(prev, start, target)
+
+            closed.add(current)
+            self.__stats['expanded'] += 1
+            for direction in range(count):
+                adj = engine.get_neighbour(current, direction)
+                if adj is None or adj in closed:
+                    continue
+                box = (current * count + direction) * 4
+                if not (boxes[box] <= target_row <= boxes[box + 2]
+                        and boxes[box + 1] <= target_col <= boxes[box + 3]):
+                    self.__stats['pruned'] += 1
+                    continue
+
+                g_cost = g_costs[current] + Engine.DIRECTIONS[direction][2]
+                if adj not in g_costs:
+                    g_costs[adj] = g_cost
+                    prev[adj] = current
+                    opened.insert(g_cost + heuristic(adj, target), adj)
+                elif g_cost < g_costs[adj]:
+                    g_costs[adj] = g_cost
+                    prev[adj] = current
+                    opened.decrease_key(adj, g_cost + heuristic(adj, target))
+
+    # ---------------------------------------------
+    # Methods related to saving and loading boxes
+    # ---------------------------------------------
+
+    def save(self, path):
+        """ Writes the boxes to a file.
+
+        The file starts with a header holding the grid dimensions and a checksum of the
+        walkability array, followed by the raw little-endian boxes.
+
+        Args:
+            path: the path of the file to write
+        """
+
+        header = GoalBounding.HEADER.pack(GoalBounding.MAGIC, 1, self.__engine.get_columns(),
+                                          self.__engine.get_rows(),
+                                          Landmarks.get_checksum(self.__engine))
+        boxes = self.__boxes
+        if sys.byteorder == 'big':
+            boxes = array('h', boxes)
+            boxes.byteswap()
+
+        with open(path, 'wb') as file:
+            file.write(header)
+            file.write(boxes)
+
+    @staticmethod
+    def load(path, engine):
+        """ Reads boxes from a file.
+
+        Args:
+            path: the path of the file written by GoalBounding.save
+            engine: the Engine object that describes the grid
+
+        Raises:
+            ValueError: the file is not a goal bounding file or was built for a different grid
+
+        Returns:
+            The GoalBounding object
+        """
+
+        header = GoalBounding.HEADER
+        with open(path, 'rb') as file:
+            data = file.read(header.size)
+            if len(data) != header.size:
+                raise ValueError('File is not a goal bounding file')
+
+            magic, _, columns, rows, checksum = header.unpack(data)
+            if magic != GoalBounding.MAGIC:
+                raise ValueError('File is not a goal bounding file')
+            if (columns, rows) != (engine.get_columns(), engine.get_rows()):
+                raise ValueError('Goal bounding file was built for a grid of a different size')
+            if checksum != Landmarks.get_checksum(engine):
+                raise ValueError('Goal bounding file was built for a different grid layout')
+
+            boxes = array('h')
+            try:
+                boxes.fromfile(file, columns * rows * len(Engine.DIRECTIONS) * 4)
+            except EOFError:
+                raise ValueError('Goal bounding file is truncated')
+        if sys.byteorder == 'big':
+            boxes.byteswap()
+
+        return GoalBounding(engine, boxes=boxes)
+
+    @staticmethod
+    def cached(engine, cache, solver=None, key=None):
+        """ Gets goal bounds from a PrecomputeCache, computing them only if the entry is stale.
+
+        Args:
+            engine: the Engine object that describes the grid
+            cache: the PrecomputeCache object to use
+            solver: optional ParallelSolver whose worker processes compute the boxes
+            key: the content hash of the map, computed from engine if not given
+
+        Returns:
+            The GoalBounding object, reading the boxes from the mapped file
+        """
+
+        if key is None:
+            key = cache.get_key(engine)
+        boxes = cache.get(key, 'goal-bounding',
+                          lambda: GoalBounding(engine, solver).get_boxes(), typecode='h')
+        return GoalBounding(engine, boxes=boxes)
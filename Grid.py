@@ -9,23 +9,52 @@ to represent different phases of the A* pathfinding algorithm.
 
 import pygame
 import MinPriorityQueue
+from Engine import Engine
+from FlowField import FlowField
+from Cooperative import CooperativePlanner
+from ThetaStar import ThetaStar
+from Search import Search
+from SearchTrace import SearchTrace, TracePlayer
+from MovingTargetSearch import MovingTargetSearch
+from LayeredEngine import LayeredEngine
+import MapIO
 
 class Grid:
     """ Represents the arrangment of nodes/cells in the two-dimensional array.
 
     Attributes:
         surface: the surface object on which to draw the grid onto
-        nodes: the two-dimensional list arrangment of nodes that makes up the grid
+        nodes: the two-dimensional list arrangment of nodes that makes up the grid, or None
+            until the nodes of a Grid created from a walkability layer are first needed
+        layer: the walkability layer the nodes are built from, or None once they are built
+        agents: list of additional (start node, target node) pairs for multi-agent planning
+        expansions: the number of nodes expanded by all searches advanced with step_search
+        trace: the SearchTrace of the most recent search started with start_search
+        path: the cell indices of the path found by the most recent call to solve or
+            step_search, or None
+        replay: the TracePlayer of the replay being shown, or None
+        chase: the MovingTargetSearch reused while the target is moved with follow_target
+        chase_path: the path shown by the most recent call to follow_target
+        layers: list of the walkability arrays of every layer, or None for a single layer
+        current_layer: the index of the layer shown by the nodes
+        links: set of (lower index, upper index) of the links between a cell and the same
+            cell on the layer above, in layer-major indices
+        start_layer: the layer of the start node
+        target_layer: the layer of the target node
+        layer_path: the layer-major path found by the most recent call to solve_layers
+        memory_profiler: the MemoryProfiler that profiles every solve, or None
 
     Constants:
         VERT_HORZ_COST: Cost of vertical/horizontal path movement
         DIAG_COST: Cost of diaginal path movement
         COLUMNS: Number of columns in grid
         ROWS: Number of rows in grid
+        LINK_COST: Cost of moving between a cell and the same cell on the layer above
     """
 
     VERT_HORZ_COST = 10
     DIAG_COST = 14
+    LINK_COST = 50
 
     PATHFIND_TIMEDELAY = 50
 
@@ -34,8 +63,20 @@ class Grid:
     DEFAULT_TARGET_ROW = 9
     DEFAULT_TARGET_COL = -5
 
-    def __init__(self, surface, rect, columns, rows):
-        """ Initializes an instance of the Grid class. """
+    def __init__(self, surface, rect, columns, rows, walkable=None):
+        """ Initializes an instance of the Grid class.
+
+        Args:
+            surface: the surface object on which to draw the grid onto
+            rect: the Rect object of the area covered by the grid
+            columns: number of columns in the grid
+            rows: number of rows in the grid
+            walkable: optional walkability layer to build the nodes from when they are first
+                needed (see Engine.as_layer). Without it, the grid has no obstacles.
+
+        Raises:
+            ValueError: walkable does not fit the grid
+        """
 
         self.__surface = surface
         self.__rect = rect
@@ -47,12 +88,127 @@ class Grid:
         self.__nodes = []
         self.__start = None
         self.__target = None
+        self.__agents = []
+        self.__search = None
+        self.__expansions = 0
+        self.__trace = None
+        self.__path = None
+        self.__replay = None
+        self.__chase = None
+        self.__chase_path = None
+        self.__layers = None
+        self.__current_layer = 0
+        self.__links = set()
+        self.__start_layer = 0
+        self.__target_layer = 0
+        self.__layer_path = None
+        self.__memory_profiler = None
+        self.__heatmap_shown = False
+        self.__solved = False
+
+        if walkable is not None:
+            self.__layer = Engine.as_layer(walkable, columns, rows)
+            self.__nodes = None
+        else:
+            self.__layer = None
+            self.create_grid()
+            self.set_start_node()
+            self.set_target_node()
+
+    @classmethod
+    def from_array(cls, surface, rect, walkable, columns=None, rows=None):
+        """ Creates a Grid over an existing walkability layer.
+
+        The layer is validated once and used without copying. The Node objects of the GUI
+        view are only built when the grid is first drawn or edited; until then, engines
+        created with create_engine search the layer in place.
+
+        Args:
+            surface: the surface object on which to draw the grid onto
+            rect: the Rect object of the area covered by the grid
+            walkable: NumPy array, bytes-like object or sequence in row-major order, truthy
+                where walkable
+            columns: number of columns in the grid (taken from the shape of two-dimensional
+                arrays if not given)
+            rows: number of rows in the grid (taken from the shape of two-dimensional arrays
+                if not given)
+
+        Raises:
+            ValueError: the size of the grid is not given and walkable is not two-dimensional,
+                or walkable does not fit the grid
+
+        Returns:
+            The Grid object
+        """
+
+        if columns is None or rows is None:
+            try:
+                shape = memoryview(walkable).shape
+            except TypeError:
+                shape = ()
+            if len(shape) != 2:
+                raise ValueError('columns and rows are required unless walkable is 2D')
+            rows, columns = shape
+
+        return cls(surface, rect, columns, rows, walkable)
 
+    def get_nodes(self):
+        """ Gets the two-dimensional list of nodes, building it from the layer if needed. """
+
+        if self.__nodes is None:
+            self.apply_layout(self.__layer)
+        return self.__nodes
+
+    def apply_layout(self, walkable):
+        """ Rebuilds the nodes with an obstacle wherever the walkability layer is falsy.
+
+        The start and target nodes are reset to the walkable nodes nearest to their defaults,
+        so no obstacle of the layer is replaced. They are left unset if there is none.
+
+        Args:
+            walkable: sequence with one entry per node in row-major order
+        """
+
+        self.__start = None
+        self.__target = None
         self.create_grid()
-        self.set_start_node()
-        self.set_target_node()
+        for index, cell in enumerate(walkable):
+            if not cell:
+                self.get_node_at_index(index).toggle_obstacle()
 
-        self.__solved = False
+        start = self.find_free_node(Grid.DEFAULT_START_ROW, Grid.DEFAULT_START_COL)
+        if start is not None:
+            self.set_start_node(start)
+        target = self.find_free_node(Grid.DEFAULT_TARGET_ROW, Grid.DEFAULT_TARGET_COL, start)
+        if target is not None:
+            self.set_target_node(target)
+
+    def find_free_node(self, row, col, taken=None):
+        """ Finds the walkable node nearest to a cell.
+
+        Args:
+            row: the row of the cell, clamped to the grid
+            col: the column of the cell, negative columns counting from the right as for
+                the default target
+            taken: optional Node object that may not be returned
+
+        Returns:
+            The nearest Node object that is not an obstacle, or None if there is none
+        """
+
+        row = min(row, self.__rows - 1)
+        col = min(col % self.__columns, self.__columns - 1)
+
+        best, best_distance = None, None
+        for nodes in self.__nodes:
+            for node in nodes:
+                if node.is_obstacle() or node is taken:
+                    continue
+                i, j = abs(node.get_row() - row), abs(node.get_col() - col)
+                distance = (max(i, j), i + j)
+                if best is None or distance < best_distance:
+                    best, best_distance = node, distance
+        return best
 
     def create_grid(self):
         """ Initializes the arrangment of grid nodes.
@@ -63,6 +219,20 @@ class Grid:
         """
 
         self.__solved = False
+        self.__heatmap_shown = False
+        self.__agents = []
+        self.__search = None
+        self.__path = None
+        self.__replay = None
+        self.__chase = None
+        self.__chase_path = None
+        self.__layers = None
+        self.__current_layer = 0
+        self.__links = set()
+        self.__start_layer = 0
+        self.__target_layer = 0
+        self.__layer_path = None
+        self.__layer = None
         self.__nodes = []
         width = self.__width // self.__columns
         height = self.__height // self.__rows
@@ -81,7 +251,7 @@ class Grid:
         Draws the grid object by drawing all nodes in self.__nodes.
         """
 
-        for row in self.__nodes:
+        for row in self.get_nodes():
             for node in row:
                 node.draw()
 
@@ -101,7 +271,9 @@ class Grid:
 
         node = self.get_node(mouse_pos)
         if node not in selected_nodes:
+            self.clear_heatmap()
             node.toggle_obstacle()
+            self.__chase = None
         return node
 
     def collidepoint(self, point):
@@ -127,16 +299,20 @@ class Grid:
 
         # Set to default if no optional paramater given
         if node is None:
-            node = self.__nodes[Grid.DEFAULT_START_ROW][Grid.DEFAULT_START_COL]
+            node = self.get_nodes()[Grid.DEFAULT_START_ROW][Grid.DEFAULT_START_COL]
 
         # Let node be start node only if given node is not already target node
-        if self.__target != node:
+        if self.__target != node or self.__target_layer != self.__current_layer:
 
-            if self.__start is not None:
+            if self.__start is not None and self.__start_layer == self.__current_layer:
                 self.__start.make_undiscovered()
 
+            self.clear_heatmap()
             node.set_start()
             self.__start = node
+            self.__start_layer = self.__current_layer
+            if self.__chase is not None:
+                self.__chase.set_start(self.get_start_index())
 
 
     def set_target_node(self, node=None):
@@ -150,16 +326,18 @@ class Grid:
 
         # Set to default if no optional paramater given
         if node is None:
-            node = self.__nodes[Grid.DEFAULT_TARGET_ROW][Grid.DEFAULT_TARGET_COL]
+            node = self.get_nodes()[Grid.DEFAULT_TARGET_ROW][Grid.DEFAULT_TARGET_COL]
 
         # Let node be target node only if given node is not already start node
-        if self.__start != node:
+        if self.__start != node or self.__start_layer != self.__current_layer:
 
-            if self.__target is not None:
+            if self.__target is not None and self.__target_layer == self.__current_layer:
                 self.__target.make_undiscovered()
 
+            self.clear_heatmap()
             node.set_target()
             self.__target = node
+            self.__target_layer = self.__current_layer
 
     def get_node(self, pos):
         """ Gets the node at a given position on the surface.
@@ -178,7 +356,717 @@ class Grid:
         x, y = pos
         j = x // (self.__width // self.__columns)
         i = y // (self.__height // self.__rows)
-        return self.__nodes[i][j]
+        return self.get_nodes()[i][j]
+
+    def get_node_at_index(self, index):
+        """ Gets the node with the given row-major index. """
+
+        return self.get_nodes()[index // self.__columns][index % self.__columns]
+
+    def get_walkable_array(self):
+        """ Gets the compact walkability array of the Grid.
+
+        Returns:
+            bytearray with one entry per node in row-major order, 1 if the node is walkable
+            and 0 if it is an obstacle
+        """
+
+        walkable = bytearray(self.__columns * self.__rows)
+        for row in self.get_nodes():
+            for node in row:
+                if not node.is_obstacle():
+                    walkable[node.get_row() * self.__columns + node.get_col()] = 1
+        return walkable
+
+    def get_start_index(self):
+        """ Gets the row-major index of the start node. """
+
+        self.get_nodes()
+        return self.__start.get_row() * self.__columns + self.__start.get_col()
+
+    def get_target_index(self):
+        """ Gets the row-major index of the target node. """
+
+        self.get_nodes()
+        return self.__target.get_row() * self.__columns + self.__target.get_col()
+
+    def create_engine(self):
+        """ Creates a headless Engine over a snapshot of the current Grid layout.
+
+        If the nodes have not been built yet, the Engine searches the walkability layer the
+        Grid was created from in place.
+        """
+
+        if self.__nodes is None:
+            return Engine(self.__layer, self.__columns, self.__rows)
+        return Engine(self.get_walkable_array(), self.__columns, self.__rows)
+
+    def save_layout(self, path):
+        """ Saves the obstacles of the Grid to a file.
+
+        Files ending in '.map' are written as MovingAI text maps, any other file in the
+        compact binary grid format.
+
+        Args:
+            path: the path of the file
+        """
+
+        engine = self.create_engine()
+        if path.endswith('.map'):
+            MapIO.write_map(path, engine)
+        else:
+            MapIO.write_grid(path, engine)
+
+    def load_layout(self, path):
+        """ Replaces the obstacles of the Grid with the ones saved in a file.
+
+        The start and target nodes are reset to their defaults.
+
+        Args:
+            path: the path of a MovingAI .map file or a binary grid file
+
+        Raises:
+            ValueError: the file is not a valid map, or its size differs from the Grid
+        """
+
+        if path.endswith('.map'):
+            engine = MapIO.read_map(path)
+            columns, rows = engine.get_columns(), engine.get_rows()
+            walkable = MapIO.as_bytes(engine.get_walkable())
+        else:
+            with MapIO.open_grid(path) as grid_file:
+                columns, rows = grid_file.get_columns(), grid_file.get_rows()
+                walkable = MapIO.as_bytes(grid_file.get_walkable())
+
+        if (columns, rows) != (self.__columns, self.__rows):
+            raise ValueError('Layout has {0} columns and {1} rows instead of {2} and {3}'.format(
+                columns, rows, self.__columns, self.__rows))
+
+        self.apply_layout(walkable)
+
+
+    # -------------------------------------------------------
+    # Methods related to the target flow field and reachability
+    # -------------------------------------------------------
+
+    def show_distance_field(self, vectorized=False):
+        """ Shades every walkable node by its path cost to the target node.
+
+        A single flow field is computed from the target node over the whole Grid. Nodes close
+        to the target are drawn in a light color and distant nodes in a dark color. Nodes that
+        cannot reach the target are not shaded.
+
+        Args:
+            vectorized: bool that determines if the NumPy wavefront should be used
+
+        Returns:
+            The FlowField object that was computed
+
+        Raises:
+            ValueError: the Grid has more than one layer
+        """
+
+        self.check_single_layer()
+        self.get_nodes()
+        if self.__target is None:
+            raise AttributeError("Target Node is not set.")
+
+        field = FlowField(self.create_engine(), self.get_target_index(), vectorized)
+        furthest = field.get_max_distance() or 1
+
+        for row in self.get_nodes():
+            for node in row:
+                distance = field.get_distance(node.get_row() * self.__columns + node.get_col())
+                if distance is None:
+                    node.set_heat(None)
+                else:
+                    node.set_heat(distance / furthest)
+
+        self.__heatmap_shown = True
+        return field
+
+    def show_reachable_area(self, budget, vectorized=False):
+        """ Shades every node that can be reached from the start node within a budget.
+
+        Nodes close to the start are drawn in a light color and nodes near the edge of the
+        budget in a dark color. Nodes outside the budget are not shaded.
+
+        Args:
+            budget: the largest path cost of a shaded node
+            vectorized: bool that determines if the NumPy wavefront should be used
+
+        Returns:
+            The Isochrone object that was computed
+
+        Raises:
+            ValueError: the Grid has more than one layer
+        """
+
+        self.check_single_layer()
+        self.get_nodes()
+        if self.__start is None:
+            raise AttributeError("Start Node is not set.")
+
+        area = self.create_engine().find_reachable(self.get_start_index(), budget, vectorized)
+
+        for row in self.get_nodes():
+            for node in row:
+                distance = area.get_distance(node.get_row() * self.__columns + node.get_col())
+                if distance is None:
+                    node.set_heat(None)
+                else:
+                    node.set_heat(distance / (budget or 1))
+
+        self.__heatmap_shown = True
+        return area
+
+    def clear_heatmap(self):
+        """ Removes the distance field shading from all nodes. """
+
+        if self.__heatmap_shown:
+            for row in self.get_nodes():
+                for node in row:
+                    node.set_heat(None)
+            self.__heatmap_shown = False
+
+
+    # ------------------------------------------------------
+    # Methods related to cooperative multi-agent pathfinding
+    # ------------------------------------------------------
+
+    def add_agent(self, start_node, target_node):
+        """ Adds an additional start/target pair to be planned with solve_agents.
+
+        The start and target nodes of the Grid always form the first agent.
+
+        Args:
+            start_node: the Node object the agent starts on
+            target_node: the Node object the agent has to reach
+
+        Returns:
+            True if the agent was added, False if either node is an obstacle or already in use
+        """
+
+        used = {self.__start, self.__target}
+        for start, target in self.__agents:
+            used.add(start)
+            used.add(target)
+
+        if start_node is target_node or start_node in used or target_node in used:
+            return False
+        if start_node.is_obstacle() or target_node.is_obstacle():
+            return False
+
+        start_node.set_start()
+        target_node.set_target()
+        self.__agents.append((start_node, target_node))
+        return True
+
+    def get_agent_pairs(self):
+        """ Gets the (start index, target index) of every agent, starting with the Grid's own. """
+
+        pairs = [(self.get_start_index(), self.get_target_index())]
+        for start, target in self.__agents:
+            pairs.append((start.get_row() * self.__columns + start.get_col(),
+                          target.get_row() * self.__columns + target.get_col()))
+        return pairs
+
+    def solve_agents(self, window=None):
+        """ Plans collision-free paths for all agents and shows them on the Grid.
+
+        Args:
+            window: number of time steps to plan cooperatively before replanning (WHCA*), or
+                None to plan full paths with Cooperative A*
+
+        Raises:
+            AttributeError: the start or target node is not set
+            ValueError: the Grid has more than one layer
+
+        Returns:
+            List with the path of every agent as a list of cell indices per time step, or None
+            for agents whose path was not found
+        """
+
+        self.get_nodes()
+        if self.__start is None or self.__target is None:
+            raise AttributeError("Start Node and Target Node are not set.")
+        self.check_single_layer()
+
+        pairs = self.get_agent_pairs()
+        planner = CooperativePlanner(self.create_engine(), window)
+
+        if window is None:
+            paths = planner.plan(pairs)
+        else:
+            paths = [[start] for start, _ in pairs]
+            planner.start(pairs)
+            max_ticks = 4 * (self.__rows + self.__columns)
+            while not planner.is_finished() and planner.get_time() < max_ticks:
+                for path, position in zip(paths, planner.tick()):
+                    path.append(position)
+
+        endpoints = {index for pair in pairs for index in pair}
+        for path in paths:
+            if path is None:
+                continue
+            for index in path:
+                if index not in endpoints:
+                    self.get_node_at_index(index).add_to_solution()
+
+        self.__solved = True
+        self.__path = None
+        return paths
+
+
+    # -----------------------------------------
+    # Methods related to any-angle pathfinding
+    # -----------------------------------------
+
+    def find_waypoints(self, lazy=False):
+        """ Finds an any-angle path from the start node to the target node with Theta*.
+
+        The Grid is not modified. The path is returned as a compact list of waypoints rather
+        than by changing the state of every node on it.
+
+        Args:
+            lazy: bool that determines if Lazy Theta* is used instead of Theta*
+
+        Returns:
+            List of (row, column) waypoints from start to target, or None if there is no path
+        """
+
+        self.get_nodes()
+        if self.__start is None or self.__target is None:
+            raise AttributeError("Start Node and Target Node are not set.")
+
+        theta = ThetaStar(self.create_engine(), lazy)
+        waypoints = theta.find_path(self.get_start_index(), self.get_target_index())
+        if waypoints is None:
+            return None
+        return [divmod(index, self.__columns) for index in waypoints]
+
+    def get_smoothed_path(self):
+        """ Gets the waypoints of the A* solution after removing unnecessary turns.
+
+        It is assumed that solve has been executed and a solution has been found.
+
+        Returns:
+            List of (row, column) waypoints from start to target, or None if not solved
+        """
+
+        if not self.__solved or self.__path is None:
+            return None
+
+        theta = ThetaStar(self.create_engine())
+        return [divmod(index, self.__columns) for index in theta.smooth_path(self.__path)]
+
+    def get_node_path(self):
+        """ Gets the cell indices of the path found by find_path or find_path_nonvisual by
+        following the prev pointers of the nodes back from the target node. """
+
+        path = []
+        current = self.__target
+        while current is not None:
+            path.append(current.get_row() * self.__columns + current.get_col())
+            if current is self.__start:
+                break
+            current = current.get_prev()
+        path.reverse()
+        return path
+
+
+    # ------------------------------------------
+    # Methods related to time-sliced pathfinding
+    # ------------------------------------------
+
+    def start_search(self):
+        """ Starts a resumable A* search from the start node to the target node.
+
+        The search does not run until step_search is called, so the caller can spread it over
+        as many frames as it likes and keep handling events in between.
+
+        Raises:
+            ValueError: the Grid has more than one layer
+        """
+
+        self.check_single_layer()
+        self.get_nodes()
+        if self.__start is None or self.__target is None:
+            raise AttributeError("Start Node and Target Node are not set.")
+
+        engine = self.create_engine()
+        self.__path = None
+        if self.__memory_profiler is not None:
+            self.__memory_profiler.begin()
+        self.__trace = SearchTrace(self.__columns, self.__rows, self.get_start_index(),
+                                   self.get_target_index(), MapIO.as_bytes(engine.get_walkable()))
+        self.__search = Search(engine, self.get_start_index(), self.get_target_index(),
+                               on_event=self.handle_search_event)
+
+    def step_search(self, max_expansions=None, deadline=None):
+        """ Advances the current search and shows the result once it finishes.
+
+        Args:
+            max_expansions: the largest number of nodes to expand in this call
+            deadline: the time.perf_counter() value at which to stop
+
+        Returns:
+            True if there is no search running after the call, False otherwise
+        """
+
+        if self.__search is None:
+            return True
+
+        expanded = self.__search.get_stats()['expanded']
+        status = self.__search.step(max_expansions, deadline)
+        self.__expansions += self.__search.get_stats()['expanded'] - expanded
+        if status == Search.FOUND:
+            self.__path = self.__search.get_path()
+            for index in self.__path[1:-1]:
+                self.get_node_at_index(index).add_to_solution()
+            self.__solved = True
+        elif status == Search.NO_PATH:
+            self.print_no_solution()
+        else:
+            return False
+
+        if self.__memory_profiler is not None:
+            self.__memory_profiler.record(nodes=self.__nodes, **self.__search.get_structures())
+            self.__memory_profiler.end()
+        self.__trace.finish(self.__search.get_path())
+
+        self.__search = None
+        return True
+
+    def is_searching(self):
+        """ Returns True if a search started with start_search has not finished. """
+
+        return self.__search is not None
+
+    def get_expansions(self):
+        """ Gets the number of nodes expanded by all searches advanced with step_search. """
+
+        return self.__expansions
+
+    def handle_search_event(self, event, index):
+        """ Updates and records the state of a node when the current search opens or closes it. """
+
+        self.__trace.record(event, index)
+        node = self.get_node_at_index(index)
+        if event == Search.OPENED:
+            node.make_open()
+        elif event == Search.CLOSED:
+            node.close()
+
+
+    # ------------------------------------
+    # Methods related to replaying searches
+    # ------------------------------------
+
+    def get_trace(self):
+        """ Gets the SearchTrace of the most recent search, or None if there is none. """
+
+        return self.__trace
+
+    def start_replay(self, trace=None):
+        """ Restores the grid a trace was recorded on and starts replaying it from the start.
+
+        Args:
+            trace: the SearchTrace object to replay (defaults to the most recent search)
+
+        Raises:
+            AttributeError: there is no trace to replay
+            ValueError: the trace was recorded on a grid of a different size, or the Grid has
+                more than one layer
+
+        Returns:
+            The TracePlayer object of the replay, which is paused
+        """
+
+        self.check_single_layer()
+        if trace is None:
+            trace = self.__trace
+        if trace is None:
+            raise AttributeError("No search has been recorded.")
+        if (trace.get_columns(), trace.get_rows()) != (self.__columns, self.__rows):
+            raise ValueError('Trace has {0} columns and {1} rows instead of {2} and {3}'.format(
+                trace.get_columns(), trace.get_rows(), self.__columns, self.__rows))
+
+        walkable = trace.get_walkable()
+        self.apply_layout(walkable)
+
+        # The default start and target nodes may be obstacles of the traced grid
+        for node in self.__start, self.__target:
+            index = node.get_row() * self.__columns + node.get_col()
+            node.make_undiscovered()
+            if not walkable[index]:
+                node.toggle_obstacle()
+        self.__start = self.__target = None
+        self.set_start_node(self.get_node_at_index(trace.get_start()))
+        self.set_target_node(self.get_node_at_index(trace.get_target()))
+
+        self.__trace = trace
+        self.__replay = TracePlayer(trace, self.handle_trace_event)
+        return self.__replay
+
+    def get_replay(self):
+        """ Gets the TracePlayer of the replay being shown, or None. """
+
+        return self.__replay
+
+    def is_replaying(self):
+        """ Returns True if a replay started with start_replay is being shown. """
+
+        return self.__replay is not None
+
+    def step_replay(self):
+        """ Advances the replay if it is playing.
+
+        Returns:
+            True if the replay is playing after the call, False otherwise
+        """
+
+        if self.__replay is None:
+            return False
+        return self.__replay.step()
+
+    def stop_replay(self):
+        """ Shows the end of the replay and leaves replay mode. """
+
+        if self.__replay is None:
+            return
+
+        self.__replay.seek(len(self.__trace))
+        self.__solved = self.__trace.get_path() is not None
+        self.__replay = None
+
+    def handle_trace_event(self, index, event):
+        """ Sets the state of a node to the state of a trace entry.
+
+        Args:
+            index: the index of the node
+            event: a SearchTrace event, or None for a node the search has not reached
+        """
+
+        node = self.get_node_at_index(index)
+        if node is self.__target:
+            if event == SearchTrace.NO_PATH:
+                node.set_no_sol_target()
+            else:
+                node.set_target()
+        elif node is self.__start:
+            return
+        elif event is None:
+            node.make_undiscovered()
+        elif event == SearchTrace.OPENED:
+            node.make_open()
+        elif event == SearchTrace.CLOSED:
+            node.close()
+        elif event == SearchTrace.PATH:
+            node.add_to_solution()
+
+
+    # --------------------------------------------
+    # Methods related to moving-target pathfinding
+    # --------------------------------------------
+
+    def follow_target(self, node):
+        """ Moves the target node and shows the path to it, reusing the previous search.
+
+        The first call searches from the start node and clears the states of the previous
+        search. Later calls move the target of the same MovingTargetSearch, so only the cells
+        between the old and the new target are expanded. Toggling an obstacle or loading a
+        layout discards the search, and moving the start node keeps the part of it that is
+        still valid.
+
+        Args:
+            node: the Node object to move the target node to
+
+        Returns:
+            List of cell indices from the start node to the target node, or None if there is
+            no path or the node cannot be the target
+        """
+
+        self.get_nodes()
+        if self.__start is None or node is self.__start or node.is_obstacle():
+            return None
+
+        if self.__chase_path is not None:
+            for index in self.__chase_path:
+                path_node = self.get_node_at_index(index)
+                if path_node is not self.__start and path_node is not self.__target:
+                    path_node.make_undiscovered()
+        self.set_target_node(node)
+
+        if self.__chase is None or self.__chase.get_start() != self.get_start_index():
+            for row in self.get_nodes():
+                for grid_node in row:
+                    if (grid_node is not self.__start and grid_node is not self.__target
+                            and not grid_node.is_obstacle()):
+                        grid_node.make_undiscovered()
+            self.__chase = MovingTargetSearch(self.create_engine(), self.get_start_index(),
+                                              self.get_target_index())
+        else:
+            self.__chase.set_target(self.get_target_index())
+
+        self.__chase_path = self.__chase.find_path()
+        if self.__chase_path is None:
+            self.print_no_solution()
+        else:
+            for index in self.__chase_path[1:-1]:
+                self.get_node_at_index(index).add_to_solution()
+        self.__solved = True
+        self.__path = self.__chase_path
+        return self.__chase_path
+
+    def get_chase(self):
+        """ Gets the MovingTargetSearch used by follow_target, or None. """
+
+        return self.__chase
+
+
+    # --------------------------------
+    # Methods related to layered grids
+    # --------------------------------
+
+    def get_layer_count(self):
+        """ Gets the number of layers of the Grid. """
+
+        return 1 if self.__layers is None else len(self.__layers)
+
+    def check_single_layer(self):
+        """ Checks that the Grid has a single layer, for the tools that only search the nodes of
+        the layer being shown.
+
+        Raises:
+            ValueError: the Grid has more than one layer
+        """
+
+        if self.get_layer_count() > 1:
+            raise ValueError('Only the layered solve searches a Grid with several layers')
+
+    def get_current_layer(self):
+        """ Gets the index of the layer shown by the nodes. """
+
+        return self.__current_layer
+
+    def switch_layer(self, layer):
+        """ Shows another layer of the Grid, adding an empty layer above the top one if needed.
+
+        The walkability of the layer being left is stored, and the nodes are rebuilt from the
+        walkability of the new layer together with its links and the part of the most recent
+        layered path that lies on it.
+
+        Args:
+            layer: the index of the layer to show, at most get_layer_count()
+
+        Raises:
+            ValueError: layer is negative or more than one above the top layer
+        """
+
+        if not 0 <= layer <= self.get_layer_count():
+            raise ValueError('layer {0} does not exist'.format(layer))
+
+        if self.__layers is None:
+            self.__layers = [self.get_walkable_array()]
+        else:
+            self.__layers[self.__current_layer] = self.get_walkable_array()
+        if layer == len(self.__layers):
+            self.__layers.append(bytearray([1]) * (self.__columns * self.__rows))
+
+        self.clear_heatmap()
+        self.__search = None
+        self.__replay = None
+        self.__chase = None
+        self.__current_layer = layer
+        self.show_layer()
+
+    def show_layer(self):
+        """ Rebuilds the states of the nodes from the layer being shown. """
+
+        size = self.__columns * self.__rows
+        walkable = self.__layers[self.__current_layer]
+        linked = {index for link in self.__links for index in link}
+        on_path = set() if self.__layer_path is None else set(self.__layer_path)
+
+        for index in range(size):
+            node = self.get_node_at_index(index)
+            node.make_undiscovered()
+            if not walkable[index]:
+                node.toggle_obstacle()
+            node.set_link(self.__current_layer * size + index in linked)
+            if self.__current_layer * size + index in on_path:
+                node.add_to_solution()
+
+        if self.__start_layer == self.__current_layer:
+            self.__start.set_start()
+        if self.__target_layer == self.__current_layer:
+            self.__target.set_target()
+
+    def toggle_link(self, node):
+        """ Adds or removes a link between a node and the same node on the layer above.
+
+        Args:
+            node: the Node object on the layer being shown
+
+        Returns:
+            True if the link was added, False if it was removed or the cells are not walkable
+        """
+
+        size = self.__columns * self.__rows
+        index = node.get_row() * self.__columns + node.get_col()
+        link = (self.__current_layer * size + index, (self.__current_layer + 1) * size + index)
+
+        if link in self.__links:
+            self.__links.remove(link)
+            self.show_layer()
+            return False
+
+        if node.is_obstacle() or self.__current_layer + 1 >= self.get_layer_count():
+            return False
+        if not self.__layers[self.__current_layer + 1][index]:
+            return False
+        self.__links.add(link)
+        node.set_link(True)
+        return True
+
+    def create_layered_engine(self):
+        """ Creates a headless LayeredEngine over a snapshot of every layer and link. """
+
+        if self.__layers is None:
+            self.__layers = [self.get_walkable_array()]
+        else:
+            self.__layers[self.__current_layer] = self.get_walkable_array()
+        links = [(a, b, Grid.LINK_COST) for a, b in sorted(self.__links)]
+        return LayeredEngine.from_layers(self.__layers, self.__columns, self.__rows, links)
+
+    def solve_layers(self):
+        """ Finds the cheapest path from the start node to the target node across layers.
+
+        The part of the path on the layer being shown is drawn right away, and the rest of it
+        is drawn when its layer is shown.
+
+        Returns:
+            List of layer-major cell indices from the start node to the target node, or None
+            if there is no path
+        """
+
+        self.get_nodes()
+        if self.__start is None or self.__target is None:
+            raise AttributeError("Start Node and Target Node are not set.")
+
+        size = self.__columns * self.__rows
+        engine = self.create_layered_engine()
+        start = self.__start_layer * size + self.get_start_index()
+        target = self.__target_layer * size + self.get_target_index()
+
+        self.__layer_path = engine.find_path(start, target)
+        self.__solved = True
+        self.__path = None
+        self.show_layer()
+        if self.__layer_path is None and self.__target_layer == self.__current_layer:
+            self.print_no_solution()
+        return self.__layer_path
 
 
     # -------------------------------------------
@@ -192,13 +1080,21 @@ class Grid:
         to the target node using the A* pathfinding algorithm. The path can be found with
         or without a visual demonstration of each step.
 
+        If a MemoryProfiler is set, the solve is profiled and its report is available from
+        the get_report method of the profiler.
+
         Args:
             show_steps: bool that determines if steps should be shown
         """
 
+        self.get_nodes()
         if self.__start is None or self.__target is None:
             raise AttributeError("Start Node and Target Node are not set.")
 
+        self.__path = None
+        profiler = self.__memory_profiler
+        if profiler is not None:
+            profiler.begin()
         try:
             if show_steps:
                 self.find_path()
@@ -207,7 +1103,42 @@ class Grid:
         except IndexError:
             self.print_no_solution()
         else:
+            self.__path = self.get_node_path()
             self.print_path()
+        finally:
+            if profiler is not None:
+                profiler.end()
+
+    def set_memory_profiler(self, profiler):
+        """ Sets the MemoryProfiler that profiles every solve, or None to stop profiling.
+
+        Solves run with solve and searches started with start_search are profiled. A search
+        is profiled from start_search until step_search finishes it, so the drawing done in
+        between is part of its peak.
+        """
+
+        if self.__memory_profiler is not None:
+            self.__memory_profiler.cancel()
+        self.__memory_profiler = profiler
+
+    def get_memory_profiler(self):
+        """ Gets the MemoryProfiler that profiles every solve, or None. """
+
+        return self.__memory_profiler
+
+    def record_memory(self, opened, closed):
+        """ Records the sizes of the search structures of a solve being profiled.
+
+        The nodes are measured first, so the state of every Node is counted once under nodes
+        and the open list and closed set only count their own containers.
+
+        Args:
+            opened: the MinPriorityQueue of the open nodes
+            closed: the set of the closed nodes
+        """
+
+        if self.__memory_profiler is not None:
+            self.__memory_profiler.record(nodes=self.__nodes, opened=opened, closed=closed)
 
     def find_path(self):
         """  Find a path from start position to target position. 
@@ -232,12 +1163,17 @@ class Grid:
             pygame.time.delay(Grid.PATHFIND_TIMEDELAY)
 
             # Select node with smallest f_cost from opened
-            current = opened.extract_min()
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                self.record_memory(opened, closed)
+                raise
 
             # If found target, break the loop
             if current is self.__target:
                 path_found = True
                 self.__solved = True
+                self.record_memory(opened, closed)
 
             # If target not found, add neighbours to opened
             else:
@@ -291,12 +1227,17 @@ class Grid:
         path_found = False
         while not path_found:
             # Select node with smallest f_cost from opened
-            current = opened.extract_min()
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                self.record_memory(opened, closed)
+                raise
 
             # If found target, break the loop
             if current is self.__target:
                 path_found = True
                 self.__solved = True
+                self.record_memory(opened, closed)
 
             # If target not found, add neighbours to opened
             else:
@@ -337,7 +1278,7 @@ class Grid:
         of find_path.
         """
 
-        for row in self.__nodes:
+        for row in self.get_nodes():
             for node in row:
                 # Calculate direct distance from node to target
                 vdist = abs(node.get_row() - self.__target.get_row())
@@ -474,6 +1415,11 @@ class Node:
         NO_SOL_TARGET : pygame.Color("red")
         }
 
+    HEAT_NEAR_COLOR = pygame.Color(255, 255, 180)
+    HEAT_FAR_COLOR = pygame.Color(120, 0, 160)
+
+    LINK_COLOR = pygame.Color(120, 0, 160)
+
     BORDER_COLOR = pygame.Color("black")
     BRDER_WIDTH = 1
 
@@ -499,6 +1445,8 @@ class Node:
         self.__state = Node.UNDISCOVERED
         self.__h_cost = None
         self.__g_cost = None
+        self.__heat = None
+        self.__link = False
 
     def draw(self):
         """ Draws the node on the surface.
@@ -507,7 +1455,14 @@ class Node:
         in accordance with its state.
         """
 
-        pygame.draw.rect(self.__surface, Node.BG_COLORS[self.__state], self.__rect)
+        if self.__heat is not None and self.__state == Node.UNDISCOVERED:
+            color = Node.HEAT_NEAR_COLOR.lerp(Node.HEAT_FAR_COLOR, self.__heat)
+        else:
+            color = Node.BG_COLORS[self.__state]
+        pygame.draw.rect(self.__surface, color, self.__rect)
+        if self.__link:
+            marker = self.__rect.inflate(-self.__rect.width // 2, -self.__rect.height // 2)
+            pygame.draw.rect(self.__surface, Node.LINK_COLOR, marker)
 
         if self.__state == Node.START:
             self.draw_node_text("S")
@@ -603,6 +1558,21 @@ class Node:
 
         return self.__state == Node.OBSTACLE
 
+    def set_heat(self, heat):
+        """ Sets the distance field shading of the node.
+
+        Args:
+            heat: float between 0 (near the target) and 1 (furthest from the target), or None
+                to draw the node normally
+        """
+
+        self.__heat = heat
+
+    def set_link(self, link):
+        """ Sets whether the node is marked as the end of a link to another layer. """
+
+        self.__link = link
+
     def add_to_solution(self):
         """ Identifies node state as part of solution. """
 
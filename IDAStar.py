@@ -0,0 +1,216 @@
+""" Python script that contains the IDAStar class definition.
+
+IDAStar class finds optimal paths with Iterative Deepening A* (IDA*), which needs far less
+memory than A*. Instead of keeping an open list and a closed set of every cell it has seen,
+IDA* runs a series of depth-first searches that only follow paths whose f_cost stays within a
+bound, raising the bound to the smallest f_cost that exceeded it after every iteration. Only
+the current path is stored, plus a transposition table of fixed size that prunes cells which
+are known to be reachable more cheaply.
+"""
+
+from array import array
+from Engine import Engine
+
+
+class IDAStar:
+    """ Memory-bounded optimal pathfinding over the walkability array of an Engine.
+
+    The transposition table is a set of preallocated arrays with one slot per cell index
+    modulo its capacity. A cell whose slot is taken by another cell simply replaces it, so a
+    small table makes the search slower but never wrong, and the memory used by the search is
+    the size of the table plus the depth of the current path, whatever the size of the grid.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        heuristic: function taking (index, target) that estimates the remaining path cost
+        capacity: the number of slots of the transposition table
+        keys: array('I') of the cell stored in each slot
+        g_costs: array('I') of the cheapest path cost to the cell stored in each slot
+        stamps: array('I') of the iteration that wrote each slot
+        iteration: the number of depth-first iterations run so far, over all searches
+        first_iteration: the first iteration of the current search. Slots written before it
+            belong to earlier searches and are treated as empty.
+        check_bytes: the number of bytes of the connectivity check, one bit per cell
+        stats: dict of counters recorded during the most recent search
+
+    Constants:
+        SLOT_BYTES: the number of bytes of one transposition table slot
+        FRAME_BYTES: the number of bytes of one cell of the current path
+        DEFAULT_MAX_BYTES: the default memory cap of the transposition table
+    """
+
+    SLOT_BYTES = 12
+    FRAME_BYTES = 9
+
+    DEFAULT_MAX_BYTES = 1 << 20
+
+    def __init__(self, engine, max_bytes=DEFAULT_MAX_BYTES, heuristic=None):
+        """ Initializes an instance of the IDAStar class.
+
+        Args:
+            engine: the Engine object that describes the grid
+            max_bytes: the memory cap of the transposition table. The table never has more
+                slots than there are cells.
+            heuristic: function taking (index, target) that returns an admissible estimate of
+                the path cost between the cells (defaults to Engine.get_h_cost)
+
+        Raises:
+            ValueError: max_bytes is too small for a single slot
+        """
+
+        if max_bytes < IDAStar.SLOT_BYTES:
+            raise ValueError('max_bytes must be at least {0}'.format(IDAStar.SLOT_BYTES))
+
+        size = engine.get_columns() * engine.get_rows()
+        self.__engine = engine
+        self.__heuristic = heuristic if heuristic is not None else engine.get_h_cost
+        self.__capacity = max(1, min(size, max_bytes // IDAStar.SLOT_BYTES))
+        self.__keys = array('I', bytes(4 * self.__capacity))
+        self.__g_costs = array('I', bytes(4 * self.__capacity))
+        self.__stamps = array('I', bytes(4 * self.__capacity))
+        self.__check_bytes = (engine.get_columns() + 1) * engine.get_rows() // 8
+        self.__iteration = 0
+        self.__first_iteration = 1
+        self.__stats = {}
+
+    def get_stats(self):
+        """ Gets the counters recorded during the most recent search.
+
+        'estimated_bytes' is the size of the transposition table and of the connectivity
+        check plus the deepest path of the search at FRAME_BYTES per cell, an estimate of the
+        memory held by the search rather than a measurement (see MemoryProfiler for traced
+        memory).
+        """
+
+        return self.__stats
+
+    def get_capacity(self):
+        """ Gets the number of slots of the transposition table. """
+
+        return self.__capacity
+
+    def find_path(self, start, target):
+        """ Finds the cheapest path from the start cell to the target cell.
+
+        The cells are first checked to be connected with Engine.has_path, which floods the
+        grid as it is now with one bit per cell. Without a path, IDA* would raise its bound
+        through every f_cost of the component of the start cell before giving up.
+
+        Args:
+            start: the index of the start cell
+            target: the index of the target cell
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if there is no path
+        """
+
+        self.__stats = {'iterations': 0, 'expanded': 0, 'peak_depth': 0, 'bound': 0,
+                        'estimated_bytes': (self.__capacity * IDAStar.SLOT_BYTES
+                                            + self.__check_bytes)}
+
+        if not self.__engine.has_path(start, target):
+            return None
+
+        self.__first_iteration = self.__iteration + 1
+        bound = self.__heuristic(start, target)
+        while True:
+            path, next_bound = self.search(start, target, bound)
+            if path is not None or next_bound is None:
+                break
+            bound = next_bound
+
+        self.__stats['bound'] = bound
+        self.__stats['estimated_bytes'] += self.__stats['peak_depth'] * IDAStar.FRAME_BYTES
+        return path
+
+    def search(self, start, target, bound):
+        """ Runs one depth-first iteration with the given f_cost bound.
+
+        Args:
+            start: the index of the start cell
+            target: the index of the target cell
+            bound: the largest f_cost of a cell that may be expanded
+
+        Returns:
+            (path, next bound) where path is the list of cells from start to target, or None
+            if no path is within the bound, and next bound is the smallest f_cost that
+            exceeded the bound, or None if no cell exceeded it
+        """
+
+        self.__iteration += 1
+        self.__stats['iterations'] += 1
+        iteration = self.__iteration
+        first_iteration = self.__first_iteration
+        engine, heuristic = self.__engine, self.__heuristic
+        capacity = self.__capacity
+        keys, g_costs, stamps = self.__keys, self.__g_costs, self.__stamps
+        directions = Engine.DIRECTIONS
+        next_bound = None
+
+        # The current path: cells, their path costs and the next direction to try
+        cells = array('I', [start])
+        costs = array('I', [0])
+        tried = bytearray(1)
+        slot = start % capacity
+        keys[slot], g_costs[slot], stamps[slot] = start, 0, iteration
+
+        expanded = 0
+        peak_depth = self.__stats['peak_depth']
+        while cells:
+            current = cells[-1]
+            if current == target:
+                self.__stats['expanded'] += expanded
+                return cells.tolist(), next_bound
+
+            direction = tried[-1]
+            if direction < len(directions):
+                tried[-1] = direction + 1
+                if direction == 0:
+                    expanded += 1
+                adj = engine.get_neighbour(current, direction)
+                if adj is None:
+                    continue
+                g_cost = costs[-1] + directions[direction][2]
+            else:
+                # The links of layered grids are tried after the eight directions
+                links = engine.get_links(current)
+                if direction - len(directions) >= len(links):
+                    cells.pop()
+                    costs.pop()
+                    tried.pop()
+                    continue
+                tried[-1] = direction + 1
+                adj, step = links[direction - len(directions)]
+                g_cost = costs[-1] + step
+
+            # Prune cells known to be reachable more cheaply, and cells already reached as
+            # cheaply in this iteration. A cheaper g_cost from an earlier iteration is safe
+            # to prune against: its path was within an older, smaller bound, so it is
+            # expanded again in this iteration.
+            slot = adj % capacity
+            if keys[slot] == adj and stamps[slot] >= first_iteration:
+                known = g_costs[slot]
+                if g_cost > known or g_cost == known and stamps[slot] == iteration:
+                    continue
+
+            f_cost = g_cost + heuristic(adj, target)
+            if f_cost > bound:
+                if next_bound is None or f_cost < next_bound:
+                    next_bound = f_cost
+                continue
+
+            keys[slot], g_costs[slot], stamps[slot] = adj, g_cost, iteration
+            cells.append(adj)
+            costs.append(g_cost)
+            tried.append(0)
+            if len(cells) > peak_depth:
+                peak_depth = len(cells)
+                self.__stats['peak_depth'] = peak_depth
+
+        self.__stats['expanded'] += expanded
+        return None, next_bound
+
+    def get_path_cost(self, path):
+        """ Gets the cost of a path of adjacent cells. """
+
+        return self.__engine.get_path_cost(path)
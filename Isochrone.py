@@ -0,0 +1,195 @@
+""" Python script that contains the Isochrone class definition.
+
+Isochrone class holds every cell that can be reached from a source cell within a budget of
+path cost, for example the movement range of a unit. It is computed by a single Dijkstra
+search outwards from the source that stops as soon as the cheapest open cell exceeds the
+budget, so only the cells inside the range (and their neighbours) are ever visited.
+"""
+
+from array import array
+import MinPriorityQueue
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Isochrone:
+    """ Cells within a path cost budget of a source cell.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        source: the index of the source cell
+        budget: the largest path cost of a reachable cell
+        mask: bytearray holding 1 for every cell within the budget and 0 for every other cell
+        distances: array of unsigned 32-bit path costs from the source, one entry per cell.
+            Cells outside the budget hold UNREACHABLE.
+        count: the number of cells within the budget
+
+    Constants:
+        UNREACHABLE: distance of cells that cannot be reached within the budget
+    """
+
+    UNREACHABLE = 0xFFFFFFFF
+
+    def __init__(self, engine, source, budget, vectorized=False):
+        """ Initializes an instance of the Isochrone class.
+
+        Args:
+            engine: the Engine object that describes the grid
+            source: the index of the source cell
+            budget: the largest path cost of a reachable cell
+            vectorized: bool that determines if the NumPy wavefront should be used instead
+                of Dijkstra's algorithm. It is faster for large budgets on grids with few
+                obstacles.
+
+        Raises:
+            ValueError: budget is negative, or vectorized is True and the grid has more than
+                one layer
+            ImportError: vectorized is True but NumPy is not installed
+        """
+
+        if budget < 0:
+            raise ValueError('budget must not be negative')
+
+        self.__engine = engine
+        self.__source = source
+        self.__budget = budget
+
+        if vectorized:
+            self.__distances = self.build_vectorized()
+        else:
+            self.__distances = self.build()
+
+        self.__mask = bytearray(distance != Isochrone.UNREACHABLE
+                                for distance in self.__distances)
+        self.__count = self.__mask.count(1)
+
+    def build(self):
+        """ Runs Dijkstra's algorithm outwards from the source cell up to the budget.
+
+        Returns:
+            The array of path costs from the source
+        """
+
+        engine = self.__engine
+        size = engine.get_columns() * engine.get_rows()
+        distances = array('I', [Isochrone.UNREACHABLE]) * size
+        if not engine.is_walkable(self.__source):
+            return distances
+
+        # Cells are only written to distances once they are settled within the budget
+        costs = {self.__source: 0}
+        opened = MinPriorityQueue.MinPriorityQueue()
+        opened.insert(0, self.__source)
+
+        while True:
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                break
+
+            cost = costs[current]
+            if cost > self.__budget:
+                break
+            distances[current] = cost
+
+            for adj, step in engine.get_neighbours(current):
+                if distances[adj] != Isochrone.UNREACHABLE:
+                    continue
+                g_cost = cost + step
+                if adj not in costs:
+                    costs[adj] = g_cost
+                    opened.insert(g_cost, adj)
+                elif g_cost < costs[adj]:
+                    costs[adj] = g_cost
+                    opened.decrease_key(adj, g_cost)
+
+        return distances
+
+    def build_vectorized(self):
+        """ Computes the path costs with a NumPy wavefront bounded by the budget.
+
+        Every iteration relaxes all cells against all eight neighbours at once, and costs
+        above the budget are discarded after every iteration, so the number of iterations is
+        at most the number of steps that fit in the budget.
+
+        Raises:
+            ImportError: NumPy is not installed
+            ValueError: the grid has more than one layer
+
+        Returns:
+            The array of path costs from the source
+        """
+
+        if numpy is None:
+            raise ImportError('The vectorized isochrone requires NumPy')
+        if self.__engine.get_layers() > 1:
+            raise ValueError('The vectorized isochrone does not follow links between layers')
+
+        # Imported here because FlowField imports Engine, which imports this module
+        from FlowField import FlowField  # pylint: disable=import-outside-toplevel
+
+        engine = self.__engine
+        rows = engine.get_rows()
+        columns = engine.get_columns()
+        walkable = numpy.asarray(engine.get_walkable()).reshape(rows, columns) != 0
+
+        infinity = numpy.int64(Isochrone.UNREACHABLE)
+        distances = numpy.full((rows, columns), infinity, dtype=numpy.int64)
+        if walkable.flat[self.__source]:
+            distances.flat[self.__source] = 0
+
+        while True:
+            relaxed = distances.copy()
+            for i, j, cost in engine.DIRECTIONS:
+                dst, src = FlowField.shifted_slices(i, j, rows, columns)
+                numpy.minimum(relaxed[dst], distances[src] + cost, out=relaxed[dst])
+            relaxed[~walkable | (relaxed > self.__budget)] = infinity
+            if numpy.array_equal(relaxed, distances):
+                break
+            distances = relaxed
+
+        return array('I', distances.astype(numpy.uint32).tobytes())
+
+    def get_source(self):
+        """ Gets the index of the source cell. """
+
+        return self.__source
+
+    def get_budget(self):
+        """ Gets the largest path cost of a reachable cell. """
+
+        return self.__budget
+
+    def get_mask(self):
+        """ Gets the bytearray marking the cells within the budget. """
+
+        return self.__mask
+
+    def get_distances(self):
+        """ Gets the array of path costs from the source. """
+
+        return self.__distances
+
+    def get_count(self):
+        """ Gets the number of cells within the budget. """
+
+        return self.__count
+
+    def get_distance(self, index):
+        """ Gets the path cost from the source to a cell, or None if it is out of range. """
+
+        distance = self.__distances[index]
+        if distance == Isochrone.UNREACHABLE:
+            return None
+        return distance
+
+    def get_cells(self):
+        """ Gets the list of the indices of the cells within the budget in row-major order. """
+
+        return [index for index, reached in enumerate(self.__mask) if reached]
+
+    def __contains__(self, index):
+        return bool(self.__mask[index])
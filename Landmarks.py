@@ -0,0 +1,336 @@
+""" Python script that contains the Landmarks class definition.
+
+Landmarks class implements the ALT (A*, Landmarks, Triangle inequality) heuristic. A small
+number of landmark cells are selected and the path cost from every landmark to every cell is
+precomputed. By the triangle inequality, |d(L, t) - d(L, v)| is a lower bound on the path cost
+between v and t for every landmark L, which is far better informed than the octile distance on
+maps with long walls.
+"""
+
+from array import array
+import random
+import struct
+import zlib
+from FlowField import FlowField
+
+
+class Landmarks:
+    """ Precomputed landmark distance tables used as an A* heuristic.
+
+    The distance tables are stored in a single array of unsigned 32-bit integers holding one
+    row of columns * rows entries per landmark, so they can be written to and read from disk
+    without conversion.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        landmarks: list of the indices of the landmark cells
+        distances: array('I') of the concatenated distance tables of all landmarks
+        target: the target of the most recent heuristic query
+        target_distances: the distances from every landmark to target
+
+    Constants:
+        FARTHEST: selection strategy that repeatedly picks the cell furthest from all landmarks
+        AVOID: selection strategy that picks landmarks in regions the heuristic covers badly
+        MAGIC: the first bytes of a saved landmark file
+        HEADER: struct format of the header of a saved landmark file
+    """
+
+    FARTHEST = 'farthest'
+    AVOID = 'avoid'
+
+    MAGIC = b'PFLM'
+    HEADER = '<4sIIIII'
+
+    def __init__(self, engine, count=8, strategy=FARTHEST, seed=0, landmarks=None, distances=None):
+        """ Initializes an instance of the Landmarks class.
+
+        Landmarks are selected and their distance tables computed, unless both landmarks and
+        distances are given (for example when loading tables from disk).
+
+        Args:
+            engine: the Engine object that describes the grid
+            count: the number of landmarks to select
+            strategy: Landmarks.FARTHEST or Landmarks.AVOID
+            seed: seed of the random number generator used to pick the first cell
+            landmarks: list of precomputed landmark cell indices
+            distances: array('I') or memoryview of precomputed distance tables
+
+        Raises:
+            ValueError: strategy is not a known selection strategy
+        """
+
+        self.__engine = engine
+        self.__size = engine.get_columns() * engine.get_rows()
+        self.__target = None
+        self.__target_distances = ()
+
+        if landmarks is not None and distances is not None:
+            self.__landmarks = list(landmarks)
+            self.__distances = distances
+            return
+
+        self.__landmarks = []
+        self.__distances = array('I')
+
+        if strategy == Landmarks.FARTHEST:
+            self.select_farthest(count, seed)
+        elif strategy == Landmarks.AVOID:
+            self.select_avoid(count, seed)
+        else:
+            raise ValueError('Unknown landmark selection strategy: {0}'.format(strategy))
+
+    def get_landmarks(self):
+        """ Gets the list of landmark cell indices. """
+
+        return self.__landmarks
+
+    def get_distances(self):
+        """ Gets the concatenated distance tables of all landmarks. """
+
+        return self.__distances
+
+    def get_table(self, k):
+        """ Gets a memoryview of the distance table of the k-th landmark. """
+
+        return memoryview(self.__distances)[k * self.__size:(k + 1) * self.__size]
+
+    def add_landmark(self, landmark):
+        """ Adds a landmark cell and computes its distance table with Dijkstra's algorithm.
+
+        Returns:
+            The distance table of the new landmark
+        """
+
+        table = FlowField(self.__engine, landmark).get_distances()
+        self.__landmarks.append(landmark)
+        self.__distances.extend(table)
+        self.__target = None
+        return table
+
+    def random_walkable_cell(self, rng):
+        """ Picks a random walkable cell, or None if the grid has no walkable cells. """
+
+        cells = [i for i in range(self.__size) if self.__engine.is_walkable(i)]
+        if not cells:
+            return None
+        return rng.choice(cells)
+
+
+    # ---------------------------------------------
+    # Methods related to landmark selection
+    # ---------------------------------------------
+
+    def select_farthest(self, count, seed):
+        """ Selects landmarks with the farthest-point strategy.
+
+        The first landmark is the cell furthest from a random cell. Every further landmark is
+        the walkable cell whose closest landmark is furthest away. Cells that no landmark can
+        reach are the furthest of all, so every connected region receives a landmark.
+        """
+
+        start = self.random_walkable_cell(random.Random(seed))
+        if start is None:
+            return
+
+        closest = FlowField(self.__engine, start).get_distances()
+        for _ in range(count):
+            best, best_distance = None, -1
+            for i in range(self.__size):
+                if self.__engine.is_walkable(i) and closest[i] > best_distance:
+                    best, best_distance = i, closest[i]
+            if best_distance <= 0:
+                break
+
+            table = self.add_landmark(best)
+            if len(self.__landmarks) == 1:
+                # The random cell is not a landmark, so forget its distances
+                closest = table
+            else:
+                for i in range(self.__size):
+                    if table[i] < closest[i]:
+                        closest[i] = table[i]
+
+    def select_avoid(self, count, seed):
+        """ Selects landmarks with the avoid strategy.
+
+        For a random root cell, the shortest path tree is built and every cell is weighted by
+        how much the current heuristic underestimates its distance from the root. The subtree
+        with the largest total weight that does not contain a landmark is followed down to a
+        leaf, which becomes the new landmark.
+        """
+
+        rng = random.Random(seed)
+        if self.random_walkable_cell(rng) is None:
+            return
+
+        for _ in range(count):
+            root = self.random_walkable_cell(rng)
+            tree = FlowField(self.__engine, root)
+            distances = tree.get_distances()
+
+            reached = [i for i in range(self.__size) if distances[i] != FlowField.UNREACHABLE]
+            reached.sort(key=lambda i: distances[i], reverse=True)
+
+            sizes = {}
+            best_child = {}
+            has_landmark = set(self.__landmarks)
+            for cell in reached:
+                weight = distances[cell] - self.get_h_cost(cell, root)
+                size = 0 if cell in has_landmark else sizes.get(cell, 0) + weight
+                sizes[cell] = size
+
+                parent = tree.get_next_step(cell)
+                if parent is None:
+                    continue
+                if cell in has_landmark:
+                    has_landmark.add(parent)
+                sizes[parent] = sizes.get(parent, 0) + size
+                if size > sizes.get(best_child.get(parent), -1):
+                    best_child[parent] = cell
+
+            # Follow the heaviest subtree from the root down to a leaf
+            leaf = root
+            while leaf in best_child and sizes[best_child[leaf]] > 0:
+                leaf = best_child[leaf]
+
+            if leaf in self.__landmarks:
+                break
+            self.add_landmark(leaf)
+
+
+    # ---------------------------------------------
+    # Methods related to the ALT heuristic
+    # ---------------------------------------------
+
+    def get_h_cost(self, index, target):
+        """ Gets the ALT lower bound on the path cost between two cells.
+
+        The bound is the largest of the octile distance and |d(L, t) - d(L, v)| over all
+        landmarks L. Landmarks that cannot reach one of the cells are skipped.
+
+        Args:
+            index: the index of the first cell
+            target: the index of the second cell
+
+        Returns:
+            An admissible estimate of the path cost between the cells
+        """
+
+        if target != self.__target:
+            self.__target = target
+            self.__target_distances = tuple(
+                (k * self.__size, self.__distances[k * self.__size + target])
+                for k in range(len(self.__landmarks)))
+
+        best = self.__engine.get_h_cost(index, target)
+        unreachable = FlowField.UNREACHABLE
+        for offset, target_distance in self.__target_distances:
+            distance = self.__distances[offset + index]
+            if distance == unreachable or target_distance == unreachable:
+                continue
+            bound = abs(target_distance - distance)
+            if bound > best:
+                best = bound
+        return best
+
+
+    # ---------------------------------------------
+    # Methods related to saving and loading tables
+    # ---------------------------------------------
+
+    def save(self, path):
+        """ Writes the landmarks and their distance tables to a file.
+
+        The file starts with a header holding the grid dimensions, the number of landmarks and
+        a checksum of the walkability array, followed by the landmark indices and the raw tables.
+
+        Args:
+            path: the path of the file to write
+        """
+
+        header = struct.pack(Landmarks.HEADER, Landmarks.MAGIC, 1,
+                             self.__engine.get_columns(), self.__engine.get_rows(),
+                             len(self.__landmarks), self.get_checksum(self.__engine))
+
+        with open(path, 'wb') as file:
+            file.write(header)
+            array('I', self.__landmarks).tofile(file)
+            file.write(self.__distances)
+
+    @staticmethod
+    def load(path, engine):
+        """ Reads landmarks and their distance tables from a file.
+
+        Args:
+            path: the path of the file written by Landmarks.save
+            engine: the Engine object that describes the grid
+
+        Raises:
+            ValueError: the file is not a landmark file or was built for a different grid
+
+        Returns:
+            The Landmarks object
+        """
+
+        with open(path, 'rb') as file:
+            header = file.read(struct.calcsize(Landmarks.HEADER))
+            if len(header) != struct.calcsize(Landmarks.HEADER):
+                raise ValueError('File is not a landmark file')
+
+            magic, _, columns, rows, count, checksum = struct.unpack(Landmarks.HEADER, header)
+            if magic != Landmarks.MAGIC:
+                raise ValueError('File is not a landmark file')
+            if (columns, rows) != (engine.get_columns(), engine.get_rows()):
+                raise ValueError('Landmark file was built for a grid of a different size')
+            if checksum != Landmarks.get_checksum(engine):
+                raise ValueError('Landmark file was built for a different grid layout')
+
+            landmarks = array('I')
+            landmarks.fromfile(file, count)
+            distances = array('I')
+            distances.fromfile(file, count * columns * rows)
+
+        return Landmarks(engine, landmarks=landmarks, distances=distances)
+
+    @staticmethod
+    def cached(engine, cache, count=8, strategy=FARTHEST, seed=0, key=None):
+        """ Gets landmarks from a PrecomputeCache, selecting them only if the entry is stale.
+
+        The entry holds the number of landmarks, their indices and their distance tables in
+        one array, and the returned Landmarks object reads the tables from the mapped file.
+
+        Args:
+            engine: the Engine object that describes the grid
+            cache: the PrecomputeCache object to use
+            count: the number of landmarks to select
+            strategy: Landmarks.FARTHEST or Landmarks.AVOID
+            seed: seed of the random number generator used to pick the first cell
+            key: the content hash of the map, computed from engine if not given
+
+        Returns:
+            The Landmarks object
+        """
+
+        def build():
+            landmarks = Landmarks(engine, count, strategy, seed)
+            table = array('I', [len(landmarks.get_landmarks())])
+            table.extend(landmarks.get_landmarks())
+            table.extend(landmarks.get_distances())
+            return table
+
+        if key is None:
+            key = cache.get_key(engine)
+        name = 'landmarks-{0}-{1}-{2}'.format(strategy, count, seed)
+        table = cache.get(key, name, build)
+
+        count = table[0]
+        return Landmarks(engine, landmarks=table[1:1 + count], distances=table[1 + count:])
+
+    @staticmethod
+    def get_checksum(engine):
+        """ Gets the CRC-32 checksum of the walkability array and the links of an Engine. """
+
+        checksum = zlib.crc32(bytes(bytearray(engine.get_walkable())))
+        for link in engine.get_all_links():
+            checksum = zlib.crc32(struct.pack('<III', *link), checksum)
+        return checksum
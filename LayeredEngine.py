@@ -0,0 +1,322 @@
+""" Python script that contains the LayeredEngine class definition.
+
+LayeredEngine class is an Engine over a building of several floors (layers) of the same size,
+connected by sparse links such as stairs and elevators. The layers are stored back to back in
+a single compact walkability array, one byte per cell, so a LayeredEngine looks to the other
+headless engines like an Engine over a grid of layers * rows rows whose layer boundaries can
+only be crossed through links.
+"""
+
+import Bitboard
+from Engine import Engine
+
+
+class LayeredEngine(Engine):
+    """ Headless pathfinding over stacked layers connected by links.
+
+    Cells are identified by their layer-major index ((layer * rows + row) * columns + column).
+    Movement inside a layer matches Engine. A link connects two cells, usually on different
+    layers, in both directions at a given cost.
+
+    get_rows returns the number of rows of all layers together, so that the number of cells is
+    still get_columns() * get_rows(); get_layer_rows returns the number of rows of one layer.
+
+    Attributes:
+        layers: the number of layers
+        layer_rows: number of rows in every layer
+        layer_size: the number of cells in every layer
+        links: dict mapping every cell with links to a tuple of (index, cost) of the cells it
+            is linked to
+        link_rate: (numerator, denominator) of the smallest cost per layer crossed that any
+            link adds to the octile distance between its ends, used by get_h_cost
+        link_floor: the smallest cost per layer crossed of any link, rounded down, or None
+    """
+
+    def __init__(self, walkable, columns, rows, layers, links=()):
+        """ Initializes an instance of the LayeredEngine class.
+
+        Args:
+            walkable: sequence or buffer with one entry per cell in layer-major order, truthy
+                if walkable (see Engine.as_layer)
+            columns: number of columns in every layer
+            rows: number of rows in every layer
+            layers: the number of layers
+            links: iterable of (index, index, cost) tuples of the links between cells
+
+        Raises:
+            ValueError: walkable does not contain exactly layers * columns * rows entries, or
+                a link is invalid
+        """
+
+        try:
+            view = memoryview(walkable)
+        except TypeError:
+            view = None
+        if view is not None and view.ndim == 3:
+            if view.shape != (layers, rows, columns):
+                raise ValueError('layers have shape {0} instead of ({1}, {2}, {3})'.format(
+                    view.shape, layers, rows, columns))
+            if not view.c_contiguous:
+                raise ValueError('layers must be C-contiguous')
+            walkable = view.cast('B').cast(view.format)
+
+        super().__init__(walkable, columns, rows * layers)
+        self.__layers = layers
+        self.__layer_rows = rows
+        self.__layer_size = columns * rows
+        self.__links = {}
+        self.__link_rate = None
+        self.__link_floor = None
+        for a, b, cost in links:
+            self.add_link(a, b, cost)
+
+    @staticmethod
+    def from_layers(layers, columns, rows, links=()):
+        """ Creates a LayeredEngine from one walkability array per layer.
+
+        Args:
+            layers: list of walkability arrays with one entry per cell of a layer in row-major
+                order (see Engine.as_layer)
+            columns: number of columns in every layer
+            rows: number of rows in every layer
+            links: iterable of (index, index, cost) tuples of the links between cells
+
+        Returns:
+            The LayeredEngine object over a copy of the layers
+        """
+
+        walkable = bytearray()
+        for layer in layers:
+            view = Engine.as_layer(layer, columns, rows)
+            if isinstance(view, memoryview) and view.itemsize == 1:
+                walkable += view.cast('B')
+            else:
+                walkable.extend(1 if cell else 0 for cell in view)
+        return LayeredEngine(walkable, columns, rows, len(layers), links)
+
+    def get_layers(self):
+        """ Gets the number of layers. """
+
+        return self.__layers
+
+    def get_layer_rows(self):
+        """ Gets the number of rows in every layer. """
+
+        return self.__layer_rows
+
+    def get_layer(self, index):
+        """ Gets the layer of the cell with the given index. """
+
+        return index // self.__layer_size
+
+    def get_layer_walkable(self, layer):
+        """ Gets the walkability of a single layer as a view into the walkability array. """
+
+        walkable = self.get_walkable()
+        return walkable[layer * self.__layer_size:(layer + 1) * self.__layer_size]
+
+    def get_cell(self, layer, row, col):
+        """ Gets the index of the cell at the given layer, row and column. """
+
+        return (layer * self.__layer_rows + row) * self.get_columns() + col
+
+    def get_position(self, index):
+        """ Gets the (layer, row, column) of the cell with the given index. """
+
+        layer, offset = divmod(index, self.__layer_size)
+        row, col = divmod(offset, self.get_columns())
+        return layer, row, col
+
+    def add_link(self, a, b, cost):
+        """ Links two walkable cells in both directions.
+
+        Args:
+            a: the index of the first cell
+            b: the index of the second cell
+            cost: the positive cost of moving between the cells
+
+        Raises:
+            ValueError: a cell is off the grid or an obstacle, the cells are the same, or the
+                cost is not a positive int
+        """
+
+        size = self.__layer_size * self.__layers
+        if not (0 <= a < size and 0 <= b < size) or a == b:
+            raise ValueError('link ({0}, {1}) does not join two cells'.format(a, b))
+        if not (self.is_walkable(a) and self.is_walkable(b)):
+            raise ValueError('link ({0}, {1}) joins an obstacle'.format(a, b))
+        if not isinstance(cost, int) or cost <= 0:
+            raise ValueError('link cost must be a positive int')
+
+        self.__links[a] = self.__links.get(a, ()) + ((b, cost),)
+        self.__links[b] = self.__links.get(b, ()) + ((a, cost),)
+
+        # The heuristic needs a lower bound on what every crossed layer adds to a path. Links
+        # within a layer only matter if they are shorter than the octile distance.
+        crossed = abs(self.get_layer(a) - self.get_layer(b))
+        added = cost - self.get_planar_cost(a, b)
+        if crossed or added < 0:
+            rate = (added, max(crossed, 1))
+            if self.__link_rate is None or rate[0] * self.__link_rate[1] \
+                    < self.__link_rate[0] * rate[1]:
+                self.__link_rate = rate
+        if crossed and (self.__link_floor is None or cost // crossed < self.__link_floor):
+            self.__link_floor = cost // crossed
+
+    def get_links(self, index):
+        """ Gets the (index, cost) of the cells linked to the given cell. """
+
+        return self.__links.get(index, ())
+
+    def get_all_links(self):
+        """ Gets every link as an (index, index, cost) tuple, in order of the first index. """
+
+        return [(a, b, cost) for a in sorted(self.__links)
+                for b, cost in self.__links[a] if a < b]
+
+    def get_link_count(self):
+        """ Gets the number of links. """
+
+        return sum(len(links) for links in self.__links.values()) // 2
+
+    def get_neighbour(self, index, direction):
+        """ Gets the walkable cell adjacent to a cell in a given direction within its layer.
+
+        Args:
+            index: the index of the cell
+            direction: index into Engine.DIRECTIONS
+
+        Returns:
+            The index of the adjacent cell, or None if it is off the layer or an obstacle
+        """
+
+        columns = self.get_columns()
+        row, col = divmod(index % self.__layer_size, columns)
+        i, j, _ = Engine.DIRECTIONS[direction]
+        if 0 <= row + i < self.__layer_rows and 0 <= col + j < columns:
+            adj = index + i * columns + j
+            if self.get_walkable()[adj]:
+                return adj
+        return None
+
+    def get_neighbours(self, index):
+        """ Gets all walkable cells adjacent to the given cell and the cells linked to it.
+
+        Args:
+            index: the index of the cell
+
+        Returns:
+            adjacent: list of (index, cost) tuples for every walkable adjacent or linked cell,
+                with a single entry per cell
+        """
+
+        adjacent = []
+        walkable = self.get_walkable()
+        columns = self.get_columns()
+        row, col = divmod(index % self.__layer_size, columns)
+
+        for i, j, cost in Engine.DIRECTIONS:
+            if 0 <= row + i < self.__layer_rows and 0 <= col + j < columns:
+                adj = index + i * columns + j
+                if walkable[adj]:
+                    adjacent.append((adj, cost))
+
+        links = self.__links.get(index)
+        if links:
+            # A link between adjacent cells duplicates a step, and only the cheaper one is kept
+            costs = dict(adjacent)
+            for adj, cost in links:
+                if adj not in costs or cost < costs[adj]:
+                    costs[adj] = cost
+            adjacent = list(costs.items())
+        return adjacent
+
+    def get_planar_cost(self, index, target):
+        """ Gets the octile distance between the positions of two cells within their layers. """
+
+        return super().get_h_cost(index % self.__layer_size, target % self.__layer_size)
+
+    def get_h_cost(self, index, target):
+        """ Gets a consistent estimate of the path cost between two cells.
+
+        Every path from one cell to the other crosses at least as many layers as lie between
+        them, so it costs at least the octile distance between their positions plus the
+        smallest cost per crossed layer that any link adds to the octile distance between its
+        ends. If some link costs less than the octile distance between its ends, the estimate
+        only counts the cheapest cost per crossed layer of the links themselves.
+
+        Args:
+            index: the index of the first cell
+            target: the index of the second cell
+
+        Returns:
+            A lower bound on the cost of the cheapest path between the cells
+        """
+
+        crossed = abs(index // self.__layer_size - target // self.__layer_size)
+        rate = self.__link_rate
+        if rate is None or rate[0] >= 0:
+            planar = self.get_planar_cost(index, target)
+            return planar + (crossed * rate[0] // rate[1] if crossed and rate else 0)
+        return crossed * (self.__link_floor or 0)
+
+    def get_path_cost(self, path):
+        """ Gets the total movement cost of a path of adjacent or linked cells.
+
+        Args:
+            path: list of cell indices where consecutive cells are adjacent or linked
+
+        Returns:
+            The sum of the costs of every step in the path
+        """
+
+        cost = 0
+        for a, b in zip(path, path[1:]):
+            step = dict(self.get_neighbours(a)).get(b)
+            cost += super().get_path_cost([a, b]) if step is None else step
+        return cost
+
+    def has_path(self, start, target):
+        """ Checks if there is any path between two cells with bit-parallel flood fills.
+
+        Bitboards do not follow links, so every layer is packed into its own Bitboard. The
+        component of the start cell is flooded, and every link leaving a flooded component
+        floods the component at its other end, until the target is reached or no link leads
+        anywhere new. The Bitboards are built on every call, one bit per cell, so edits to the
+        walkability array are always seen.
+
+        Args:
+            start: the index of the start cell
+            target: the index of the target cell
+
+        Returns:
+            True if both cells are walkable and connected, False otherwise
+        """
+
+        if not self.is_walkable(start) or not self.is_walkable(target):
+            return False
+
+        size = self.__layer_size
+        boards = {}
+        reached = {}
+        pending = [start]
+        while pending:
+            cell = pending.pop()
+            layer = cell // size
+            board = boards.get(layer)
+            if board is None:
+                board = Bitboard.Bitboard(Engine(self.get_layer_walkable(layer),
+                                                 self.get_columns(), self.__layer_rows))
+                boards[layer] = board
+            if reached.get(layer, 0) & board.get_bit(cell % size):
+                continue
+
+            component = board.get_reachable(cell % size)
+            reached[layer] = reached.get(layer, 0) | component
+            if target // size == layer and component & board.get_bit(target % size):
+                return True
+
+            for index, links in self.__links.items():
+                if index // size == layer and component & board.get_bit(index % size):
+                    pending.extend(adj for adj, _ in links)
+        return False
@@ -0,0 +1,373 @@
+""" Python script that contains functions for reading and writing grid and scenario files.
+
+Grids are read from and written to MovingAI benchmark .map text files, and path queries are
+read from MovingAI .scen scenario files. Scenario files are read lazily, one query at a time,
+so files with millions of queries never have to be held in memory.
+
+Grids can also be stored in a compact binary format: a fixed header followed by the
+walkability layer (one byte or one bit per cell) and an optional cost layer (one byte per
+cell). Binary grid files are opened with mmap, and the engines read the layers in place
+without copying them, so even very large maps open almost instantly.
+"""
+
+import mmap
+import struct
+from Engine import Engine
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Characters of a MovingAI map that can be walked on
+WALKABLE_TERRAIN = b'.GS'
+
+# Header of a binary grid file: magic, version, packing, flags, columns, rows
+GRID_HEADER = struct.Struct('<4sHBBII')
+GRID_MAGIC = b'PFGR'
+GRID_VERSION = 1
+
+# Walkability packings of a binary grid file
+GRID_PACK_BYTES = 0
+GRID_PACK_BITS = 1
+
+# Header flag set if the file has a cost layer
+GRID_HAS_COSTS = 1
+
+# Layers after the walkability layer start on a multiple of this many bytes
+LAYER_ALIGNMENT = 8
+
+
+def read_map(path):
+    """ Reads a MovingAI .map file.
+
+    The file starts with a header of "type", "height", "width" and "map" lines, followed by
+    one line of characters per row of the grid.
+
+    Args:
+        path: the path of the .map file
+
+    Raises:
+        ValueError: the file is not a valid .map file
+
+    Returns:
+        An Engine object over the grid in the file
+    """
+
+    with open(path, 'rb') as file:
+        header = {}
+        for line in file:
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == b'map':
+                break
+            if len(words) != 2:
+                raise ValueError('Invalid map header line: {0!r}'.format(line))
+            header[words[0].decode()] = words[1].decode()
+        else:
+            raise ValueError('Map file has no "map" line')
+
+        try:
+            columns = int(header['width'])
+            rows = int(header['height'])
+        except (KeyError, ValueError):
+            raise ValueError('Map header must give an integer width and height')
+
+        walkable = bytearray(columns * rows)
+        table = bytes(1 if i in WALKABLE_TERRAIN else 0 for i in range(256))
+        for row in range(rows):
+            line = file.readline().rstrip(b'\r\n')
+            if len(line) != columns:
+                raise ValueError('Map row {0} does not have {1} columns'.format(row, columns))
+            walkable[row * columns:(row + 1) * columns] = line.translate(table)
+
+    return Engine(walkable, columns, rows)
+
+
+def read_scenarios(path):
+    """ Lazily reads the queries of a MovingAI .scen file.
+
+    Every line after the "version" line holds a bucket, a map name, the map width and height,
+    the start x and y, the goal x and y and the optimal path length, separated by whitespace.
+
+    Args:
+        path: the path of the .scen file
+
+    Raises:
+        ValueError: a line of the file is not a valid scenario
+
+    Yields:
+        (map name, start row, start column, target row, target column) tuples
+    """
+
+    with open(path, 'r') as file:
+        for number, line in enumerate(file, 1):
+            words = line.split()
+            if not words or words[0] == 'version':
+                continue
+            if len(words) < 8:
+                raise ValueError('Invalid scenario on line {0} of {1}'.format(number, path))
+            start_x, start_y, goal_x, goal_y = (int(word) for word in words[4:8])
+            yield words[1], start_y, start_x, goal_y, goal_x
+
+
+def as_bytes(walkable):
+    """ Converts a walkability sequence to bytes holding exactly 0 or 1 per cell. """
+
+    if isinstance(walkable, PackedBits):
+        return walkable.unpack()
+    try:
+        view = memoryview(walkable)
+    except TypeError:
+        view = None
+    if view is None or view.itemsize != 1 or not view.c_contiguous:
+        return bytes(1 if cell else 0 for cell in walkable)
+    return bytes(view.cast('B')).translate(bytes([0] + [1] * 255))
+
+
+def write_map(path, engine):
+    """ Writes the grid of an Engine to a MovingAI .map file.
+
+    Walkable cells are written as '.' and obstacles as '@'.
+
+    Args:
+        path: the path of the .map file
+        engine: the Engine object that describes the grid
+    """
+
+    columns, rows = engine.get_columns(), engine.get_rows()
+    walkable = as_bytes(engine.get_walkable())
+    table = bytes.maketrans(b'\x00\x01', b'@.')
+
+    with open(path, 'wb') as file:
+        file.write('type octile\nheight {0}\nwidth {1}\nmap\n'.format(rows, columns).encode())
+        for row in range(rows):
+            file.write(walkable[row * columns:(row + 1) * columns].translate(table))
+            file.write(b'\n')
+
+
+def write_grid(path, engine, packed=False, costs=None):
+    """ Writes the grid of an Engine to a binary grid file.
+
+    The file holds a GRID_HEADER, the walkability layer and, if costs are given, a cost layer
+    of one unsigned byte per cell. Every layer starts on a multiple of LAYER_ALIGNMENT bytes.
+
+    Args:
+        path: the path of the grid file
+        engine: the Engine object that describes the grid
+        packed: bool that determines if walkability is stored as one bit per cell instead of
+            one byte per cell
+        costs: optional bytes-like object with one cost per cell in row-major order
+
+    Raises:
+        ValueError: costs does not contain exactly one entry per cell
+    """
+
+    columns, rows = engine.get_columns(), engine.get_rows()
+    walkable = as_bytes(engine.get_walkable())
+    if costs is not None and len(costs) != columns * rows:
+        raise ValueError('costs must contain exactly columns * rows entries')
+
+    if packed:
+        # Bit i of the number is cell i, so the little-endian bytes hold 8 cells each
+        # with the first cell in the lowest bit
+        bits = walkable.translate(bytes.maketrans(b'\x00\x01', b'01'))[::-1]
+        walkable = int(bits or b'0', 2).to_bytes((len(walkable) + 7) // 8, 'little')
+
+    flags = GRID_HAS_COSTS if costs is not None else 0
+    packing = GRID_PACK_BITS if packed else GRID_PACK_BYTES
+    with open(path, 'wb') as file:
+        file.write(GRID_HEADER.pack(GRID_MAGIC, GRID_VERSION, packing, flags, columns, rows))
+        file.write(walkable)
+        if costs is not None:
+            file.write(bytes(-file.tell() % LAYER_ALIGNMENT))
+            file.write(bytes(costs))
+
+
+class PackedBits:
+    """ Read-only sequence of 0 or 1 values stored as one bit per cell.
+
+    Cell i is bit i % 8 of byte i // 8. A PackedBits object can be used as the walkability
+    layer of an Engine without unpacking it.
+
+    Attributes:
+        data: the bytes-like object that holds the bits
+        length: the number of cells
+    """
+
+    def __init__(self, data, length):
+        """ Initializes an instance of the PackedBits class.
+
+        Raises:
+            ValueError: data is too short to hold length bits
+        """
+
+        if len(data) * 8 < length:
+            raise ValueError('data is too short to hold {0} bits'.format(length))
+        self.__data = data
+        self.__length = length
+
+    def __len__(self):
+        return self.__length
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.__length:
+            raise IndexError('PackedBits index out of range')
+        return (self.__data[index >> 3] >> (index & 7)) & 1
+
+    def __array__(self, dtype=None, copy=None):
+        """ Unpacks the bits into a NumPy array for the vectorized engines. """
+
+        bits = numpy.unpackbits(numpy.frombuffer(self.__data, numpy.uint8),
+                                count=self.__length, bitorder='little')
+        return bits if dtype is None else bits.astype(dtype)
+
+    def unpack(self):
+        """ Gets the bits as bytes holding one 0 or 1 per cell. """
+
+        number = int.from_bytes(self.__data, 'little')
+        bits = format(number, 'b').zfill(len(self.__data) * 8)[::-1][:self.__length]
+        return bits.encode().translate(bytes.maketrans(b'01', b'\x00\x01'))
+
+
+class GridFile:
+    """ Binary grid file opened with mmap.
+
+    The layers of the file are used in place: the Engine returned by get_engine reads the
+    walkability layer straight from the mapped pages, so opening a file takes the same time
+    whatever the size of the grid. A GridFile should be closed once its engines are no longer
+    needed. It can be used as a context manager.
+
+    Attributes:
+        file: the open file object
+        mmap: the read-only mmap of the file
+        columns: number of columns in the grid
+        rows: number of rows in the grid
+        walkable: the walkability layer, a memoryview or PackedBits over the mmap
+        costs: memoryview of the cost layer over the mmap, or None
+        engine: the Engine over the walkability layer, created on first use
+    """
+
+    def __init__(self, path):
+        """ Opens a binary grid file.
+
+        Args:
+            path: the path of the grid file
+
+        Raises:
+            ValueError: the file is not a valid grid file
+        """
+
+        self.__file = open(path, 'rb')
+        self.__views = []
+        self.__engine = None
+        try:
+            self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.__file.close()
+            raise ValueError('Grid file is empty')
+
+        try:
+            self.read_layers()
+        except ValueError:
+            self.close()
+            raise
+
+    def read_layers(self):
+        """ Validates the header and creates the views of the layers. """
+
+        if len(self.__mmap) < GRID_HEADER.size:
+            raise ValueError('Grid file is too short')
+        magic, version, packing, flags, columns, rows = GRID_HEADER.unpack_from(self.__mmap)
+        if magic != GRID_MAGIC or version != GRID_VERSION:
+            raise ValueError('Not a grid file, or an unsupported version')
+        if packing not in (GRID_PACK_BYTES, GRID_PACK_BITS):
+            raise ValueError('Unknown walkability packing {0}'.format(packing))
+
+        size = columns * rows
+        walkable_size = (size + 7) // 8 if packing == GRID_PACK_BITS else size
+        end = GRID_HEADER.size + walkable_size
+        costs_offset = end + (-end % LAYER_ALIGNMENT)
+        if flags & GRID_HAS_COSTS:
+            end = costs_offset + size
+        if len(self.__mmap) < end:
+            raise ValueError('Grid file is truncated')
+
+        view = memoryview(self.__mmap)
+        self.__views.append(view)
+        walkable = view[GRID_HEADER.size:GRID_HEADER.size + walkable_size]
+        self.__views.append(walkable)
+        if packing == GRID_PACK_BITS:
+            walkable = PackedBits(walkable, size)
+
+        self.__costs = None
+        if flags & GRID_HAS_COSTS:
+            self.__costs = view[costs_offset:costs_offset + size]
+            self.__views.append(self.__costs)
+
+        self.__columns = columns
+        self.__rows = rows
+        self.__walkable = walkable
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Unmaps and closes the file. Engines created from it can no longer be used. """
+
+        for view in reversed(self.__views):
+            view.release()
+        self.__views.clear()
+        self.__engine = None
+        if not self.__mmap.closed:
+            self.__mmap.close()
+        self.__file.close()
+
+    def get_columns(self):
+        """ Gets the number of columns in the grid. """
+
+        return self.__columns
+
+    def get_rows(self):
+        """ Gets the number of rows in the grid. """
+
+        return self.__rows
+
+    def get_walkable(self):
+        """ Gets the walkability layer as a memoryview, or PackedBits if it is bit-packed. """
+
+        return self.__walkable
+
+    def get_costs(self):
+        """ Gets the cost layer as a memoryview, or None if the file has no cost layer. """
+
+        return self.__costs
+
+    def is_packed(self):
+        """ Returns True if the walkability layer is stored as one bit per cell. """
+
+        return isinstance(self.__walkable, PackedBits)
+
+    def get_engine(self):
+        """ Gets an Engine that reads the walkability layer in place. """
+
+        if self.__engine is None:
+            self.__engine = Engine(self.__walkable, self.__columns, self.__rows)
+        return self.__engine
+
+
+def open_grid(path):
+    """ Opens a binary grid file written by write_grid.
+
+    Raises:
+        ValueError: the file is not a valid grid file
+
+    Returns:
+        The GridFile object
+    """
+
+    return GridFile(path)
@@ -0,0 +1,283 @@
+""" Python script that contains the MemoryProfiler class definition.
+
+MemoryProfiler class records how much memory a solve needs. It traces allocations with
+tracemalloc while the solve runs and reports the peak traced memory above what was allocated
+before it started, the memory it still holds afterwards, and the lines that allocated the most.
+Solvers can also hand over their search structures (the open list, the closed set, the
+per-cell state) while they are still alive, and the profiler reports the size of each one.
+
+Tracing slows allocations down several times, so profiling is opt-in and the sizes it reports
+are meant for sizing machines rather than for timing.
+"""
+
+from array import array
+import sys
+import tracemalloc
+
+
+class MemoryProfiler:
+    """ Peak traced memory and search structure sizes of profiled solves.
+
+    A solve is profiled between begin and end, or by calling it through measure. The report of
+    every profiled solve is a dict with:
+        peak_bytes: the peak traced memory during the solve, above the memory traced at begin
+        retained_bytes: the traced memory at end, above the memory traced at begin
+        structures: dict mapping the name of every recorded structure to its size in bytes
+        sites: list of (file:line, bytes, allocations) of the lines that allocated the most
+            memory between begin and the last call to record (or end if record was not called)
+
+    Attributes:
+        top_sites: the number of allocation sites kept in every report
+        reports: list of the reports of the profiled solves, the most recent last
+        started: True if tracing was started by begin and has to be stopped by end
+        baseline: the traced memory at begin
+        peak: the peak traced memory before the last call to record
+        before: the tracemalloc snapshot taken at begin
+        current: the report of the solve in progress, or None
+
+    Constants:
+        TOP_SITES: the default number of allocation sites kept in every report
+        MAX_REPORTS: the number of reports kept
+    """
+
+    TOP_SITES = 5
+    MAX_REPORTS = 100
+
+    # Objects whose size belongs to the program rather than to the structure referencing them
+    SHARED_TYPES = (type, type(sys), type(len), type(lambda: None))
+
+    def __init__(self, top_sites=TOP_SITES):
+        """ Initializes an instance of the MemoryProfiler class.
+
+        Args:
+            top_sites: the number of allocation sites kept in every report
+        """
+
+        self.__top_sites = top_sites
+        self.__reports = []
+        self.__started = False
+        self.__baseline = 0
+        self.__peak = 0
+        self.__before = None
+        self.__current = None
+
+    def begin(self):
+        """ Starts profiling a solve, starting tracemalloc if it is not tracing yet.
+
+        A solve that is still being profiled is cancelled first.
+        """
+
+        self.cancel()
+        self.__started = not tracemalloc.is_tracing()
+        if self.__started:
+            tracemalloc.start()
+
+        # The snapshot is taken before the peak is reset, so it is not part of the solve
+        self.__before = self.take_snapshot()
+        tracemalloc.reset_peak()
+        self.__baseline = tracemalloc.get_traced_memory()[0]
+        self.__peak = 0
+        self.__current = {'peak_bytes': 0, 'retained_bytes': 0, 'structures': {}, 'sites': []}
+
+    def record(self, **structures):
+        """ Records the sizes of the search structures of the solve in progress.
+
+        Structures are measured in the order they are given and an object reachable from more
+        than one of them is only counted in the first, so per-cell objects should be given
+        before the containers that hold them. The allocation sites are taken at the same time,
+        while the structures are still alive.
+
+        Args:
+            structures: the structures to measure, by name
+        """
+
+        if self.__current is None:
+            return
+
+        # Measuring allocates the snapshot and the set of counted objects, which would
+        # otherwise be part of the peak
+        self.__peak = max(self.__peak, tracemalloc.get_traced_memory()[1])
+        self.__current['sites'] = self.get_sites()
+        seen = set()
+        for name, value in structures.items():
+            self.__current['structures'][name] = MemoryProfiler.get_deep_size(value, seen)
+        del seen
+        tracemalloc.reset_peak()
+
+    def end(self):
+        """ Ends profiling the solve in progress and stores its report.
+
+        Returns:
+            The report of the solve, or None if no solve is being profiled
+        """
+
+        report = self.__current
+        if report is None:
+            return None
+
+        current, peak = tracemalloc.get_traced_memory()
+        report['peak_bytes'] = max(0, max(peak, self.__peak) - self.__baseline)
+        report['retained_bytes'] = max(0, current - self.__baseline)
+        if not report['structures']:
+            report['sites'] = self.get_sites()
+        if self.__started:
+            tracemalloc.stop()
+
+        self.__started = False
+        self.__current = None
+        self.__before = None
+        self.__reports.append(report)
+        del self.__reports[:-MemoryProfiler.MAX_REPORTS]
+        return report
+
+    def cancel(self):
+        """ Stops profiling the solve in progress, if any, without storing its report. """
+
+        if self.__current is None:
+            return
+        if self.__started:
+            tracemalloc.stop()
+        self.__started = False
+        self.__current = None
+        self.__before = None
+
+    def measure(self, function, *args):
+        """ Calls a function and profiles it as one solve.
+
+        Args:
+            function: the function to call
+            args: the arguments of the function
+
+        Returns:
+            The return value of the function
+        """
+
+        self.begin()
+        try:
+            return function(*args)
+        finally:
+            self.end()
+
+    def is_profiling(self):
+        """ Gets if a solve is being profiled. """
+
+        return self.__current is not None
+
+    def get_reports(self):
+        """ Gets the reports of the profiled solves, the most recent last. """
+
+        return self.__reports
+
+    def get_report(self):
+        """ Gets the report of the most recent profiled solve, or None. """
+
+        return self.__reports[-1] if self.__reports else None
+
+    def get_peak_bytes(self):
+        """ Gets the largest peak traced memory of the kept reports. """
+
+        return max((report['peak_bytes'] for report in self.__reports), default=0)
+
+    # -------------------------------------------
+    # Methods related to tracemalloc snapshots
+    # -------------------------------------------
+
+    @staticmethod
+    def take_snapshot():
+        """ Takes a tracemalloc snapshot without the allocations of tracemalloc itself. """
+
+        return tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def get_sites(self):
+        """ Gets the lines that allocated the most memory since begin.
+
+        Returns:
+            List of (file:line, bytes, allocations) tuples of at most top_sites lines
+        """
+
+        sites = []
+        for stat in self.take_snapshot().compare_to(self.__before, 'lineno'):
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            sites.append(('{0}:{1}'.format(frame.filename, frame.lineno),
+                          stat.size_diff, stat.count_diff))
+            if len(sites) == self.__top_sites:
+                break
+        return sites
+
+    # -------------------------------------------
+    # Methods related to structure sizes
+    # -------------------------------------------
+
+    @staticmethod
+    def get_deep_size(value, seen=None):
+        """ Gets the size of an object and of every object it references, in bytes.
+
+        Containers are followed into their items, and other objects into their instance
+        attributes. Classes, modules and functions are shared by the whole program and are not
+        counted. Buffers such as arrays and bytearrays are counted with their contents.
+
+        Args:
+            value: the object to measure
+            seen: optional set of the ids of objects already counted, which are skipped
+
+        Returns:
+            The number of bytes
+        """
+
+        if seen is None:
+            seen = set()
+
+        size = 0
+        pending = [value]
+        while pending:
+            value = pending.pop()
+            if id(value) in seen or isinstance(value, MemoryProfiler.SHARED_TYPES):
+                continue
+            seen.add(id(value))
+            size += sys.getsizeof(value)
+
+            if isinstance(value, (str, bytes, bytearray, array, memoryview, int, float)):
+                continue
+            if isinstance(value, dict):
+                pending.extend(value.keys())
+                pending.extend(value.values())
+            elif isinstance(value, (list, tuple, set, frozenset)):
+                pending.extend(value)
+            else:
+                attributes = getattr(value, '__dict__', None)
+                if attributes is not None:
+                    pending.append(attributes)
+        return size
+
+    @staticmethod
+    def format_bytes(count):
+        """ Gets a number of bytes as text in B, KiB or MiB. """
+
+        if count < 1024:
+            return '{0} B'.format(count)
+        if count < 1024 * 1024:
+            return '{0:.1f} KiB'.format(count / 1024)
+        return '{0:.1f} MiB'.format(count / (1024 * 1024))
+
+    def get_summary(self):
+        """ Gets lines of text describing the most recent profiled solve.
+
+        Returns:
+            List of strings: the peak and retained memory, one line per structure and one line
+            per allocation site
+        """
+
+        report = self.get_report()
+        if report is None:
+            return ['No profiled solves']
+
+        lines = ['peak {0}, retained {1}'.format(self.format_bytes(report['peak_bytes']),
+                                                 self.format_bytes(report['retained_bytes']))]
+        for name, size in report['structures'].items():
+            lines.append('{0:<10} {1}'.format(name, self.format_bytes(size)))
+        for site, size, count in report['sites']:
+            lines.append('{0} {1} in {2} blocks'.format(site, self.format_bytes(size), count))
+        return lines
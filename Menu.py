@@ -12,12 +12,16 @@ class Menu:
         - Toggle between placing down OBSTACLE, START, and TARGET Nodes on the Grid
         - Execute the A* pathfinding algorithm with or without showing steps
         - Reset the Grid
+        - Shade the Grid with the distance field of the target Node
+        - Shade the area of the Grid that can be reached from the start Node
+        - Replay the most recent search
 
     Attributes:
         surface: The pygame.Surface object to draw onto
         rect: The pygame.Rect that captures the area of the Menu on the Surface
         col1_width: The width of the first column
         col2_width: The width of the second column
+        col3_width: The width of the third column
         row_height: The height of a row
         menu_options: The list of TextBox objects which correspond to Menu options
             that can be executed
@@ -27,7 +31,7 @@ class Menu:
     BRDR_COLOR = (0, 0, 0)
     BG_COLOR = (80, 80, 80)
 
-    NUM_OF_BUTTONS = 6
+    NUM_OF_BUTTONS = 9
     ROWS = 3
     COLS = 3
     PADDING = 14
@@ -48,7 +52,8 @@ class Menu:
         self.__rect = rect
 
         self._col1_width = self.__rect.width // Menu.COLS
-        self.__col2_width = self.__rect.width - self._col1_width
+        self.__col2_width = self.__rect.width // Menu.COLS
+        self.__col3_width = self.__rect.width - self._col1_width - self.__col2_width
         self.__row_height = self.__rect.height // Menu.ROWS
 
         self.__menu_options = []
@@ -106,6 +111,25 @@ class Menu:
         no_v_solve_button = self.create_text_box(pos, dims, "Solve without visual")
         self.__menu_options.append(no_v_solve_button)
 
+        # Create distance field button
+        left = self.__rect.left + self._col1_width + self.__col2_width
+        pos = (left, self.__rect.top + 0*self.__row_height)
+        dims = (self.__col3_width, self.__row_height)
+        field_button = self.create_text_box(pos, dims, "Distance field")
+        self.__menu_options.append(field_button)
+
+        # Create reachable area button
+        pos = (left, self.__rect.top + 1*self.__row_height)
+        dims = (self.__col3_width, self.__row_height)
+        reach_button = self.create_text_box(pos, dims, "Reachable area")
+        self.__menu_options.append(reach_button)
+
+        # Create replay search button
+        pos = (left, self.__rect.top + 2*self.__row_height)
+        dims = (self.__col3_width, self.__row_height)
+        replay_button = self.create_text_box(pos, dims, "Replay search")
+        self.__menu_options.append(replay_button)
+
     def create_text_box(self, input_pos, input_dims, text):
         """ Creates a TextBox instance with appropriate padding.
 
@@ -0,0 +1,221 @@
+""" Python script that contains the MovingTargetSearch class definition.
+
+MovingTargetSearch class finds paths to a target that moves between searches, for example an
+agent chasing another agent, with Fringe-Retrieving A* (FRA*). Instead of searching from scratch
+every time the target or the agent moves, it keeps the A* search tree rooted at the start cell:
+
+    - When the target moves, every closed cell still has the cost of its cheapest path from the
+      start, so only the open cells are given new f_costs and the search continues from its
+      previous fringe. A target inside the tree is answered without any expansion.
+    - When the start moves to a cell of the tree, the subtree rooted at the new start is still
+      valid. Only the cells outside of it are deleted, and the deleted cells next to the kept
+      subtree are added back to the open list as its new fringe.
+
+The work per move is therefore proportional to how far the target and the start moved, rather
+than to the size of the whole search.
+"""
+
+import MinPriorityQueue
+
+
+class MovingTargetSearch:
+    """ A* search tree rooted at a start cell that is reused when the target or start moves.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        start: the index of the start cell, the root of the search tree
+        target: the index of the target cell
+        heuristic: function taking (index, target) that estimates the remaining path cost
+        g_costs: dict mapping cells of the tree (closed and open) to their path cost from the
+            root of the original search. Costs from start are g_costs[cell] - g_costs[start].
+        prev: dict mapping cells of the tree to the cell they were reached from
+        closed: set of the cells that have been expanded
+        opened: the MinPriorityQueue of open cells, keyed for the target it was built for
+        keyed_target: the target the keys of opened were computed for
+        stats: dict of counters recorded during the most recent call
+    """
+
+    def __init__(self, engine, start, target, heuristic=None):
+        """ Initializes an instance of the MovingTargetSearch class.
+
+        Args:
+            engine: the Engine object that describes the grid
+            start: the index of the start cell
+            target: the index of the target cell
+            heuristic: function taking (index, target) that returns a consistent estimate of
+                the path cost between the cells (defaults to Engine.get_h_cost)
+        """
+
+        self.__engine = engine
+        self.__heuristic = heuristic if heuristic is not None else engine.get_h_cost
+        self.__target = target
+        self.__stats = {}
+        self.restart(start)
+
+    def restart(self, start):
+        """ Discards the search tree and starts a new one at a start cell. """
+
+        self.__start = start
+        self.__g_costs = {start: 0}
+        self.__prev = {}
+        self.__closed = set()
+        self.__opened = MinPriorityQueue.MinPriorityQueue()
+        self.__opened.insert(self.__heuristic(start, self.__target), start)
+        self.__keyed_target = self.__target
+
+    def get_start(self):
+        """ Gets the index of the start cell. """
+
+        return self.__start
+
+    def get_target(self):
+        """ Gets the index of the target cell. """
+
+        return self.__target
+
+    def get_stats(self):
+        """ Gets the counters recorded during the most recent call. """
+
+        return self.__stats
+
+    def set_target(self, target):
+        """ Moves the target. The open list is re-keyed by the next call to find_path. """
+
+        self.__target = target
+
+    def set_start(self, start):
+        """ Moves the start and keeps the part of the search tree that is still valid.
+
+        If the new start has been expanded, the subtree rooted at it is kept, and the cells of
+        the rest of the tree are deleted. Deleted cells next to the kept closed cells form the
+        new fringe, with the cheapest path cost through a kept neighbour. Otherwise the search
+        tree is discarded.
+
+        Args:
+            start: the index of the new start cell
+        """
+
+        self.__stats = {'deleted': 0, 'kept': 0}
+        if start == self.__start:
+            return
+        if start not in self.__closed:
+            self.__stats['deleted'] = len(self.__g_costs)
+            self.restart(start)
+            return
+
+        # Cells are in the subtree of start if their chain of prev cells reaches start
+        in_subtree = {start: True}
+        for cell in self.__g_costs:
+            chain = []
+            while cell not in in_subtree:
+                chain.append(cell)
+                cell = self.__prev.get(cell)
+                if cell is None:
+                    break
+            kept = cell is not None and in_subtree[cell]
+            for link in chain:
+                in_subtree[link] = kept
+
+        deleted = [cell for cell, kept in in_subtree.items() if not kept]
+        for cell in deleted:
+            del self.__g_costs[cell]
+            self.__prev.pop(cell, None)
+            self.__closed.discard(cell)
+        self.__prev.pop(start, None)
+        self.__start = start
+
+        # The new fringe: open cells and deleted cells that have a kept closed neighbour
+        fringe = set()
+        opened = []
+        while True:
+            try:
+                opened.append(self.__opened.extract_min())
+            except IndexError:
+                break
+        for cell in opened:
+            if cell in self.__g_costs:
+                if self.__prev.get(cell) in self.__closed:
+                    fringe.add(cell)
+                else:
+                    deleted.append(cell)
+                    del self.__g_costs[cell]
+                    self.__prev.pop(cell, None)
+
+        for cell in deleted:
+            best, parent = None, None
+            for adj, cost in self.__engine.get_neighbours(cell):
+                if adj in self.__closed and (best is None or self.__g_costs[adj] + cost < best):
+                    best, parent = self.__g_costs[adj] + cost, adj
+            if parent is not None:
+                self.__g_costs[cell] = best
+                self.__prev[cell] = parent
+                fringe.add(cell)
+
+        self.__opened = MinPriorityQueue.MinPriorityQueue(
+            *((self.__g_costs[cell] + self.__heuristic(cell, self.__target), cell)
+              for cell in fringe))
+        self.__keyed_target = self.__target
+        self.__stats = {'deleted': len(deleted), 'kept': len(self.__closed)}
+
+    def find_path(self):
+        """ Finds the cheapest path from the start cell to the current target cell.
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if there is no path
+        """
+
+        target = self.__target
+        self.__stats = {'expanded': 0, 'rekeyed': 0}
+        if not self.__engine.is_walkable(target) or not self.__engine.is_walkable(self.__start):
+            return None
+
+        if target not in self.__closed and self.__keyed_target != target:
+            self.rekey()
+
+        heuristic = self.__heuristic
+        g_costs, prev, closed, opened = self.__g_costs, self.__prev, self.__closed, self.__opened
+        while target not in closed:
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                return None
+
+            closed.add(current)
+            self.__stats['expanded'] += 1
+            for adj, cost in self.__engine.get_neighbours(current):
+                if adj in closed:
+                    continue
+                g_cost = g_costs[current] + cost
+                if adj not in g_costs:
+                    g_costs[adj] = g_cost
+                    prev[adj] = current
+                    opened.insert(g_cost + heuristic(adj, target), adj)
+                elif g_cost < g_costs[adj]:
+                    g_costs[adj] = g_cost
+                    prev[adj] = current
+                    opened.decrease_key(adj, g_cost + heuristic(adj, target))
+
+        return self.__engine.build_path(prev, self.__start, target)
+
+    def rekey(self):
+        """ Rebuilds the open list with f_costs for the current target. """
+
+        cells = []
+        while True:
+            try:
+                cells.append(self.__opened.extract_min())
+            except IndexError:
+                break
+
+        self.__opened = MinPriorityQueue.MinPriorityQueue(
+            *((self.__g_costs[cell] + self.__heuristic(cell, self.__target), cell)
+              for cell in cells))
+        self.__keyed_target = self.__target
+        self.__stats['rekeyed'] = len(cells)
+
+    def get_cost(self):
+        """ Gets the cost of the path to the target, or None if it has not been found. """
+
+        if self.__target not in self.__closed:
+            return None
+        return self.__g_costs[self.__target] - self.__g_costs[self.__start]
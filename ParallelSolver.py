@@ -0,0 +1,190 @@
+""" Python script that contains the ParallelSolver class definition.
+
+ParallelSolver class spreads batches of path queries over a pool of worker processes. The
+walkability array is placed in shared memory once, and every worker attaches to it by name
+and builds its own Engine over it without copying or pickling the grid. Queries and results
+travel between processes as packed fixed-size records.
+"""
+
+from array import array
+import multiprocessing
+from multiprocessing import shared_memory, util
+import struct
+from Engine import Engine
+from Batch import BatchResult
+
+# Format of a query record (start, target) and a result record (cost, path length)
+QUERY_RECORD = struct.Struct('<II')
+RESULT_RECORD = struct.Struct('<II')
+
+# Per-process state of a worker, set up once by init_worker
+worker_state = {}
+
+
+def init_worker(name, columns, rows):
+    """ Attaches a worker process to the shared walkability array.
+
+    Workers are children of the process that created the block and share its resource
+    tracker, so only the creating process unlinks the block.
+    """
+
+    memory = shared_memory.SharedMemory(name=name)
+    view = memory.buf[:columns * rows]
+    worker_state['engine'] = Engine(view, columns, rows)
+
+    # The view must be released before the block can be closed when the worker exits
+    util.Finalize(None, release_worker, (view, memory), exitpriority=10)
+
+
+def get_worker_engine():
+    """ Gets the Engine over the shared walkability array in a worker process. """
+
+    return worker_state['engine']
+
+
+def release_worker(view, memory):
+    """ Detaches a worker process from the shared walkability array. """
+
+    worker_state.clear()
+    view.release()
+    memory.close()
+
+
+def solve_chunk(queries):
+    """ Solves a chunk of packed query records in a worker process.
+
+    Args:
+        queries: bytes of packed QUERY_RECORD (start, target) records
+
+    Returns:
+        bytes of packed RESULT_RECORD (cost, path length) records in the same order
+    """
+
+    pairs = list(QUERY_RECORD.iter_unpack(queries))
+    result = worker_state['engine'].solve_many(pairs)
+    offsets = result.get_offsets()
+
+    records = bytearray(RESULT_RECORD.size * len(pairs))
+    for i in range(len(pairs)):
+        RESULT_RECORD.pack_into(records, i * RESULT_RECORD.size,
+                                result.get_costs()[i], offsets[i + 1] - offsets[i])
+    return bytes(records)
+
+
+class ParallelSolver:
+    """ Solves batches of path queries in a pool of processes over a shared-memory grid.
+
+    A ParallelSolver should be closed once it is no longer needed, which shuts down the
+    workers and releases the shared memory. It can be used as a context manager.
+
+    Attributes:
+        columns: number of columns in the grid
+        rows: number of rows in the grid
+        memory: the SharedMemory block holding the walkability array
+        pool: the multiprocessing.Pool of worker processes
+        processes: the number of worker processes
+
+    Constants:
+        CHUNK_SIZE: the default number of queries sent to a worker at a time
+    """
+
+    CHUNK_SIZE = 256
+
+    def __init__(self, walkable, columns, rows, processes=None):
+        """ Initializes an instance of the ParallelSolver class.
+
+        Args:
+            walkable: sequence with one entry per cell in row-major order, truthy if walkable
+            columns: number of columns in the grid
+            rows: number of rows in the grid
+            processes: the number of worker processes (defaults to the number of CPUs)
+
+        Raises:
+            ValueError: walkable does not contain exactly columns * rows entries
+        """
+
+        if len(walkable) != columns * rows:
+            raise ValueError('walkable must contain exactly columns * rows entries')
+
+        self.__columns = columns
+        self.__rows = rows
+        self.__processes = processes or multiprocessing.cpu_count()
+
+        self.__memory = shared_memory.SharedMemory(create=True, size=max(1, columns * rows))
+        self.__memory.buf[:columns * rows] = bytes(1 if cell else 0 for cell in walkable)
+
+        self.__pool = multiprocessing.Pool(self.__processes, init_worker,
+                                           (self.__memory.name, columns, rows))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_processes(self):
+        """ Gets the number of worker processes. """
+
+        return self.__processes
+
+    def close(self):
+        """ Shuts down the workers and releases the shared memory. """
+
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+            self.__memory.close()
+            self.__memory.unlink()
+
+    def map_tasks(self, function, tasks):
+        """ Runs a function on every task in the worker processes.
+
+        Args:
+            function: module-level function taking one task, which can reach the Engine of
+                its worker with get_worker_engine
+            tasks: iterable of picklable tasks
+
+        Returns:
+            List of the results in the order of tasks
+        """
+
+        return self.__pool.map(function, tasks, chunksize=1)
+
+    def solve_many(self, pairs, chunk_size=None):
+        """ Solves a batch of (start, target) queries in the worker processes.
+
+        Queries are sorted by target before they are split into chunks, so queries that share
+        a target usually end up in the same chunk and share their search.
+
+        Args:
+            pairs: iterable of (start index, target index) tuples
+            chunk_size: the number of queries sent to a worker at a time
+
+        Returns:
+            (costs, lengths) arrays of the path cost and number of cells of every path, in the
+            order of pairs. Queries without a path have a cost of BatchResult.NO_PATH.
+        """
+
+        pairs = list(pairs)
+        chunk_size = chunk_size or ParallelSolver.CHUNK_SIZE
+        order = sorted(range(len(pairs)), key=lambda i: pairs[i][1])
+
+        chunks = []
+        for first in range(0, len(order), chunk_size):
+            records = bytearray()
+            for i in order[first:first + chunk_size]:
+                records += QUERY_RECORD.pack(*pairs[i])
+            chunks.append(bytes(records))
+
+        costs = array('I', [BatchResult.NO_PATH]) * len(pairs)
+        lengths = array('I', [0]) * len(pairs)
+
+        position = 0
+        for records in self.__pool.imap(solve_chunk, chunks):
+            for cost, length in RESULT_RECORD.iter_unpack(records):
+                costs[order[position]] = cost
+                lengths[order[position]] = length
+                position += 1
+
+        return costs, lengths
@@ -0,0 +1,43 @@
+""" Python script that contains functions for summarizing timings with percentiles.
+
+The visualizer overlay, the path-query server metrics and the benchmarks all report the same
+percentiles of lists of times, computed here with the nearest-rank method.
+"""
+
+# The fractions reported by default
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def get_percentile(values, fraction):
+    """ Gets the value below which the given fraction of a list of values falls.
+
+    Args:
+        values: iterable of numbers
+        fraction: the fraction of the values, between 0 and 1
+
+    Returns:
+        The value at that rank of the sorted values, or 0.0 if there are none
+    """
+
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def get_percentiles(values, fractions=PERCENTILES, scale=1):
+    """ Gets several percentiles of a list of values.
+
+    Args:
+        values: iterable of numbers
+        fractions: the fractions of the values to report
+        scale: factor applied to every percentile, for example 1000 for seconds to milliseconds
+
+    Returns:
+        dict mapping names such as 'p50' and 'p99' to the scaled percentiles, in the order of
+        fractions
+    """
+
+    ordered = sorted(values)
+    return {'p{0:g}'.format(100 * fraction): scale * get_percentile(ordered, fraction)
+            for fraction in fractions}
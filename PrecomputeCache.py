@@ -0,0 +1,307 @@
+""" Python script that contains the PrecomputeCache class definition.
+
+PrecomputeCache class keeps precomputed per-map indexes, such as landmark distance tables, in
+files on disk so that they survive process restarts. Every entry is keyed by a content hash of
+the walkability (and optional cost) layer of its map, so an entry is rebuilt only when the map
+it was built from has changed. Entries are memory-mapped when they are loaded, and the least
+recently used entries are deleted once the files take up more than a given number of bytes.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import time
+import MapIO
+
+
+class PrecomputeCache:
+    """ Directory of memory-mapped precomputed indexes with LRU eviction by size.
+
+    Every entry is one file holding a HEADER followed by a flat array of numbers. The header
+    records the content hash of the map, the version of the code that built the entry and
+    the typecode of the array, and an entry that does not match all three is stale. The
+    modification time of an entry file is its last use, and eviction removes the entries
+    with the oldest times first.
+
+    A PrecomputeCache should be closed once the arrays it returned are no longer needed. It
+    can be used as a context manager.
+
+    Attributes:
+        directory: the directory holding the entry files
+        max_bytes: the largest total size of the entry files
+        entries: dict mapping the paths of loaded entries to their (mmap, memoryview,
+            typecode, version) tuple
+        touched: dict mapping the paths of loaded entries to the time their file was last
+            marked as used
+        stats: dict with the number of hits, builds and evictions
+
+    Constants:
+        DIRECTORY: name of the directory created next to a map by PrecomputeCache.beside
+        SUFFIX: the file name extension of entry files
+        MAGIC: the first bytes of an entry file
+        VERSION: the version of the entry file format
+        HEADER: struct of the header: magic, format version, entry version, typecode,
+            content hash and number of items
+        DEFAULT_MAX_BYTES: the default largest total size of the entry files
+        TOUCH_INTERVAL: the seconds between two updates of the last use of a loaded entry
+    """
+
+    DIRECTORY = '.pathfinder-cache'
+    SUFFIX = '.pfc'
+
+    MAGIC = b'PFPC'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHc7x16sQ')
+
+    DEFAULT_MAX_BYTES = 1 << 30
+    TOUCH_INTERVAL = 1.0
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """ Initializes an instance of the PrecomputeCache class.
+
+        Args:
+            directory: the directory holding the entry files, created if it does not exist
+            max_bytes: the largest total size of the entry files
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__max_bytes = max_bytes
+        self.__entries = {}
+        self.__touched = {}
+        self.__stats = {'hits': 0, 'builds': 0, 'evictions': 0}
+
+    @classmethod
+    def beside(cls, map_path, max_bytes=DEFAULT_MAX_BYTES):
+        """ Creates a PrecomputeCache in a directory next to a map file.
+
+        Maps in the same directory share the cache and its size limit.
+        """
+
+        directory = os.path.join(os.path.dirname(os.path.abspath(map_path)), cls.DIRECTORY)
+        return cls(directory, max_bytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Unmaps all loaded entries that are no longer in use. """
+
+        for path in list(self.__entries):
+            self.release(path)
+
+    def release(self, path):
+        """ Unmaps a loaded entry, whose array must no longer be in use. """
+
+        loaded = self.__entries.pop(path, None)
+        self.__touched.pop(path, None)
+        if loaded is None:
+            return
+
+        memory, view = loaded[:2]
+        view.release()
+        try:
+            memory.close()
+        except BufferError:
+            # Slices of the view are still in use, so the mapping is released when the last
+            # of them is garbage collected
+            pass
+
+    def get_directory(self):
+        """ Gets the directory holding the entry files. """
+
+        return self.__directory
+
+    def get_stats(self):
+        """ Gets the number of hits, builds and evictions so far. """
+
+        return self.__stats
+
+    @staticmethod
+    def get_key(engine, costs=None):
+        """ Gets the content hash of the layers of a map and of the links between them.
+
+        Args:
+            engine: the Engine object that describes the grid
+            costs: optional bytes-like cost layer of the map
+
+        Returns:
+            The hash as a string of 32 hexadecimal digits
+        """
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(struct.pack('<II', engine.get_columns(), engine.get_rows()))
+        digest.update(MapIO.as_bytes(engine.get_walkable()))
+        links = engine.get_all_links()
+        if links:
+            digest.update(b'links')
+            digest.update(struct.pack('<{0}I'.format(3 * len(links)),
+                                      *(value for link in links for value in link)))
+        if costs is not None:
+            digest.update(b'costs')
+            digest.update(costs)
+        return digest.hexdigest()
+
+    def get_path(self, key, name):
+        """ Gets the path of the file of an entry. """
+
+        return os.path.join(self.__directory, '{0}.{1}{2}'.format(key, name, self.SUFFIX))
+
+    def get(self, key, name, build, typecode='I', version=1):
+        """ Gets an entry, building and storing it first if it is missing or stale.
+
+        Args:
+            key: the content hash of the map, from PrecomputeCache.get_key
+            name: the name of the index, which must be usable in a file name
+            build: function taking no arguments that returns an array.array (or other
+                bytes-like object) of the index
+            typecode: the array typecode of the items of the index
+            version: the version of the index, to be raised whenever build changes
+
+        Raises:
+            ValueError: name cannot be used in a file name
+
+        Returns:
+            A read-only memoryview of the items, cast to typecode and backed by the mmap
+        """
+
+        if not name or os.sep in name or name != os.path.basename(name):
+            raise ValueError('Invalid cache entry name: {0!r}'.format(name))
+
+        path = self.get_path(key, name)
+        loaded = self.__entries.get(path)
+        if loaded is not None and loaded[2:] == (typecode, version):
+            self.__stats['hits'] += 1
+            self.touch(path)
+            return loaded[1]
+        self.release(path)
+
+        view = self.load(path, key, typecode, version)
+        if view is not None:
+            self.__stats['hits'] += 1
+            self.touch(path)
+            return view
+
+        self.__stats['builds'] += 1
+        self.store(path, key, build(), typecode, version)
+        self.evict(keep=path)
+        return self.load(path, key, typecode, version)
+
+    def touch(self, path):
+        """ Marks an entry file as just used, at most once per TOUCH_INTERVAL. """
+
+        now = time.monotonic()
+        last = self.__touched.get(path)
+        if last is not None and now - last < self.TOUCH_INTERVAL:
+            return
+
+        self.__touched[path] = now
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Another process evicted the entry, which stays readable while it is mapped
+            pass
+
+    def load(self, path, key, typecode, version):
+        """ Maps an entry file into memory.
+
+        Returns:
+            The memoryview of the items, or None if the file is missing or stale
+        """
+
+        try:
+            with open(path, 'rb') as file:
+                memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        header = self.HEADER
+        fields = None
+        if len(memory) >= header.size:
+            fields = header.unpack_from(memory)
+        expected = (self.MAGIC, self.VERSION, version, typecode.encode(), bytes.fromhex(key))
+        if fields is None or fields[:5] != expected:
+            memory.close()
+            return None
+
+        view = memoryview(memory)[header.size:].cast('B')
+        try:
+            view = view.cast(typecode)
+        except (TypeError, ValueError):
+            view.release()
+            memory.close()
+            return None
+        if len(view) != fields[5]:
+            view.release()
+            memory.close()
+            return None
+
+        self.__entries[path] = (memory, view, typecode, version)
+        return view
+
+    def store(self, path, key, data, typecode, version):
+        """ Writes an entry file, replacing any existing file atomically. """
+
+        data = memoryview(data).cast('B')
+        items = len(data) // struct.calcsize(typecode)
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, version, typecode.encode(),
+                                  bytes.fromhex(key), items)
+
+        descriptor, temporary = tempfile.mkstemp(dir=self.__directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(header)
+                file.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def get_size(self):
+        """ Gets the total size in bytes of the entry files. """
+
+        return sum(size for _, size, _ in self.list_entries())
+
+    def list_entries(self):
+        """ Lists the entry files.
+
+        Returns:
+            List of (last use, size in bytes, path) tuples, least recently used first
+        """
+
+        entries = []
+        with os.scandir(self.__directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(self.SUFFIX) and entry.is_file():
+                    info = entry.stat()
+                    entries.append((info.st_mtime, info.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    def evict(self, keep=None):
+        """ Deletes least recently used entries until the files fit in max_bytes.
+
+        Args:
+            keep: the path of an entry that must not be deleted
+        """
+
+        entries = self.list_entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.__max_bytes:
+                break
+            if path == keep:
+                continue
+
+            # Mapped entries stay readable after their file is deleted
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.__stats['evictions'] += 1
@@ -2,6 +2,9 @@
 
 import pygame
 from Grid import Grid, Node
+from SearchTrace import SearchTrace
+from FrameProfiler import FrameProfiler
+from MemoryProfiler import MemoryProfiler
 import Menu
 
 class Program:
@@ -16,8 +19,57 @@ class Program:
     TARGET_MODE = 'TARGET'
     MODES = {OBS_MODE, START_MODE, TARGET_MODE}
 
-    def __init__(self):
-        """ Initialize an instance of the Program class. """
+    SEARCH_EXPANSIONS_PER_FRAME = 1
+
+    # Path cost budget of the reachable area shown from the start node
+    REACHABLE_BUDGET = 100
+
+    # Menu actions that only search the layer being shown, which do nothing on grids with
+    # more than one layer
+    SINGLE_LAYER_ACTIONS = ('[Solve with visual]', '[Distance field]', '[Reachable area]',
+                            '[Replay search]')
+
+    # File used by the save (Ctrl+S) and load (Ctrl+O) shortcuts
+    LAYOUT_PATH = 'layout.map'
+
+    # File used by the save trace (Ctrl+T) and replay trace (Ctrl+R) shortcuts
+    TRACE_PATH = 'search.trace'
+
+    # Number of steps of the replay skipped by the left and right arrow keys
+    REPLAY_SEEK_STEPS = 10
+
+    # Keys that show the layer below and above (adding a layer above the top one), and the key
+    # that toggles stairs between the cell under the mouse and the same cell on the layer above
+    LAYER_DOWN_KEY = pygame.K_PAGEDOWN
+    LAYER_UP_KEY = pygame.K_PAGEUP
+    LINK_KEY = pygame.K_l
+
+    # Key that picks the start and then the target of another agent under the mouse, the key
+    # that plans every agent together with windowed Cooperative A* (WHCA*), and its window
+    AGENT_KEY = pygame.K_a
+    AGENTS_SOLVE_KEY = pygame.K_w
+    AGENTS_WINDOW = 8
+
+    # Timed phases of a frame, the key that toggles the performance overlay, and the file the
+    # recorded frames are written to on exit
+    PROFILE_PHASES = ('events', 'solver', 'grid', 'menu', 'overlay', 'update', 'delay')
+    OVERLAY_KEY = pygame.K_F3
+    PROFILE_PATH = 'frame_profile.csv'
+
+    # Key that toggles memory profiling of every solve, whose most recent report is added to
+    # the performance overlay
+    MEMORY_KEY = pygame.K_F4
+
+    OVERLAY_COLOR = (0, 0, 0, 170)
+    OVERLAY_PADDING = 6
+
+    def __init__(self, columns=30, rows=20):
+        """ Initialize an instance of the Program class.
+
+        Args:
+            columns: number of columns in the grid
+            rows: number of rows in the grid
+        """
 
         self.__run = True
         self.__pause_time = 50
@@ -30,13 +82,18 @@ class Program:
         Node.set_surface(self.__window)
 
         self.__grid_rect = pygame.Rect(0, 0, 750, 500)
-        self.__grid = Grid(self.__window, self.__grid_rect, 30, 20)
+        self.__grid = Grid(self.__window, self.__grid_rect, columns, rows)
 
         self.__menu_rect = pygame.Rect(0, 500, 750, 200)
         self.__menu = Menu.Menu(self.__window, self.__menu_rect)
 
         self.__current_selection = set()
         self.__selection_mode = Program.OBS_MODE
+        self.__agent_start = None
+
+        self.__profiler = FrameProfiler(Program.PROFILE_PHASES)
+        self.__overlay_shown = False
+        self.__overlay_font = None
 
     def main(self):
         """ Executes main program loop.
@@ -44,15 +101,30 @@ class Program:
 
         pygame.init()
 
+        profiler = self.__profiler
         self.__run = True
         while self.__run:
-            pygame.time.delay(self.__pause_time)
-            self.handle_event()
+            profiler.begin_frame()
+            profiler.measure('delay', pygame.time.delay, self.__pause_time)
+            profiler.measure('events', self.handle_event)
+            if self.__grid.is_searching():
+                expansions = self.__grid.get_expansions()
+                profiler.measure('solver', self.__grid.step_search,
+                                 Program.SEARCH_EXPANSIONS_PER_FRAME)
+                profiler.add_expansions(self.__grid.get_expansions() - expansions)
+            elif self.__grid.is_replaying():
+                profiler.measure('solver', self.__grid.step_replay)
             self.draw()
-            self.update()
+            profiler.measure('update', self.update)
+        profiler.end_frame()
 
         pygame.quit()
 
+    def get_grid(self):
+        """ Gets the Grid object shown by the program. """
+
+        return self.__grid
+
     def init_window(self):
         """ Initializes the display window. """
 
@@ -61,11 +133,43 @@ class Program:
         pygame.display.set_caption(self.__window_title)
         return window
 
+    def get_profiler(self):
+        """ Gets the FrameProfiler that times the phases of every frame. """
+
+        return self.__profiler
+
     def draw(self):
         """ Draws all UI objects. """
 
-        self.__grid.draw()
-        self.__menu.draw()
+        self.__profiler.measure('grid', self.__grid.draw)
+        self.__profiler.measure('menu', self.__menu.draw)
+        if self.__overlay_shown:
+            self.__profiler.measure('overlay', self.draw_overlay)
+
+    def draw_overlay(self):
+        """ Draws the frame rate, frame-time percentiles and solver speed over the grid, and
+        the memory report of the most recent solve while memory profiling is on. """
+
+        if self.__overlay_font is None:
+            self.__overlay_font = pygame.font.SysFont("Courier", 14, True)
+
+        lines = self.__profiler.get_summary()
+        memory_profiler = self.__grid.get_memory_profiler()
+        if memory_profiler is not None:
+            lines += memory_profiler.get_summary()
+        images = [self.__overlay_font.render(line, True, pygame.Color('white'))
+                  for line in lines]
+        padding = Program.OVERLAY_PADDING
+        width = max(image.get_width() for image in images) + 2 * padding
+        height = sum(image.get_height() for image in images) + 2 * padding
+
+        background = pygame.Surface((width, height), pygame.SRCALPHA)
+        background.fill(Program.OVERLAY_COLOR)
+        self.__window.blit(background, (0, 0))
+        y = padding
+        for image in images:
+            self.__window.blit(image, (padding, y))
+            y += image.get_height()
 
     def update(self):
         """ Updates the state of pygame UI objects. """
@@ -83,8 +187,12 @@ class Program:
             # Mouse held down to select obstacle Nodes
             if pygame.mouse.get_pressed()[0]:
                 try:
-                    if self.__grid.collidepoint(event.pos) and not self.__grid.is_solved():
+                    editable = not (self.__grid.is_solved() or self.__grid.is_searching()
+                                    or self.__grid.is_replaying())
+                    if self.__grid.collidepoint(event.pos) and editable:
                         self.handle_grid_mouse_down(event.pos)
+                    elif self.__grid.collidepoint(event.pos) and self.is_chasing():
+                        self.__grid.follow_target(self.__grid.get_node(event.pos))
                     if self.__menu.collidepoint(event.pos):
                         button = self.__menu.get_selected_button(event.pos)
                         self.handle_menu_selection(button)
@@ -95,6 +203,169 @@ class Program:
             if event.type == pygame.MOUSEBUTTONUP:
                 self.__current_selection.clear()
 
+            if event.type == pygame.KEYDOWN:
+                self.handle_key_down(event)
+
+    def handle_key_down(self, event):
+        """ Handles keyboard shortcuts.
+
+        Args:
+            event: The pygame KEYDOWN event
+        """
+
+        if event.key == Program.OVERLAY_KEY:
+            self.__overlay_shown = not self.__overlay_shown
+            return
+        if event.key == Program.MEMORY_KEY:
+            self.toggle_memory_profiler()
+            return
+
+        if not event.mod & pygame.KMOD_CTRL:
+            if self.__grid.is_replaying():
+                self.handle_replay_key(event)
+            elif not self.__grid.is_searching():
+                self.handle_layer_key(event)
+                self.handle_agent_key(event)
+            return
+        if self.__grid.is_searching():
+            return
+
+        try:
+            if event.key == pygame.K_s:
+                self.__grid.save_layout(Program.LAYOUT_PATH)
+                self.show_status('saved ' + Program.LAYOUT_PATH)
+            elif event.key == pygame.K_o:
+                self.__grid.load_layout(Program.LAYOUT_PATH)
+                self.show_status('loaded ' + Program.LAYOUT_PATH)
+        except (OSError, ValueError) as error:
+            self.show_status('could not access grid layout: {0}'.format(error))
+
+        try:
+            if event.key == pygame.K_t and self.__grid.get_trace() is not None:
+                self.__grid.get_trace().save(Program.TRACE_PATH)
+                self.show_status('saved ' + Program.TRACE_PATH)
+            elif event.key == pygame.K_r:
+                trace = SearchTrace.load(Program.TRACE_PATH)
+                self.__grid.start_replay(trace).play()
+                self.show_status('replaying ' + Program.TRACE_PATH)
+        except (OSError, ValueError) as error:
+            self.show_status('could not access search trace: {0}'.format(error))
+
+    def show_status(self, message):
+        """ Shows the result of a keyboard shortcut in the window title. """
+
+        pygame.display.set_caption('{0} - {1}'.format(self.__window_title, message))
+
+    def toggle_memory_profiler(self):
+        """ Starts or stops profiling the memory of every solve of the Grid.
+
+        Starting it also shows the performance overlay, where the report of the most recent
+        solve is drawn.
+        """
+
+        if self.__grid.get_memory_profiler() is None:
+            self.__grid.set_memory_profiler(MemoryProfiler())
+            self.__overlay_shown = True
+            self.show_status('memory profiling on')
+        else:
+            self.__grid.set_memory_profiler(None)
+            self.show_status('memory profiling off')
+
+    def handle_replay_key(self, event):
+        """ Handles the replay controls.
+
+        Space plays or pauses, the left and right arrow keys seek, the up and down arrow keys
+        change the speed, Home and End jump to the start and the end, and Escape leaves
+        replay mode.
+
+        Args:
+            event: The pygame KEYDOWN event
+        """
+
+        replay = self.__grid.get_replay()
+        seek = replay.get_speed() * Program.REPLAY_SEEK_STEPS
+
+        if event.key == pygame.K_SPACE:
+            replay.toggle()
+        elif event.key == pygame.K_RIGHT:
+            replay.seek(replay.get_position() + seek)
+        elif event.key == pygame.K_LEFT:
+            replay.seek(replay.get_position() - seek)
+        elif event.key == pygame.K_UP:
+            replay.set_speed(replay.get_speed() * 2)
+        elif event.key == pygame.K_DOWN:
+            replay.set_speed(replay.get_speed() // 2)
+        elif event.key == pygame.K_HOME:
+            replay.seek(0)
+        elif event.key == pygame.K_END:
+            replay.seek(len(replay.get_trace()))
+        elif event.key == pygame.K_ESCAPE:
+            self.__grid.stop_replay()
+
+    def handle_layer_key(self, event):
+        """ Handles the keys that switch layers and place stairs between them.
+
+        Args:
+            event: The pygame KEYDOWN event
+        """
+
+        layer = self.__grid.get_current_layer()
+        if event.key == Program.LAYER_UP_KEY:
+            self.show_layer(layer + 1)
+        elif event.key == Program.LAYER_DOWN_KEY and layer > 0:
+            self.show_layer(layer - 1)
+        elif event.key == Program.LINK_KEY and not self.__grid.is_solved():
+            pos = pygame.mouse.get_pos()
+            if self.__grid.collidepoint(pos):
+                self.__grid.toggle_link(self.__grid.get_node(pos))
+
+    def handle_agent_key(self, event):
+        """ Handles the keys that add agents and plan them together with the start and target.
+
+        Args:
+            event: The pygame KEYDOWN event
+        """
+
+        if self.__grid.is_solved():
+            return
+
+        if event.key == Program.AGENT_KEY:
+            pos = pygame.mouse.get_pos()
+            if not self.__grid.collidepoint(pos):
+                return
+            node = self.__grid.get_node(pos)
+            if self.__agent_start is None:
+                self.__agent_start = node
+                self.show_status('agent start picked, press A over its target')
+            elif self.__grid.add_agent(self.__agent_start, node):
+                self.__agent_start = None
+                self.show_status('agent added')
+            else:
+                self.__agent_start = None
+                self.show_status('agents need two free cells')
+
+        elif event.key == Program.AGENTS_SOLVE_KEY:
+            try:
+                paths = self.__grid.solve_agents(Program.AGENTS_WINDOW)
+            except (AttributeError, ValueError) as error:
+                self.show_status('could not plan agents: {0}'.format(error))
+                return
+            pairs = self.__grid.get_agent_pairs()
+            arrived = sum(path[-1] == target for path, (_, target) in zip(paths, pairs))
+            self.show_status('{0} of {1} agents reached their targets'.format(
+                arrived, len(pairs)))
+
+    def show_layer(self, layer):
+        """ Shows a layer of the Grid and its number in the window title.
+
+        Args:
+            layer: the index of the layer to show, at most one above the top layer
+        """
+
+        self.__grid.switch_layer(layer)
+        pygame.display.set_caption('{0} - layer {1} of {2}'.format(
+            self.__window_title, layer + 1, self.__grid.get_layer_count()))
+
     def handle_grid_mouse_down(self, pos):
         """ Handles left mouse button down event on the Grid.
 
@@ -114,6 +385,16 @@ class Program:
             tnode = self.__grid.get_node(pos)
             self.__grid.set_target_node(tnode)
 
+    def is_chasing(self):
+        """ Returns True if dragging the target should replan the path shown on the Grid.
+
+        Once a path is shown, moving the target in target mode follows it with a moving-target
+        search instead of locking the Grid.
+        """
+
+        return (self.__selection_mode == Program.TARGET_MODE and self.__grid.is_solved()
+                and not self.__grid.is_searching() and not self.__grid.is_replaying())
+
     def handle_menu_selection(self, selected_textbox):
         """ Performs actions corresponding to menu selection.
 
@@ -121,6 +402,9 @@ class Program:
             selected_textbox: The TextBox object that was selected by the user
         """
 
+        if str(selected_textbox) != '[Replay search]':
+            self.__grid.stop_replay()
+
         if str(selected_textbox) == '[Place obstacles]':
             self.change_selection_mode(Program.OBS_MODE)
 
@@ -134,12 +418,31 @@ class Program:
             self.__grid.create_grid()
             self.__grid.set_start_node()
             self.__grid.set_target_node()
+            pygame.display.set_caption(self.__window_title)
+
+        elif (str(selected_textbox) in Program.SINGLE_LAYER_ACTIONS
+              and self.__grid.get_layer_count() > 1):
+            # Ignored, as they would only search the layer being shown
+            pass
 
         elif str(selected_textbox) == '[Solve with visual]':
-            self.__grid.solve(True)
+            self.__grid.start_search()
 
         elif str(selected_textbox) == '[Solve without visual]':
-            self.__grid.solve(False)
+            if self.__grid.get_layer_count() > 1:
+                self.__grid.solve_layers()
+            else:
+                self.__grid.solve(False)
+
+        elif str(selected_textbox) == '[Distance field]':
+            self.__grid.show_distance_field()
+
+        elif str(selected_textbox) == '[Reachable area]':
+            self.__grid.show_reachable_area(Program.REACHABLE_BUDGET)
+
+        elif str(selected_textbox) == '[Replay search]':
+            if not self.__grid.is_searching():
+                self.__grid.start_replay().play()
 
     def change_selection_mode(self, new_mode):
         """ Updates the selection mode of the program.
@@ -0,0 +1,297 @@
+""" Python script that contains Search and SearchScheduler class definitions.
+
+Search class is a resumable A* search over an Engine. Instead of running to completion in a
+single call, it is advanced in slices with step and keeps its open list and closed set between
+calls, so long searches can be spread over many frames.
+
+SearchScheduler class shares a global per-frame budget between many Search objects by giving
+each of them a slice in round-robin order.
+"""
+
+import time
+import MinPriorityQueue
+
+
+class Search:
+    """ A* search from a start cell to a target cell that can be advanced in slices.
+
+    Possible Search states :
+        RUNNING : the target has not been reached and there are cells left to expand
+        FOUND : a path to the target has been found
+        NO_PATH : every reachable cell has been expanded without reaching the target, or the
+            start or target cell is an obstacle
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        start: the index of the start cell
+        target: the index of the target cell
+        heuristic: function taking (index, target) that estimates the remaining path cost
+        on_event: function taking (event, index) called whenever a cell is opened or closed
+        opened: the MinPriorityQueue of cells that have been discovered but not expanded
+        closed: set of cells that have been expanded
+        g_costs: dict mapping cells to the cost of the cheapest known path from start
+        prev: dict mapping cells to the cell they were reached from
+        status: the current state of the search
+        stats: dict of counters recorded since the search was created
+    """
+
+    RUNNING = 'RUNNING'
+    FOUND = 'FOUND'
+    NO_PATH = 'NO_PATH'
+
+    OPENED = 'OPENED'
+    CLOSED = 'CLOSED'
+
+    def __init__(self, engine, start, target, heuristic=None, on_event=None):
+        """ Initializes an instance of the Search class.
+
+        Args:
+            engine: the Engine object that describes the grid
+            start: the index of the start cell
+            target: the index of the target cell
+            heuristic: function taking (index, target) that returns an admissible estimate of
+                the path cost between the cells (defaults to Engine.get_h_cost)
+            on_event: function taking (event, index) that is called with Search.OPENED or
+                Search.CLOSED whenever the state of a cell changes
+        """
+
+        self.__engine = engine
+        self.__start = start
+        self.__target = target
+        self.__heuristic = heuristic if heuristic is not None else engine.get_h_cost
+        self.__on_event = on_event
+
+        self.__opened = MinPriorityQueue.MinPriorityQueue()
+        self.__closed = set()
+        self.__g_costs = {start: 0}
+        self.__prev = {}
+        self.__status = Search.RUNNING
+        self.__stats = {'expanded': 0, 'opened': 1, 'steps': 0}
+
+        # Paths neither start nor end on an obstacle, as with the other engines
+        if not engine.is_walkable(start) or not engine.is_walkable(target):
+            self.__stats['opened'] = 0
+            self.__status = Search.NO_PATH
+            return
+
+        self.__opened.insert(self.__heuristic(start, target), start)
+        self.notify(Search.OPENED, start)
+
+    def notify(self, event, index):
+        """ Reports a change in the state of a cell to the on_event function, if any. """
+
+        if self.__on_event is not None:
+            self.__on_event(event, index)
+
+    def step(self, max_expansions=None, deadline=None):
+        """ Advances the search by a bounded amount of work.
+
+        The search stops when it finishes, when max_expansions cells have been expanded, or
+        when time.perf_counter() passes deadline, whichever comes first. At least one cell is
+        expanded per call. With neither limit, the search runs to completion.
+
+        Args:
+            max_expansions: the largest number of cells to expand in this call
+            deadline: the time.perf_counter() value at which to stop
+
+        Returns:
+            The status of the search after the call
+        """
+
+        if self.__status != Search.RUNNING:
+            return self.__status
+
+        self.__stats['steps'] += 1
+        expansions = 0
+        while self.__status == Search.RUNNING:
+            if max_expansions is not None and expansions >= max_expansions:
+                break
+            if deadline is not None and expansions > 0 and time.perf_counter() >= deadline:
+                break
+            self.expand()
+            expansions += 1
+
+        return self.__status
+
+    def expand(self):
+        """ Expands the open cell with the smallest f_cost. """
+
+        # Select cell with smallest f_cost from opened
+        try:
+            current = self.__opened.extract_min()
+        except IndexError:
+            self.__status = Search.NO_PATH
+            return
+
+        # If found target, the search is complete
+        if current == self.__target:
+            self.__status = Search.FOUND
+            return
+
+        self.__closed.add(current)
+        self.__stats['expanded'] += 1
+        self.notify(Search.CLOSED, current)
+
+        for adj, cost in self.__engine.get_neighbours(current):
+            if adj in self.__closed:
+                continue
+            g_cost = self.__g_costs[current] + cost
+            if adj not in self.__g_costs or g_cost < self.__g_costs[adj]:
+                self.__g_costs[adj] = g_cost
+                self.__prev[adj] = current
+                f_cost = g_cost + self.__heuristic(adj, self.__target)
+                if self.__opened.element_exists(adj):
+                    self.__opened.decrease_key(adj, f_cost)
+                else:
+                    self.__opened.insert(f_cost, adj)
+                    self.__stats['opened'] += 1
+                    self.notify(Search.OPENED, adj)
+
+    def run(self):
+        """ Runs the search to completion.
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if there is no path
+        """
+
+        self.step()
+        return self.get_path()
+
+    def get_status(self):
+        """ Gets the current state of the search. """
+
+        return self.__status
+
+    def is_finished(self):
+        """ Returns True if the search has found a path or proven that there is none. """
+
+        return self.__status != Search.RUNNING
+
+    def get_stats(self):
+        """ Gets the counters recorded since the search was created. """
+
+        return self.__stats
+
+    def get_start(self):
+        """ Gets the index of the start cell. """
+
+        return self.__start
+
+    def get_target(self):
+        """ Gets the index of the target cell. """
+
+        return self.__target
+
+    def get_path(self):
+        """ Gets the path found by the search.
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if the search has
+            not found a path
+        """
+
+        if self.__status != Search.FOUND:
+            return None
+        return self.__engine.build_path(self.__prev, self.__start, self.__target)
+
+    def get_cost(self):
+        """ Gets the cost of the path found by the search, or None if there is none. """
+
+        if self.__status != Search.FOUND:
+            return None
+        return self.__g_costs[self.__target]
+
+    def get_structures(self):
+        """ Gets the search structures by name, for example to measure them with a
+        MemoryProfiler. """
+
+        return {'opened': self.__opened, 'closed': self.__closed, 'g_costs': self.__g_costs,
+                'prev': self.__prev}
+
+
+class SearchScheduler:
+    """ Round-robin scheduler that advances many searches under a per-frame budget.
+
+    Every frame, the budget is split into equal slices that are handed to the active searches
+    in turn. Searches that finish are removed, and their unused share of the budget goes to the
+    remaining searches in the same frame.
+
+    Attributes:
+        max_expansions: the largest number of cells to expand per frame over all searches
+        max_seconds: the longest time to spend per frame over all searches
+        searches: list of the Search objects that have not finished
+        next: index in searches of the search that receives the next slice
+
+    Constants:
+        TIME_SLICE: number of expansions per slice when only a time budget is given
+    """
+
+    TIME_SLICE = 32
+
+    def __init__(self, max_expansions=None, max_seconds=None):
+        """ Initializes an instance of the SearchScheduler class.
+
+        Args:
+            max_expansions: the largest number of cells to expand per frame
+            max_seconds: the longest time to spend per frame
+
+        Raises:
+            ValueError: neither an expansion budget nor a time budget is given
+        """
+
+        if max_expansions is None and max_seconds is None:
+            raise ValueError('A per-frame budget of expansions or seconds is required')
+
+        self.__max_expansions = max_expansions
+        self.__max_seconds = max_seconds
+        self.__searches = []
+        self.__next = 0
+
+    def add(self, search):
+        """ Adds a search to be advanced in the following frames. """
+
+        self.__searches.append(search)
+
+    def __len__(self):
+        """ Returns the number of searches that have not finished. """
+
+        return len(self.__searches)
+
+    def run_frame(self):
+        """ Advances the active searches for one frame.
+
+        Returns:
+            List of the Search objects that finished during this frame
+        """
+
+        finished = []
+        deadline = None
+        if self.__max_seconds is not None:
+            deadline = time.perf_counter() + self.__max_seconds
+        remaining = self.__max_expansions
+
+        while self.__searches:
+            if remaining is not None and remaining <= 0:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+            # Split what is left of the budget evenly between the active searches
+            quantum = SearchScheduler.TIME_SLICE
+            if remaining is not None:
+                quantum = max(1, remaining // len(self.__searches))
+
+            self.__next %= len(self.__searches)
+            search = self.__searches[self.__next]
+            expanded = search.get_stats()['expanded']
+            search.step(quantum, deadline)
+            if remaining is not None:
+                remaining -= max(1, search.get_stats()['expanded'] - expanded)
+
+            if search.is_finished():
+                finished.append(search)
+                del self.__searches[self.__next]
+            else:
+                self.__next += 1
+
+        return finished
@@ -0,0 +1,374 @@
+""" Python script that contains SearchTrace and TracePlayer class definitions.
+
+SearchTrace class records a search as a compact list of (event, cell index) entries: one entry
+whenever a cell is opened or closed, followed by the cells of the path that was found. A trace
+is captured through the on_event hook of a Search, so recording costs two appends per event,
+and it can be written to disk together with the walkability of its grid to be reviewed later.
+
+TracePlayer class replays a trace by applying the state changes of its entries, forwards or
+backwards, at any speed and from any position, without running the search again.
+"""
+
+from array import array
+import struct
+import sys
+import MapIO
+from Search import Search
+
+
+class SearchTrace:
+    """ Compact record of the cells opened, closed and found to be on the path by a search.
+
+    Entry i is (events[i], cells[i]). The entries of the search come first, in the order the
+    search reported them, followed by one PATH entry for every cell of the path from start to
+    target, or a single NO_PATH entry for the target if there is no path.
+
+    Attributes:
+        columns: number of columns in the grid
+        rows: number of rows in the grid
+        start: the index of the start cell
+        target: the index of the target cell
+        walkable: bytes holding 1 for every walkable cell and 0 for every obstacle
+        events: bytearray of the event of every entry
+        cells: array('I') of the cell index of every entry
+
+    Constants:
+        OPENED: event of a cell that was discovered
+        CLOSED: event of a cell that was expanded
+        PATH: event of a cell on the path that was found
+        NO_PATH: event of the target when there is no path
+        CODES: dict mapping the events reported by Search to trace events
+        MAGIC: the first bytes of a saved trace file
+        VERSION: the version of the trace file format
+        HEADER: struct of the header: magic, version, columns, rows, start, target and the
+            number of entries
+    """
+
+    OPENED = 0
+    CLOSED = 1
+    PATH = 2
+    NO_PATH = 3
+
+    CODES = {Search.OPENED: OPENED, Search.CLOSED: CLOSED}
+
+    MAGIC = b'PFTR'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHxxIIIII')
+
+    def __init__(self, columns, rows, start, target, walkable, events=None, cells=None):
+        """ Initializes an instance of the SearchTrace class.
+
+        Args:
+            columns: number of columns in the grid
+            rows: number of rows in the grid
+            start: the index of the start cell
+            target: the index of the target cell
+            walkable: bytes holding 1 for every walkable cell and 0 for every obstacle
+            events: optional bytearray of the events of recorded entries
+            cells: optional array('I') of the cells of recorded entries
+        """
+
+        self.__columns = columns
+        self.__rows = rows
+        self.__start = start
+        self.__target = target
+        self.__walkable = walkable
+        self.__events = events if events is not None else bytearray()
+        self.__cells = cells if cells is not None else array('I')
+
+    @staticmethod
+    def capture(engine, start, target, heuristic=None, walkable=None):
+        """ Runs an A* search and records a trace of it.
+
+        Args:
+            engine: the Engine object that describes the grid
+            start: the index of the start cell
+            target: the index of the target cell
+            heuristic: function taking (index, target) that returns an admissible estimate of
+                the path cost between the cells (defaults to Engine.get_h_cost)
+            walkable: the walkability of the grid as returned by MapIO.as_bytes, to share one
+                copy between the traces of many searches on the same grid
+
+        Returns:
+            The SearchTrace object
+        """
+
+        if walkable is None:
+            walkable = MapIO.as_bytes(engine.get_walkable())
+        trace = SearchTrace(engine.get_columns(), engine.get_rows(), start, target, walkable)
+        search = Search(engine, start, target, heuristic, on_event=trace.record)
+        trace.finish(search.run())
+        return trace
+
+    def record(self, event, index):
+        """ Appends an entry. Can be used as the on_event function of a Search.
+
+        Args:
+            event: one of the trace events, or Search.OPENED or Search.CLOSED
+            index: the index of the cell
+        """
+
+        self.__events.append(SearchTrace.CODES.get(event, event))
+        self.__cells.append(index)
+
+    def finish(self, path):
+        """ Appends the result of the search.
+
+        Args:
+            path: list of cell indices from start to target, or None if there is no path
+        """
+
+        if path is None:
+            self.record(SearchTrace.NO_PATH, self.__target)
+        else:
+            for index in path:
+                self.record(SearchTrace.PATH, index)
+
+    def __len__(self):
+        """ Returns the number of entries. """
+
+        return len(self.__cells)
+
+    def get_entry(self, i):
+        """ Gets the (event, cell index) of entry i. """
+
+        return self.__events[i], self.__cells[i]
+
+    def get_events(self):
+        """ Gets the bytearray of the event of every entry. """
+
+        return self.__events
+
+    def get_cells(self):
+        """ Gets the array of the cell index of every entry. """
+
+        return self.__cells
+
+    def get_columns(self):
+        """ Gets the number of columns in the grid. """
+
+        return self.__columns
+
+    def get_rows(self):
+        """ Gets the number of rows in the grid. """
+
+        return self.__rows
+
+    def get_start(self):
+        """ Gets the index of the start cell. """
+
+        return self.__start
+
+    def get_target(self):
+        """ Gets the index of the target cell. """
+
+        return self.__target
+
+    def get_walkable(self):
+        """ Gets the walkability of the grid the trace was recorded on. """
+
+        return self.__walkable
+
+    def get_path(self):
+        """ Gets the path recorded at the end of the trace.
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if there is no path
+            or the trace is not finished
+        """
+
+        path = []
+        for i in range(len(self) - 1, -1, -1):
+            if self.__events[i] != SearchTrace.PATH:
+                break
+            path.append(self.__cells[i])
+        path.reverse()
+        return path or None
+
+    def save(self, path):
+        """ Writes the trace and the walkability of its grid to a file.
+
+        Args:
+            path: the path of the file to write
+        """
+
+        header = SearchTrace.HEADER.pack(SearchTrace.MAGIC, SearchTrace.VERSION, self.__columns,
+                                         self.__rows, self.__start, self.__target, len(self))
+        cells = self.__cells
+        if sys.byteorder == 'big':
+            cells = array('I', cells)
+            cells.byteswap()
+
+        with open(path, 'wb') as file:
+            file.write(header)
+            file.write(self.__walkable)
+            file.write(self.__events)
+            file.write(cells)
+
+    @staticmethod
+    def load(path):
+        """ Reads a trace from a file.
+
+        Args:
+            path: the path of the file written by SearchTrace.save
+
+        Raises:
+            ValueError: the file is not a trace file or is truncated
+
+        Returns:
+            The SearchTrace object
+        """
+
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        header = SearchTrace.HEADER
+        if len(data) < header.size:
+            raise ValueError('File is not a search trace')
+        magic, version, columns, rows, start, target, count = header.unpack_from(data)
+        if magic != SearchTrace.MAGIC or version != SearchTrace.VERSION:
+            raise ValueError('File is not a search trace')
+
+        size = columns * rows
+        if len(data) != header.size + size + 5 * count:
+            raise ValueError('Search trace file is truncated')
+
+        offset = header.size
+        walkable = data[offset:offset + size]
+        events = bytearray(data[offset + size:offset + size + count])
+        cells = array('I', data[offset + size + count:])
+        if sys.byteorder == 'big':
+            cells.byteswap()
+
+        return SearchTrace(columns, rows, start, target, walkable, events, cells)
+
+
+class TracePlayer:
+    """ Replays a SearchTrace forwards and backwards by applying state changes.
+
+    Applying entry i sets its cell to the state of the entry. Undoing it sets the cell back to
+    the state of the previous entry of the same cell, or to no state if there is none, so
+    seeking costs one change per entry between the old and the new position.
+
+    Attributes:
+        trace: the SearchTrace object being replayed
+        on_change: function taking (index, event) called for every change of a cell, where
+            event is a SearchTrace event or None for a cell the search has not reached
+        previous: array('I') holding, for every entry, the previous entry of the same cell,
+            or NO_ENTRY
+        position: the number of entries applied
+        speed: the number of entries applied per call to step while playing
+        playing: bool that is True while the replay is running
+
+    Constants:
+        NO_ENTRY: previous entry of the first entry of every cell
+        MAX_SPEED: the largest number of entries applied per step
+    """
+
+    NO_ENTRY = 0xFFFFFFFF
+    MAX_SPEED = 1 << 16
+
+    def __init__(self, trace, on_change, speed=1):
+        """ Initializes an instance of the TracePlayer class at the start of the trace.
+
+        Args:
+            trace: the SearchTrace object to replay
+            on_change: function taking (index, event) that applies the state of a cell
+            speed: the number of entries applied per call to step while playing
+        """
+
+        self.__trace = trace
+        self.__on_change = on_change
+        self.__position = 0
+        self.__speed = 1
+        self.__playing = False
+        self.set_speed(speed)
+
+        self.__previous = array('I', [TracePlayer.NO_ENTRY]) * len(trace)
+        last = {}
+        for i, index in enumerate(trace.get_cells()):
+            if index in last:
+                self.__previous[i] = last[index]
+            last[index] = i
+
+    def get_trace(self):
+        """ Gets the SearchTrace object being replayed. """
+
+        return self.__trace
+
+    def get_position(self):
+        """ Gets the number of entries applied. """
+
+        return self.__position
+
+    def get_speed(self):
+        """ Gets the number of entries applied per step while playing. """
+
+        return self.__speed
+
+    def set_speed(self, speed):
+        """ Sets the number of entries applied per step, between 1 and MAX_SPEED. """
+
+        self.__speed = max(1, min(TracePlayer.MAX_SPEED, int(speed)))
+
+    def is_playing(self):
+        """ Returns True while the replay is running. """
+
+        return self.__playing
+
+    def is_finished(self):
+        """ Returns True if every entry has been applied. """
+
+        return self.__position == len(self.__trace)
+
+    def play(self):
+        """ Starts the replay, from the start of the trace if it had finished. """
+
+        if self.is_finished():
+            self.seek(0)
+        self.__playing = True
+
+    def pause(self):
+        """ Stops the replay at the current position. """
+
+        self.__playing = False
+
+    def toggle(self):
+        """ Pauses the replay if it is running and plays it otherwise. """
+
+        if self.__playing:
+            self.pause()
+        else:
+            self.play()
+
+    def step(self):
+        """ Applies the next speed entries if the replay is running.
+
+        Returns:
+            True if the replay is running after the call, False otherwise
+        """
+
+        if self.__playing:
+            self.seek(self.__position + self.__speed)
+            if self.is_finished():
+                self.__playing = False
+        return self.__playing
+
+    def seek(self, position):
+        """ Moves the replay to a position by applying or undoing entries.
+
+        Args:
+            position: the number of entries to have applied, clamped to the trace
+        """
+
+        position = max(0, min(len(self.__trace), position))
+        events, cells = self.__trace.get_events(), self.__trace.get_cells()
+
+        for i in range(self.__position, position):
+            self.__on_change(cells[i], events[i])
+        for i in range(self.__position - 1, position - 1, -1):
+            previous = self.__previous[i]
+            self.__on_change(cells[i], None if previous == TracePlayer.NO_ENTRY
+                             else events[previous])
+
+        self.__position = position
@@ -0,0 +1,516 @@
+""" Python script that contains the PathServer class definition.
+
+PathServer class answers path queries from other processes on the same host over a Unix socket
+or a localhost TCP port, so that they neither import pygame nor build grids of their own. Maps
+are read once and kept in memory, and the queries of all connections are collected into batches
+that are solved in worker threads (and the worker processes of a ParallelSolver per map), so the
+event loop only parses requests and writes responses. Identical queries that are in flight at the
+same time are solved once and the result is sent to every request that asked for it.
+
+Requests are either JSON Lines or binary frames, and both can be mixed on one connection:
+
+    {"id": 1, "map": "arena", "queries": [[start row, start col, target row, target col]]}
+    {"id": 2, "op": "metrics"}
+    {"id": 3, "op": "maps"}
+
+A binary frame is a REQUEST_HEADER, the UTF-8 name of the map and one QUERY_RECORD (start
+index, target index) per query, and is answered by a RESPONSE_HEADER followed by one
+RESULT_RECORD (cost, path length) per query. Responses carry the id of their request and are
+sent as soon as they are ready, so they may arrive in a different order than the requests.
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import struct
+import time
+import MapIO
+from Percentiles import get_percentiles
+from ParallelSolver import ParallelSolver, QUERY_RECORD, RESULT_RECORD
+
+
+class PathServer:
+    """ Asyncio server that solves batched path queries on maps held in memory.
+
+    Attributes:
+        maps: dict mapping map names to their Engine objects
+        processes: the number of worker processes per map, or 1 to solve in a thread
+        solvers: dict mapping map names to their ParallelSolver, if worker processes are used
+        executors: dict mapping map names to the thread pool that runs their batches
+        pending: dict mapping map names to a dict of the (start, target) queries waiting to be
+            dispatched and their futures
+        in_flight: dict mapping (map name, start, target) to the future of every query that
+            has not been answered, used to coalesce identical queries
+        tasks: set of the running request and batch tasks
+        connections: dict mapping the StreamWriter of every open connection to the task
+            reading its requests
+        latencies: the times in seconds between reading and answering the most recent requests
+        solve_times: the times in seconds taken to solve the most recent batches
+        stats: dict of counters since the server was created
+        server: the asyncio.Server object, or None if the server is not listening
+
+    Constants:
+        REQUEST_MAGIC: the first bytes of a binary request
+        RESPONSE_MAGIC: the first bytes of a binary response
+        REQUEST_HEADER: struct of a binary request: magic, id, length of the map name and
+            number of queries
+        RESPONSE_HEADER: struct of a binary response: magic, id, status, and the number of
+            results or the length of the error message that follows
+        OK: status of a binary response holding results
+        ERROR: status of a binary response holding an error message
+        BATCH_SIZE: the largest number of queries solved in one batch
+        MAX_QUERIES: the largest number of queries of a request
+        STREAM_LIMIT: the longest JSON request line in bytes
+        LATENCY_WINDOW: the number of requests and batches the latency metrics are taken over
+    """
+
+    REQUEST_MAGIC = b'PFQB'
+    RESPONSE_MAGIC = b'PFRB'
+    REQUEST_HEADER = struct.Struct('<4sIH2xI')
+    RESPONSE_HEADER = struct.Struct('<4sIB3xI')
+
+    OK = 0
+    ERROR = 1
+
+    BATCH_SIZE = 4096
+    MAX_QUERIES = 1 << 20
+    STREAM_LIMIT = 1 << 24
+    LATENCY_WINDOW = 4096
+
+    def __init__(self, maps, processes=1):
+        """ Initializes an instance of the PathServer class.
+
+        Args:
+            maps: dict mapping map names to their Engine objects
+            processes: the number of worker processes per map, or 1 to solve every map in a
+                thread of the server process
+        """
+
+        self.__maps = dict(maps)
+        self.__processes = processes
+        self.__solvers = {}
+        self.__executors = {}
+        self.__pending = {}
+        self.__in_flight = {}
+        self.__tasks = set()
+        self.__connections = {}
+        self.__latencies = collections.deque(maxlen=PathServer.LATENCY_WINDOW)
+        self.__solve_times = collections.deque(maxlen=PathServer.LATENCY_WINDOW)
+        self.__stats = {'connections': 0, 'requests': 0, 'queries': 0, 'coalesced': 0,
+                        'batches': 0, 'errors': 0}
+        self.__server = None
+
+    @staticmethod
+    def read_maps(paths):
+        """ Reads MovingAI .map files, naming every map after its file without the extension.
+
+        Raises:
+            OSError: a file cannot be read
+            ValueError: a file is not a valid .map file, or two files have the same name
+
+        Returns:
+            dict mapping map names to their Engine objects
+        """
+
+        maps = {}
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name in maps:
+                raise ValueError('Two maps are named {0!r}'.format(name))
+            maps[name] = MapIO.read_map(path)
+        return maps
+
+    def get_maps(self):
+        """ Gets the dict mapping map names to their Engine objects. """
+
+        return self.__maps
+
+    def get_stats(self):
+        """ Gets the counters since the server was created. """
+
+        return self.__stats
+
+    # ---------------------------------------------
+    # Methods related to listening for connections
+    # ---------------------------------------------
+
+    async def start(self, path=None, host='127.0.0.1', port=0):
+        """ Starts the worker pools and listens for connections.
+
+        Args:
+            path: the path of the Unix socket to listen on, or None to listen on TCP
+            host: the address to listen on for TCP connections
+            port: the TCP port to listen on, or 0 for any free port
+
+        Returns:
+            The path of the Unix socket, or the (host, port) listened on
+        """
+
+        for name, engine in self.__maps.items():
+            if self.__processes > 1:
+                self.__solvers[name] = ParallelSolver(engine.get_walkable(),
+                                                      engine.get_columns(), engine.get_rows(),
+                                                      self.__processes)
+            # Engine.solve_many reuses its buffers, so a map without worker processes gets a
+            # single thread
+            self.__executors[name] = concurrent.futures.ThreadPoolExecutor(
+                max(1, self.__processes), thread_name_prefix='pathfinder-' + name)
+
+        if path is not None:
+            self.__server = await asyncio.start_unix_server(
+                self.handle_connection, path, limit=PathServer.STREAM_LIMIT)
+            return path
+
+        self.__server = await asyncio.start_server(
+            self.handle_connection, host, port, limit=PathServer.STREAM_LIMIT)
+        return self.__server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """ Answers connections until the task is cancelled, then closes the server. """
+
+        try:
+            await self.__server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """ Stops listening, closes all connections and shuts down the worker pools. """
+
+        if self.__server is not None:
+            self.__server.close()
+            handlers = list(self.__connections.values())
+            for writer in list(self.__connections):
+                writer.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self.__server.wait_closed()
+            self.__server = None
+
+        for task in list(self.__tasks):
+            task.cancel()
+        for executor in self.__executors.values():
+            executor.shutdown(cancel_futures=True)
+        self.__executors.clear()
+        for solver in self.__solvers.values():
+            solver.close()
+        self.__solvers.clear()
+
+    async def handle_connection(self, reader, writer):
+        """ Reads the requests of a connection and answers each of them in its own task. """
+
+        self.__stats['connections'] += 1
+        self.__connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    first = await reader.readexactly(1)
+                    if first == PathServer.REQUEST_MAGIC[:1]:
+                        header = first + await reader.readexactly(
+                            PathServer.REQUEST_HEADER.size - 1)
+                        magic, request_id, name_length, count = \
+                            PathServer.REQUEST_HEADER.unpack(header)
+                        if magic != PathServer.REQUEST_MAGIC or count > PathServer.MAX_QUERIES:
+                            break
+                        name = await reader.readexactly(name_length)
+                        records = await reader.readexactly(count * QUERY_RECORD.size)
+                        request = self.answer_binary(request_id, name, records)
+                    else:
+                        line = first + await reader.readline()
+                        request = self.answer_json(line)
+                except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                    break
+
+                task = asyncio.create_task(self.respond(request, writer))
+                self.__tasks.add(task)
+                task.add_done_callback(self.__tasks.discard)
+        finally:
+            self.__connections.pop(writer, None)
+            writer.close()
+
+    async def respond(self, request, writer):
+        """ Waits for the answer to a request and writes it to its connection. """
+
+        begin = time.perf_counter()
+        data = await request
+        if writer.is_closing():
+            return
+        writer.write(data)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            return
+        self.__latencies.append(time.perf_counter() - begin)
+
+    # ---------------------------------------------
+    # Methods related to parsing requests
+    # ---------------------------------------------
+
+    async def answer_json(self, line):
+        """ Answers a JSON request line.
+
+        Returns:
+            The bytes of the JSON response line
+        """
+
+        self.__stats['requests'] += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('Request must be a JSON object')
+            request_id = request.get('id')
+            op = request.get('op', 'solve')
+
+            if op == 'metrics':
+                response = {'metrics': self.get_metrics()}
+            elif op == 'maps':
+                response = {'maps': {name: [engine.get_columns(), engine.get_rows()]
+                                     for name, engine in self.__maps.items()}}
+            elif op == 'solve':
+                engine = self.get_engine(request.get('map'))
+                pairs = []
+                for query in request.get('queries', ()):
+                    start_row, start_col, target_row, target_col = query
+                    pairs.append((self.get_cell(engine, start_row, start_col),
+                                  self.get_cell(engine, target_row, target_col)))
+                costs, lengths = await self.solve(request['map'], pairs)
+                response = {'costs': [None if length == 0 else cost
+                                      for cost, length in zip(costs, lengths)],
+                            'lengths': list(lengths)}
+            else:
+                raise ValueError('Unknown op {0!r}'.format(op))
+        except (TypeError, ValueError) as error:
+            self.__stats['errors'] += 1
+            response = {'error': str(error)}
+        except Exception as error:
+            # A failed solve, such as a broken worker pool, must still be answered
+            self.__stats['errors'] += 1
+            response = {'error': PathServer.get_failure(error)}
+
+        response['id'] = request_id
+        return json.dumps(response).encode() + b'\n'
+
+    async def answer_binary(self, request_id, name, records):
+        """ Answers a binary request.
+
+        Args:
+            request_id: the id of the request
+            name: the UTF-8 bytes of the name of the map
+            records: bytes of packed QUERY_RECORD (start, target) records
+
+        Returns:
+            The bytes of the binary response
+        """
+
+        self.__stats['requests'] += 1
+        try:
+            engine = self.get_engine(name.decode())
+            size = engine.get_columns() * engine.get_rows()
+            pairs = list(QUERY_RECORD.iter_unpack(records))
+            for start, target in pairs:
+                if start >= size or target >= size:
+                    raise ValueError('Query ({0}, {1}) is outside of the map'.format(
+                        start, target))
+            costs, lengths = await self.solve(name.decode(), pairs)
+        except (UnicodeDecodeError, ValueError) as error:
+            message = str(error)
+        except Exception as error:
+            # A failed solve, such as a broken worker pool, must still be answered
+            message = PathServer.get_failure(error)
+        else:
+            data = bytearray(PathServer.RESPONSE_HEADER.pack(
+                PathServer.RESPONSE_MAGIC, request_id, PathServer.OK, len(pairs)))
+            for cost, length in zip(costs, lengths):
+                data += RESULT_RECORD.pack(cost, length)
+            return bytes(data)
+
+        self.__stats['errors'] += 1
+        message = message.encode()
+        return PathServer.RESPONSE_HEADER.pack(PathServer.RESPONSE_MAGIC, request_id,
+                                               PathServer.ERROR, len(message)) + message
+
+    @staticmethod
+    def get_failure(error):
+        """ Gets the error message of a request whose solve failed unexpectedly. """
+
+        return 'Solve failed: {0}: {1}'.format(type(error).__name__, error)
+
+    def get_engine(self, name):
+        """ Gets the Engine of a map, raising ValueError if there is no map with that name. """
+
+        engine = self.__maps.get(name) if isinstance(name, str) else None
+        if engine is None:
+            raise ValueError('Unknown map {0!r}'.format(name))
+        return engine
+
+    @staticmethod
+    def get_cell(engine, row, col):
+        """ Gets the index of a cell, raising ValueError if it is outside of the map. """
+
+        if not (isinstance(row, int) and isinstance(col, int)
+                and 0 <= row < engine.get_rows() and 0 <= col < engine.get_columns()):
+            raise ValueError('Cell ({0}, {1}) is outside of the map'.format(row, col))
+        return engine.get_index(row, col)
+
+    # ---------------------------------------------
+    # Methods related to coalescing and dispatching
+    # ---------------------------------------------
+
+    async def solve(self, name, pairs):
+        """ Solves (start, target) queries on a map together with the queries of other requests.
+
+        Every query that is not already in flight is added to the pending batch of its map,
+        which is dispatched once the event loop has read the requests that are ready or the
+        batch is full.
+
+        Raises:
+            ValueError: there are more than MAX_QUERIES queries
+
+        Returns:
+            (costs, lengths) lists of the path cost and number of cells of every path, in the
+            order of pairs. Queries without a path have a cost of BatchResult.NO_PATH.
+        """
+
+        if len(pairs) > PathServer.MAX_QUERIES:
+            raise ValueError('A request holds at most {0} queries'.format(
+                PathServer.MAX_QUERIES))
+        self.__stats['queries'] += len(pairs)
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for start, target in pairs:
+            key = (name, start, target)
+            future = self.__in_flight.get(key)
+            if future is not None:
+                self.__stats['coalesced'] += 1
+            else:
+                future = loop.create_future()
+                self.__in_flight[key] = future
+                pending = self.__pending.setdefault(name, {})
+                pending[(start, target)] = future
+                if len(pending) == 1:
+                    loop.call_soon(self.flush, name)
+                elif len(pending) >= PathServer.BATCH_SIZE:
+                    self.flush(name)
+            futures.append(future)
+
+        # A shared future must not be cancelled with the request that is waiting for it
+        if futures:
+            await asyncio.wait(set(futures))
+        results = [future.result() for future in futures]
+        return [cost for cost, _ in results], [length for _, length in results]
+
+    def flush(self, name):
+        """ Dispatches the pending batch of a map to its worker pool. """
+
+        batch = self.__pending.pop(name, None)
+        if batch:
+            task = asyncio.get_running_loop().create_task(self.dispatch(name, batch))
+            self.__tasks.add(task)
+            task.add_done_callback(self.__tasks.discard)
+
+    async def dispatch(self, name, batch):
+        """ Solves a batch of queries in a worker thread and resolves their futures.
+
+        Args:
+            name: the name of the map
+            batch: dict mapping (start, target) queries to their futures
+        """
+
+        self.__stats['batches'] += 1
+        pairs = list(batch)
+        loop = asyncio.get_running_loop()
+        begin = time.perf_counter()
+        try:
+            costs, lengths = await loop.run_in_executor(self.__executors[name],
+                                                        self.solve_pairs, name, pairs)
+        except Exception as error:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            self.__solve_times.append(time.perf_counter() - begin)
+            for pair, cost, length in zip(pairs, costs, lengths):
+                if not batch[pair].done():
+                    batch[pair].set_result((cost, length))
+        finally:
+            for start, target in pairs:
+                self.__in_flight.pop((name, start, target), None)
+
+    def solve_pairs(self, name, pairs):
+        """ Solves a batch of queries on a map. Runs in a worker thread.
+
+        Returns:
+            (costs, lengths) arrays of the path cost and number of cells of every path
+        """
+
+        solver = self.__solvers.get(name)
+        if solver is not None:
+            return solver.solve_many(pairs)
+
+        result = self.__maps[name].solve_many(pairs)
+        offsets = result.get_offsets()
+        return result.get_costs(), [offsets[i + 1] - offsets[i] for i in range(len(pairs))]
+
+    # ---------------------------------------------
+    # Methods related to metrics
+    # ---------------------------------------------
+
+    def get_metrics(self):
+        """ Gets the counters, queue depth and latency percentiles of the server.
+
+        Returns:
+            dict with the counters of get_stats, the number of open connections, the number of
+            queries waiting to be dispatched (pending) and being solved (in_flight), their sum
+            (queue_depth), and the percentiles in milliseconds of the latency of the most
+            recent requests (latency_ms) and the solve time of the most recent batches
+            (solve_ms)
+        """
+
+        pending = sum(len(batch) for batch in self.__pending.values())
+        metrics = dict(self.__stats)
+        metrics.update({
+            'open_connections': len(self.__connections),
+            'pending': pending,
+            'in_flight': len(self.__in_flight) - pending,
+            'queue_depth': len(self.__in_flight),
+            'latency_ms': self.get_latencies(self.__latencies),
+            'solve_ms': self.get_latencies(self.__solve_times)
+            })
+        return metrics
+
+    @staticmethod
+    def get_latencies(times):
+        """ Gets the Percentiles.PERCENTILES of a list of times in seconds, in milliseconds. """
+
+        return {name: round(value, 3)
+                for name, value in get_percentiles(times, scale=1000).items()}
+
+
+def serve(maps, path=None, host='127.0.0.1', port=0, processes=1, on_ready=None):
+    """ Runs a PathServer until it is interrupted.
+
+    Args:
+        maps: dict mapping map names to their Engine objects
+        path: the path of the Unix socket to listen on, or None to listen on TCP
+        host: the address to listen on for TCP connections
+        port: the TCP port to listen on, or 0 for any free port
+        processes: the number of worker processes per map
+        on_ready: function taking the address listened on, called once the server is ready
+    """
+
+    async def run():
+        server = PathServer(maps, processes)
+        address = await server.start(path, host, port)
+        if on_ready is not None:
+            on_ready(address)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if path is not None and os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,425 @@
+""" Python script that contains the SubgoalGraph class definition.
+
+SubgoalGraph class answers repeated path queries on a static grid with a simple subgoal graph.
+Cheapest paths only need to turn next to the corners of obstacles, so those cells are chosen as
+subgoals and every pair of subgoals that can reach each other with an octile path (they are
+h-reachable) and without passing another subgoal is joined by an edge costing their octile
+distance. A query connects the start and target cells to the subgoals they directly reach and
+runs A* on this much smaller graph. The cells between consecutive subgoals of the result are
+only generated when they are needed.
+"""
+
+from array import array
+import time
+import MinPriorityQueue
+from Engine import Engine
+
+
+class SubgoalGraph:
+    """ Simple subgoal graph over the walkability array of an Engine.
+
+    Movement matches Engine, including diagonal moves past obstacle corners. A walkable cell is
+    a subgoal if an obstacle lies next to it in a cardinal direction and that obstacle is at the
+    end of its row or column of obstacles, so a path may have to turn around it at this cell.
+
+    The edges of subgoal i are targets[offsets[i]:offsets[i + 1]] (compressed sparse row
+    layout), given as subgoal numbers, with their costs in costs.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        subgoals: array('I') of the cell of every subgoal
+        numbers: array('I') of the subgoal number of every cell, or NOT_SUBGOAL
+        offsets: array('I') of len(subgoals) + 1 offsets into targets
+        targets: array('I') of the subgoal number of the far end of every edge
+        costs: array('I') of the cost of every edge
+        stats: dict of counters recorded by preprocessing and by the most recent query
+
+    Constants:
+        NOT_SUBGOAL: subgoal number of cells that are not subgoals
+        CARDINALS: (row offset, column offset) of the four cardinal directions
+        DIAGONALS: (row offset, column offset) of the four diagonal directions
+    """
+
+    NOT_SUBGOAL = 0xFFFFFFFF
+
+    CARDINALS = tuple((i, j) for i, j, cost in Engine.DIRECTIONS
+                      if cost == Engine.VERT_HORZ_COST)
+    DIAGONALS = tuple((i, j) for i, j, cost in Engine.DIRECTIONS if cost == Engine.DIAG_COST)
+
+    def __init__(self, engine, index=None):
+        """ Initializes an instance of the SubgoalGraph class.
+
+        The graph is built, unless index is given (for example when loading it from a
+        PrecomputeCache).
+
+        Args:
+            engine: the Engine object that describes the grid
+            index: optional (subgoals, offsets, targets, costs) tuple of precomputed arrays or
+                memoryviews
+
+        Raises:
+            ValueError: the grid has more than one layer
+        """
+
+        if engine.get_layers() > 1:
+            raise ValueError('Subgoal graphs do not follow links between layers')
+
+        self.__engine = engine
+        self.__stats = {}
+
+        if index is not None:
+            self.__subgoals, self.__offsets, self.__targets, self.__costs = index
+            self.__numbers = self.number_subgoals(self.__subgoals)
+            return
+
+        begin = time.perf_counter()
+        self.build()
+        self.__stats = {'build_seconds': time.perf_counter() - begin,
+                        'subgoals': len(self.__subgoals), 'edges': len(self.__targets)}
+
+    def get_subgoals(self):
+        """ Gets the array of the cell of every subgoal. """
+
+        return self.__subgoals
+
+    def get_stats(self):
+        """ Gets the counters recorded by preprocessing or by the most recent query. """
+
+        return self.__stats
+
+    def get_index_bytes(self):
+        """ Gets the number of bytes of the arrays of the graph. """
+
+        arrays = (self.__subgoals, self.__numbers, self.__offsets, self.__targets, self.__costs)
+        return sum(memoryview(values).nbytes for values in arrays)
+
+    def get_arrays(self):
+        """ Gets the (subgoals, offsets, targets, costs) arrays of the graph. """
+
+        return self.__subgoals, self.__offsets, self.__targets, self.__costs
+
+    def get_edges(self, index):
+        """ Gets the (index, cost) of the subgoals joined to a subgoal cell by an edge. """
+
+        number = self.__numbers[index]
+        if number == SubgoalGraph.NOT_SUBGOAL:
+            return []
+        return [(self.__subgoals[self.__targets[e]], self.__costs[e])
+                for e in range(self.__offsets[number], self.__offsets[number + 1])]
+
+
+    # -------------------------------------
+    # Methods related to preprocessing
+    # -------------------------------------
+
+    def build(self):
+        """ Places the subgoals and stores the edges between them in CSR arrays. """
+
+        engine = self.__engine
+        size = engine.get_columns() * engine.get_rows()
+        self.__subgoals = array('I', (cell for cell in range(size) if self.is_corner(cell)))
+        self.__numbers = self.number_subgoals(self.__subgoals)
+
+        self.__offsets = array('I', [0])
+        self.__targets = array('I')
+        self.__costs = array('I')
+        for cell in self.__subgoals:
+            for subgoal, cost in self.find_reachable_subgoals(cell):
+                self.__targets.append(self.__numbers[subgoal])
+                self.__costs.append(cost)
+            self.__offsets.append(len(self.__targets))
+
+    def number_subgoals(self, subgoals):
+        """ Gets the array of the subgoal number of every cell. """
+
+        engine = self.__engine
+        numbers = array('I', [SubgoalGraph.NOT_SUBGOAL]) * (engine.get_columns()
+                                                           * engine.get_rows())
+        for number, cell in enumerate(subgoals):
+            numbers[cell] = number
+        return numbers
+
+    def is_free(self, row, col):
+        """ Returns True if the cell at a row and column is on the grid and walkable. """
+
+        engine = self.__engine
+        return (0 <= row < engine.get_rows() and 0 <= col < engine.get_columns()
+                and engine.is_walkable(row * engine.get_columns() + col))
+
+    def is_corner(self, index):
+        """ Checks if a cell is a subgoal.
+
+        A walkable cell is a subgoal if, in some cardinal direction, its neighbour is an
+        obstacle and the obstacle has a walkable neighbour in a perpendicular direction. A path
+        that passes the end of the obstacle may have to turn at the cell, whereas cells next to
+        the middle of a straight row of obstacles never need to be turning points.
+        """
+
+        engine = self.__engine
+        if not engine.is_walkable(index):
+            return False
+
+        row, col = engine.get_row_col(index)
+        for i, j in SubgoalGraph.CARDINALS:
+            r, c = row + i, col + j
+            if not (0 <= r < engine.get_rows() and 0 <= c < engine.get_columns()):
+                continue
+            if engine.is_walkable(r * engine.get_columns() + c):
+                continue
+            if self.is_free(r + j, c + i) or self.is_free(r - j, c - i):
+                return True
+        return False
+
+    def find_reachable_subgoals(self, index, extra=None):
+        """ Finds the subgoals that a cell directly h-reaches.
+
+        The cells between the four cardinal directions and the diagonal direction of every
+        quadrant are scanned diagonally and then along the two cardinal directions, and every
+        scan stops at the first obstacle or subgoal. A scan along a cardinal direction never
+        goes further than the scan from the previous diagonal cell, since the cells beyond it
+        are reached at the same cost through the subgoal or around the obstacle that stopped
+        that scan.
+
+        Args:
+            index: the index of the cell
+            extra: the index of another cell that is treated as a subgoal, or None
+
+        Returns:
+            List of (index, cost) tuples of the subgoals, including extra if it is reached
+        """
+
+        row, col = self.__engine.get_row_col(index)
+        found = []
+        clearance = {}
+        for i, j in SubgoalGraph.CARDINALS:
+            clearance[(i, j)] = self.scan(row, col, i, j, None, found, extra)
+
+        for i, j in SubgoalGraph.DIAGONALS:
+            vertical, horizontal = clearance[(i, 0)], clearance[(0, j)]
+            r, c = row, col
+            while True:
+                r, c = r + i, c + j
+                if not self.is_free(r, c):
+                    break
+                cell = r * self.__engine.get_columns() + c
+                if cell == extra or self.__numbers[cell] != SubgoalGraph.NOT_SUBGOAL:
+                    found.append(cell)
+                    break
+                vertical = self.scan(r, c, i, 0, vertical, found, extra)
+                horizontal = self.scan(r, c, 0, j, horizontal, found, extra)
+
+        return [(cell, self.__engine.get_h_cost(index, cell)) for cell in found]
+
+    def scan(self, row, col, i, j, limit, found, extra):
+        """ Scans the cells from a cell in a cardinal direction.
+
+        Args:
+            row: the row of the cell the scan starts next to
+            col: the column of the cell the scan starts next to
+            i: the row offset of the direction
+            j: the column offset of the direction
+            limit: the largest number of cells to scan, or None for no limit
+            found: list the index of the subgoal that stops the scan is appended to
+            extra: the index of another cell that is treated as a subgoal, or None
+
+        Returns:
+            The number of cells scanned before the scan stopped
+        """
+
+        columns = self.__engine.get_columns()
+        steps = 0
+        while limit is None or steps < limit:
+            row, col = row + i, col + j
+            if not self.is_free(row, col):
+                break
+            cell = row * columns + col
+            if cell == extra or self.__numbers[cell] != SubgoalGraph.NOT_SUBGOAL:
+                found.append(cell)
+                break
+            steps += 1
+        return steps
+
+
+    # -------------------------------------
+    # Methods related to queries
+    # -------------------------------------
+
+    def find_subgoals(self, start, target):
+        """ Finds the subgoals on a cheapest path from the start cell to the target cell.
+
+        The start cell is connected to the subgoals it directly h-reaches, with the target
+        treated as a subgoal, and the target to the subgoals that directly h-reach it. A* then
+        runs on the subgoal graph with the octile distance as heuristic, which is consistent
+        since every edge costs the octile distance between its ends.
+
+        Args:
+            start: the index of the start cell
+            target: the index of the target cell
+
+        Returns:
+            List of the cells from start to target (inclusive) where consecutive cells are
+            h-reachable, or None if there is no path
+        """
+
+        engine = self.__engine
+        self.__stats = {'expanded': 0, 'cost': None}
+        if not engine.is_walkable(start) or not engine.is_walkable(target):
+            return None
+        if start == target:
+            self.__stats['cost'] = 0
+            return [start]
+
+        into_target = dict(self.find_reachable_subgoals(target))
+        offsets, targets, costs = self.__offsets, self.__targets, self.__costs
+        subgoals, numbers = self.__subgoals, self.__numbers
+
+        opened = MinPriorityQueue.MinPriorityQueue((engine.get_h_cost(start, target), start))
+        g_costs = {start: 0}
+        prev = {}
+        closed = set()
+        while True:
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                return None
+            if current == target:
+                self.__stats['cost'] = g_costs[target]
+                return engine.build_path(prev, start, target)
+
+            closed.add(current)
+            self.__stats['expanded'] += 1
+            if current == start:
+                edges = self.find_reachable_subgoals(start, target)
+            else:
+                number = numbers[current]
+                edges = [(subgoals[targets[e]], costs[e])
+                         for e in range(offsets[number], offsets[number + 1])]
+                if current in into_target:
+                    edges.append((target, into_target[current]))
+
+            for adj, cost in edges:
+                if adj in closed:
+                    continue
+                g_cost = g_costs[current] + cost
+                if adj not in g_costs:
+                    g_costs[adj] = g_cost
+                    prev[adj] = current
+                    opened.insert(g_cost + engine.get_h_cost(adj, target), adj)
+                elif g_cost < g_costs[adj]:
+                    g_costs[adj] = g_cost
+                    prev[adj] = current
+                    opened.decrease_key(adj, g_cost + engine.get_h_cost(adj, target))
+
+    def refine(self, subgoals):
+        """ Lazily generates the cells of a path through h-reachable cells.
+
+        Every pair of consecutive cells is joined by an octile path that makes all of its
+        diagonal moves first or all of its cardinal moves first. The scans that connect the
+        cells always find one of the two free.
+
+        Args:
+            subgoals: list of cells where consecutive cells are h-reachable
+
+        Yields:
+            The index of every cell of the path, from the first to the last of subgoals
+        """
+
+        if not subgoals:
+            return
+        yield subgoals[0]
+        for a, b in zip(subgoals, subgoals[1:]):
+            segment = self.get_segment(a, b, diagonal_first=True)
+            if segment is None:
+                segment = self.get_segment(a, b, diagonal_first=False)
+            if segment is None:
+                raise ValueError('Cells {0} and {1} are not h-reachable'.format(a, b))
+            yield from segment
+
+    def get_segment(self, a, b, diagonal_first):
+        """ Gets the cells of an octile path from a cell to another cell.
+
+        Args:
+            a: the index of the first cell
+            b: the index of the last cell
+            diagonal_first: bool that determines if the diagonal moves come first
+
+        Returns:
+            List of the cells after a up to b (inclusive), or None if the path is blocked
+        """
+
+        row, col = self.__engine.get_row_col(a)
+        target_row, target_col = self.__engine.get_row_col(b)
+        rows, cols = target_row - row, target_col - col
+        diagonal = min(abs(rows), abs(cols))
+        i, j = (rows > 0) - (rows < 0), (cols > 0) - (cols < 0)
+        cardinal = (i, 0) if abs(rows) > abs(cols) else (0, j)
+
+        steps = [(i, j)] * diagonal + [cardinal] * (max(abs(rows), abs(cols)) - diagonal)
+        if not diagonal_first:
+            steps.reverse()
+
+        segment = []
+        for i, j in steps:
+            row, col = row + i, col + j
+            if not self.is_free(row, col):
+                return None
+            segment.append(row * self.__engine.get_columns() + col)
+        return segment
+
+    def find_path(self, start, target):
+        """ Finds the cheapest path from the start cell to the target cell.
+
+        Args:
+            start: the index of the start cell
+            target: the index of the target cell
+
+        Returns:
+            List of cell indices from start to target (inclusive), or None if there is no path
+        """
+
+        subgoals = self.find_subgoals(start, target)
+        if subgoals is None:
+            return None
+        return list(self.refine(subgoals))
+
+    def get_path_cost(self, path):
+        """ Gets the cost of a path of adjacent cells. """
+
+        return self.__engine.get_path_cost(path)
+
+
+    # ---------------------------------------------
+    # Methods related to caching the graph
+    # ---------------------------------------------
+
+    @staticmethod
+    def cached(engine, cache, key=None):
+        """ Gets a subgoal graph from a PrecomputeCache, building it only if the entry is stale.
+
+        The entry holds the number of subgoals and of edges followed by the four arrays of the
+        graph, and the returned SubgoalGraph reads them from the mapped file.
+
+        Args:
+            engine: the Engine object that describes the grid
+            cache: the PrecomputeCache object to use
+            key: the content hash of the map, computed from engine if not given
+
+        Returns:
+            The SubgoalGraph object
+        """
+
+        def build():
+            subgoals, offsets, targets, costs = SubgoalGraph(engine).get_arrays()
+            table = array('I', [len(subgoals), len(targets)])
+            for values in subgoals, offsets, targets, costs:
+                table.extend(values)
+            return table
+
+        if key is None:
+            key = cache.get_key(engine)
+        table = cache.get(key, 'subgoal-graph', build)
+
+        count, edges = table[0], table[1]
+        bounds = [2, 2 + count, 3 + 2 * count, 3 + 2 * count + edges, 3 + 2 * count + 2 * edges]
+        index = tuple(table[a:b] for a, b in zip(bounds, bounds[1:]))
+        return SubgoalGraph(engine, index=index)
@@ -0,0 +1,101 @@
+""" Test file for Cooperative.py """
+
+import unittest
+from Engine import Engine
+from Cooperative import CooperativePlanner, ReservationTable
+
+
+def position_at(path, time):
+    """ Gets the cell of an agent at a time step, assuming it stays on its last cell. """
+
+    return path[min(time, len(path) - 1)]
+
+
+class TestCooperativePlanner(unittest.TestCase):
+    """ Unittest class for testing CooperativePlanner class """
+
+    def assert_no_collisions(self, paths):
+        """ Asserts that no two agents share a cell or swap cells at any time step. """
+
+        horizon = max(len(path) for path in paths)
+        for time in range(horizon):
+            cells = [position_at(path, time) for path in paths]
+            self.assertEqual(len(cells), len(set(cells)), 'vertex conflict at %d' % time)
+
+            moves = {(position_at(path, time), position_at(path, time + 1)) for path in paths}
+            for a, b in moves:
+                if a != b:
+                    self.assertNotIn((b, a), moves, 'swap conflict at %d' % time)
+
+    def test_reservation_table(self):
+        """ Test for ReservationTable class. """
+
+        table = ReservationTable()
+        table.reserve_path([1, 2, 3], 0, 'a')
+        self.assertFalse(table.is_free(2, 1, 'b'))
+        self.assertTrue(table.is_free(2, 1, 'a'))
+        self.assertTrue(table.is_free(2, 2, 'b'))
+        self.assertTrue(table.is_swap(3, 2, 1, 'b'))
+        self.assertEqual(table.get_last_time(3, 'b'), 2)
+
+        table.park(3, 2, 'a')
+        self.assertFalse(table.is_free(3, 100, 'b'))
+
+        table.release('a')
+        self.assertTrue(table.is_free(3, 100, 'b'))
+        self.assertEqual(len(table), 0)
+
+    def test_corridor(self):
+        """ Test that agents crossing in a corridor with a passing bay avoid each other. """
+
+        # Two agents swap ends of a corridor that has a single bay to step aside into
+        walkable = bytearray([1, 1, 1, 1, 1,
+                              0, 0, 1, 0, 0])
+        engine = Engine(walkable, 5, 2)
+        planner = CooperativePlanner(engine)
+        paths = planner.plan([(0, 4), (4, 0)])
+
+        self.assertIsNotNone(paths[0])
+        self.assertIsNotNone(paths[1])
+        self.assertEqual(paths[0][-1], 4)
+        self.assertEqual(paths[1][-1], 0)
+        self.assert_no_collisions(paths)
+
+    def test_windowed(self):
+        """ Test that windowed replanning brings every agent to its target without collisions. """
+
+        engine = Engine(bytearray([1] * 64), 8, 8)
+        agents = [(0, 63), (63, 0), (7, 56), (56, 7), (3, 59), (59, 3)]
+
+        planner = CooperativePlanner(engine, window=4)
+        planner.start(agents)
+        paths = [[start] for start, _ in agents]
+        while not planner.is_finished() and planner.get_time() < 100:
+            for path, position in zip(paths, planner.tick()):
+                path.append(position)
+
+        self.assertTrue(planner.is_finished())
+        self.assert_no_collisions(paths)
+
+        with self.assertRaises(ValueError):
+            CooperativePlanner(engine).start(agents)
+
+    def test_blocked(self):
+        """ Test that an agent without a plan does not wait over another agent's reservations.
+        """
+
+        # Agent 0 is planned first and walks onto the end of the corridor that agent 1 is on
+        engine = Engine(bytearray([1, 1, 1]), 3, 1)
+        planner = CooperativePlanner(engine, window=4)
+        planner.start([(0, 2), (2, 0)])
+        planner.tick()
+
+        table = planner.get_table()
+        self.assertEqual(planner.get_stats()['blocked'], 1)
+        self.assertTrue(table.is_free(2, 2, 0))
+        self.assertEqual(table.get_last_time(2, 0), 1)
+        self.assertTrue(planner.needs_replan(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
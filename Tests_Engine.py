@@ -0,0 +1,1030 @@
+""" Test file for the headless engines: Engine.py, FlowField.py, Isochrone.py, Landmarks.py,
+ThetaStar.py, Search.py, SearchTrace.py, ParallelSolver.py, PrecomputeCache.py, IDAStar.py,
+DistanceMatrix.py, ContractionHierarchy.py, MovingTargetSearch.py, LayeredEngine.py,
+Bitboard.py, GoalBounding.py, SubgoalGraph.py and MemoryProfiler.py """
+
+from array import array
+import os
+import tempfile
+import unittest
+from Engine import Engine
+from FlowField import FlowField
+from Landmarks import Landmarks
+from ThetaStar import ThetaStar
+from Search import Search, SearchScheduler
+from SearchTrace import SearchTrace, TracePlayer
+from ParallelSolver import ParallelSolver
+from PrecomputeCache import PrecomputeCache
+from IDAStar import IDAStar
+from DistanceMatrix import DistanceMatrix
+from ContractionHierarchy import ContractionHierarchy
+from MovingTargetSearch import MovingTargetSearch
+from LayeredEngine import LayeredEngine
+from Bitboard import Bitboard
+from GoalBounding import GoalBounding
+from SubgoalGraph import SubgoalGraph
+from MemoryProfiler import MemoryProfiler
+
+
+def make_walkable(layout):
+    """ Builds a walkability array from a list of strings where '#' marks an obstacle. """
+
+    return bytearray(0 if char == '#' else 1 for line in layout for char in line)
+
+
+MAZE = [
+    "..........",
+    ".########.",
+    ".#......#.",
+    ".#.####.#.",
+    ".#.#..#.#.",
+    ".#.#..#...",
+    ".#.####.##",
+    ".#........",
+    ".########.",
+    "..........",
+    ]
+
+
+class TestEngine(unittest.TestCase):
+    """ Unittest class for testing Engine class """
+
+    def test_neighbours(self):
+        """ Test for get_neighbours method in Engine class. """
+
+        engine = Engine(make_walkable(["...", ".#.", "..."]), 3, 3)
+
+        result = sorted(engine.get_neighbours(0))
+        expected = [(1, 10), (3, 10)]
+        self.assertListEqual(result, expected)
+
+        result = sorted(engine.get_neighbours(1))
+        expected = [(0, 10), (2, 10), (3, 14), (5, 14)]
+        self.assertListEqual(result, expected)
+
+        with self.assertRaises(ValueError):
+            Engine(bytearray(8), 3, 3)
+
+    def test_find_path(self):
+        """ Test for find_path method in Engine class. """
+
+        engine = Engine(make_walkable(["....", "....", "...."]), 4, 3)
+        path = engine.find_path(0, 11)
+        self.assertEqual(path[0], 0)
+        self.assertEqual(path[-1], 11)
+        self.assertEqual(engine.get_path_cost(path), 2*14 + 10)
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        path = engine.find_path(0, engine.get_index(4, 2))
+        self.assertEqual(engine.get_path_cost(path), 230)
+        self.assertIsNone(engine.find_path(0, engine.get_index(4, 4)))
+
+        engine = Engine(make_walkable(["..#..", "..#..", "..#.."]), 5, 3)
+        self.assertIsNone(engine.find_path(0, 4))
+
+    def test_solve_many(self):
+        """ Test for solve_many method in Engine class. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        walkable = [i for i in range(100) if engine.is_walkable(i)]
+        pairs = [(start, target) for start in walkable[::7] for target in (0, 42, 44, 99)]
+        pairs.append((5, 5))
+        pairs.append((0, 11))
+
+        result = engine.solve_many(pairs)
+        self.assertEqual(len(result), len(pairs))
+        self.assertEqual(len(result.get_offsets()), len(pairs) + 1)
+
+        for i, (start, target) in enumerate(pairs):
+            expected = engine.find_path(start, target)
+            path = result.get_path(i)
+            if expected is None:
+                self.assertIsNone(result.get_cost(i))
+                self.assertIsNone(path)
+            else:
+                self.assertEqual(result.get_cost(i), engine.get_path_cost(expected))
+                self.assertEqual(engine.get_path_cost(path), result.get_cost(i))
+                self.assertEqual((path[0], path[-1]), (start, target))
+
+        # Scratch buffers are reused by the next batch
+        result = engine.solve_many([(0, 42)])
+        self.assertEqual(result.get_cost(0), 230)
+
+    def test_parallel_solver(self):
+        """ Test that worker processes over shared memory match solve_many. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        pairs = [(start, target) for start in range(0, 100, 3) for target in (0, 42, 99)]
+        expected = engine.solve_many(pairs)
+
+        with ParallelSolver(engine.get_walkable(), 10, 10, processes=2) as solver:
+            costs, lengths = solver.solve_many(pairs, chunk_size=7)
+
+        self.assertEqual(costs, expected.get_costs())
+        for i, length in enumerate(lengths):
+            offsets = expected.get_offsets()
+            self.assertEqual(length, offsets[i + 1] - offsets[i])
+
+
+    def test_buffer_layers(self):
+        """ Test that buffer-protocol layers are used in place and validated. """
+
+        walkable = make_walkable(MAZE)
+        grid = memoryview(walkable).cast('B', (10, 10))
+        engine = Engine(grid, 10, 10)
+        self.assertIsInstance(engine.get_walkable(), memoryview)
+        self.assertEqual(engine.get_path_cost(engine.find_path(0, 42)), 230)
+
+        # Changes to the buffer are seen by the engine
+        walkable[1] = 0
+        self.assertFalse(engine.is_walkable(1))
+
+        with self.assertRaises(ValueError):
+            Engine(grid, 5, 20)
+        with self.assertRaises(ValueError):
+            Engine(memoryview(walkable)[::2], 5, 10)
+        with self.assertRaises(ValueError):
+            Engine(walkable + b'.', 10, 10)
+
+        try:
+            import numpy  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            self.skipTest('NumPy is not installed')
+        array = numpy.frombuffer(bytes(make_walkable(MAZE)), numpy.uint8).reshape(10, 10)
+        engine = Engine(array.astype(numpy.int32), 10, 10)
+        self.assertEqual(engine.get_path_cost(engine.find_path(0, 42)), 230)
+        with self.assertRaises(ValueError):
+            Engine(array.T, 10, 10)
+
+
+class TestFlowField(unittest.TestCase):
+    """ Unittest class for testing FlowField class """
+
+    def test_distances(self):
+        """ Test that flow field distances match A* path costs. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        target = engine.get_index(4, 2)
+        field = FlowField(engine, target)
+
+        for start in range(100):
+            if not engine.is_walkable(start):
+                continue
+            path = engine.find_path(start, target)
+            if path is None:
+                self.assertIsNone(field.get_distance(start))
+                self.assertIsNone(field.get_path(start))
+            else:
+                self.assertEqual(field.get_distance(start), engine.get_path_cost(path))
+                field_path = field.get_path(start)
+                self.assertEqual(field_path[-1], target)
+                self.assertEqual(engine.get_path_cost(field_path), field.get_distance(start))
+
+    def test_vectorized(self):
+        """ Test that the NumPy wavefront matches Dijkstra's algorithm. """
+
+        try:
+            import numpy  # pylint: disable=unused-import, import-outside-toplevel
+        except ImportError:
+            self.skipTest('NumPy is not installed')
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        target = engine.get_index(0, 9)
+        expected = FlowField(engine, target)
+        result = FlowField(engine, target, vectorized=True)
+
+        self.assertListEqual(list(result.get_distances()), list(expected.get_distances()))
+        for start in range(100):
+            if not engine.is_walkable(start):
+                continue
+            path = result.get_path(start)
+            if path is not None:
+                self.assertEqual(engine.get_path_cost(path), expected.get_distance(start))
+
+
+class TestIsochrone(unittest.TestCase):
+    """ Unittest class for testing Isochrone class """
+
+    def test_budget(self):
+        """ Test that exactly the cells within the budget are reached, at A* path costs. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        source = engine.get_index(4, 2)
+        field = FlowField(engine, source)
+
+        for budget in 0, 55, 230:
+            area = engine.find_reachable(source, budget)
+            for index in range(100):
+                distance = field.get_distance(index)
+                if distance is not None and distance <= budget:
+                    self.assertIn(index, area)
+                    self.assertEqual(area.get_distance(index), distance)
+                else:
+                    self.assertNotIn(index, area)
+                    self.assertIsNone(area.get_distance(index))
+            self.assertEqual(area.get_count(), len(area.get_cells()))
+
+        self.assertEqual(engine.find_reachable(source, 0).get_cells(), [source])
+        self.assertEqual(engine.find_reachable(engine.get_index(1, 1), 100).get_count(), 0)
+        with self.assertRaises(ValueError):
+            engine.find_reachable(source, -1)
+
+    def test_vectorized(self):
+        """ Test that the NumPy wavefront matches Dijkstra's algorithm. """
+
+        try:
+            import numpy  # pylint: disable=unused-import, import-outside-toplevel
+        except ImportError:
+            self.skipTest('NumPy is not installed')
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        for budget in 0, 40, 150, 1000:
+            expected = engine.find_reachable(0, budget)
+            result = engine.find_reachable(0, budget, vectorized=True)
+            self.assertListEqual(list(result.get_distances()), list(expected.get_distances()))
+            self.assertEqual(result.get_mask(), expected.get_mask())
+
+
+class TestLandmarks(unittest.TestCase):
+    """ Unittest class for testing Landmarks class """
+
+    def test_admissible(self):
+        """ Test that the ALT heuristic never overestimates and A* stays optimal. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        target = engine.get_index(4, 2)
+        exact = FlowField(engine, target)
+
+        for strategy in Landmarks.FARTHEST, Landmarks.AVOID:
+            landmarks = Landmarks(engine, 4, strategy)
+            self.assertGreater(len(landmarks.get_landmarks()), 0)
+
+            for start in range(100):
+                distance = exact.get_distance(start)
+                if not engine.is_walkable(start) or distance is None:
+                    continue
+                self.assertLessEqual(landmarks.get_h_cost(start, target), distance)
+                path = engine.find_path(start, target, landmarks.get_h_cost)
+                self.assertEqual(engine.get_path_cost(path), distance)
+
+        with self.assertRaises(ValueError):
+            Landmarks(engine, 4, 'unknown')
+
+    def test_save_load(self):
+        """ Test that landmark tables survive a round trip through a file. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        landmarks = Landmarks(engine, 3)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'maze.landmarks')
+            landmarks.save(path)
+
+            loaded = Landmarks.load(path, engine)
+            self.assertListEqual(loaded.get_landmarks(), landmarks.get_landmarks())
+            self.assertEqual(loaded.get_distances(), landmarks.get_distances())
+
+            walkable = make_walkable(MAZE)
+            walkable[0] = 0
+            with self.assertRaises(ValueError):
+                Landmarks.load(path, Engine(walkable, 10, 10))
+
+
+class TestPrecomputeCache(unittest.TestCase):
+    """ Unittest class for testing PrecomputeCache class """
+
+    def test_landmarks(self):
+        """ Test that cached landmarks are built once and match freshly selected ones. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        expected = Landmarks(engine, 3)
+
+        with tempfile.TemporaryDirectory() as directory:
+            for builds in 1, 0:
+                with PrecomputeCache(directory) as cache:
+                    landmarks = Landmarks.cached(engine, cache, 3)
+                    self.assertEqual(cache.get_stats()['builds'], builds)
+                    self.assertEqual(landmarks.get_landmarks(), expected.get_landmarks())
+                    self.assertEqual(list(landmarks.get_distances()),
+                                     list(expected.get_distances()))
+
+            # A different layout is a different entry
+            walkable = make_walkable(MAZE)
+            walkable[0] = 0
+            with PrecomputeCache(directory) as cache:
+                Landmarks.cached(Engine(walkable, 10, 10), cache, 3)
+                self.assertEqual(cache.get_stats()['builds'], 1)
+
+    def test_stale_and_eviction(self):
+        """ Test that stale entries are rebuilt and old entries are evicted by size. """
+
+        build = lambda: array('I', range(100))
+        with tempfile.TemporaryDirectory() as directory:
+            with PrecomputeCache(directory, max_bytes=800) as cache:
+                key = '0' * 32
+                self.assertEqual(list(cache.get(key, 'a', build)), list(range(100)))
+                self.assertEqual(list(cache.get(key, 'a', build, version=2)), list(range(100)))
+                self.assertEqual(cache.get_stats()['builds'], 2)
+
+                # Two entries do not fit, so the least recently used one is deleted
+                cache.get(key, 'b', build)
+                self.assertEqual(cache.get_stats()['evictions'], 1)
+                self.assertFalse(os.path.exists(cache.get_path(key, 'a')))
+                self.assertLessEqual(cache.get_size(), 800)
+
+                with self.assertRaises(ValueError):
+                    cache.get(key, '../a', build)
+
+    def test_hits_and_release(self):
+        """ Test that in-memory hits count as uses and that replaced entries are unmapped. """
+
+        build = lambda: array('I', range(100))
+        key = '0' * 32
+        with tempfile.TemporaryDirectory() as directory:
+            with PrecomputeCache(directory, max_bytes=1000) as cache:
+                first = cache.get(key, 'a', build)
+                cache.get(key, 'b', build)
+                os.utime(cache.get_path(key, 'a'), (1, 1))
+                os.utime(cache.get_path(key, 'b'), (2, 2))
+
+                # The hit on 'a' makes 'b' the least recently used entry
+                cache.TOUCH_INTERVAL = 0
+                self.assertIs(cache.get(key, 'a', build), first)
+                cache.get(key, 'c', build)
+                self.assertTrue(os.path.exists(cache.get_path(key, 'a')))
+                self.assertFalse(os.path.exists(cache.get_path(key, 'b')))
+
+                cache.get(key, 'a', build, version=2)
+                with self.assertRaises(ValueError):
+                    first.tolist()
+
+
+class TestThetaStar(unittest.TestCase):
+    """ Unittest class for testing ThetaStar class """
+
+    def assert_valid_waypoints(self, theta, engine, waypoints, start, target):
+        """ Asserts that waypoints join start and target with walkable straight segments. """
+
+        self.assertEqual(waypoints[0], start)
+        self.assertEqual(waypoints[-1], target)
+        for a, b in zip(waypoints, waypoints[1:]):
+            self.assertTrue(theta.has_line_of_sight(a, b))
+
+        path = theta.expand_waypoints(waypoints)
+        for a, b in zip(path, path[1:]):
+            self.assertIn(b, [adj for adj, _ in engine.get_neighbours(a)])
+
+    def test_line_of_sight(self):
+        """ Test for has_line_of_sight and trace_line methods in ThetaStar class. """
+
+        engine = Engine(make_walkable(["....", ".#..", "...."]), 4, 3)
+        theta = ThetaStar(engine)
+
+        self.assertTrue(theta.has_line_of_sight(0, 3))
+        self.assertFalse(theta.has_line_of_sight(0, 10))
+        self.assertEqual(theta.has_line_of_sight(3, 8), theta.has_line_of_sight(8, 3))
+        self.assertListEqual(theta.trace_line(11, 0), list(reversed(theta.trace_line(0, 11))))
+
+    def test_find_path(self):
+        """ Test that Theta* and Lazy Theta* find short, valid waypoint paths. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        start, target = 0, engine.get_index(4, 2)
+        cells = engine.find_path(start, target)
+
+        for lazy in False, True:
+            theta = ThetaStar(engine, lazy)
+            waypoints = theta.find_path(start, target)
+            self.assert_valid_waypoints(theta, engine, waypoints, start, target)
+            self.assertLess(len(waypoints), len(cells))
+            self.assertLessEqual(theta.get_path_cost(waypoints), theta.get_path_cost(cells))
+
+        self.assertIsNone(ThetaStar(engine).find_path(start, engine.get_index(4, 4)))
+
+        # Repaired parents keep straight-line g_costs, so no path is longer than the cells
+        lazy = ThetaStar(engine, True)
+        for start in range(100):
+            for target in 0, 42, 99:
+                cells = engine.find_path(start, target)
+                if cells is not None:
+                    waypoints = lazy.find_path(start, target)
+                    self.assert_valid_waypoints(lazy, engine, waypoints, start, target)
+                    self.assertLessEqual(lazy.get_path_cost(waypoints),
+                                         lazy.get_path_cost(cells) + 1e-9)
+
+    def test_smooth_path(self):
+        """ Test for smooth_path method in ThetaStar class. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        start, target = 0, engine.get_index(4, 2)
+        cells = engine.find_path(start, target)
+
+        theta = ThetaStar(engine)
+        waypoints = theta.smooth_path(cells)
+        self.assert_valid_waypoints(theta, engine, waypoints, start, target)
+        self.assertLess(len(waypoints), len(cells))
+
+
+class TestIDAStar(unittest.TestCase):
+    """ Unittest class for testing IDAStar class """
+
+    def test_find_path(self):
+        """ Test that IDA* finds paths as cheap as A* within its memory cap. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        for max_bytes in 1 << 20, 600:
+            ida = IDAStar(engine, max_bytes)
+            self.assertLessEqual(ida.get_capacity() * IDAStar.SLOT_BYTES, max_bytes)
+            for start in range(0, 100, 7):
+                for target in 0, 42, 99:
+                    expected = engine.find_path(start, target)
+                    path = ida.find_path(start, target)
+                    if expected is None:
+                        self.assertIsNone(path)
+                    else:
+                        self.assertEqual(engine.get_path_cost(path),
+                                         engine.get_path_cost(expected))
+                        self.assertEqual(path[0], start)
+                        self.assertEqual(path[-1], target)
+
+        # The enclosed box cannot be reached
+        self.assertIsNone(ida.find_path(0, engine.get_index(4, 4)))
+        self.assertEqual(ida.get_stats()['iterations'], 0)
+        self.assertIsNone(ida.find_path(engine.get_index(1, 1), 0))
+        ida.find_path(0, 42)
+        self.assertGreater(ida.get_stats()['estimated_bytes'], 0)
+
+        with self.assertRaises(ValueError):
+            IDAStar(engine, 4)
+
+        # Edits to a zero-copy walkability array are seen by the connectivity check
+        walkable = bytearray([1, 0, 1] * 3)
+        ida = IDAStar(Engine(walkable, 3, 3))
+        self.assertIsNone(ida.find_path(0, 2))
+        walkable[1] = 1
+        self.assertEqual(ida.find_path(0, 2), [0, 1, 2])
+
+
+class TestDistanceMatrix(unittest.TestCase):
+    """ Unittest class for testing DistanceMatrix class """
+
+    def test_costs(self):
+        """ Test that the matrix matches one A* search per pair of waypoints. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        waypoints = [0, 42, 99, engine.get_index(4, 4), 29, 0]
+
+        expected = []
+        for source in waypoints:
+            for target in waypoints:
+                path = engine.find_path(source, target)
+                expected.append(None if path is None else engine.get_path_cost(path))
+
+        with ParallelSolver(engine.get_walkable(), 10, 10, processes=2) as solver:
+            for options in {'symmetric': False}, {}, {'solver': solver}:
+                matrix = DistanceMatrix(engine, waypoints, **options)
+                costs = [matrix.get_cost(i, j) for i in range(6) for j in range(6)]
+                self.assertEqual(costs, expected)
+
+        self.assertEqual(matrix.get_stats()['searches'], 5)
+        self.assertEqual(matrix.get_row(0)[1], 230)
+        path = matrix.get_path(0, 1)
+        self.assertEqual((path[0], path[-1]), (0, 42))
+        self.assertIsNone(matrix.get_path(0, 3))
+
+
+class TestContractionHierarchy(unittest.TestCase):
+    """ Unittest class for testing ContractionHierarchy class """
+
+    def assert_optimal(self, engine, hierarchy):
+        """ Asserts that the hierarchy finds paths of adjacent cells at A* path costs. """
+
+        for start in range(100):
+            for target in range(0, 100, 3):
+                if not engine.is_walkable(start):
+                    self.assertIsNone(hierarchy.find_path(start, target))
+                    continue
+                path = hierarchy.find_path(start, target)
+                expected = engine.find_path(start, target)
+                if expected is None or not engine.is_walkable(target):
+                    self.assertIsNone(path)
+                    continue
+                self.assertEqual((path[0], path[-1]), (start, target))
+                for a, b in zip(path, path[1:]):
+                    self.assertIn(b, [adj for adj, _ in engine.get_neighbours(a)])
+                self.assertEqual(engine.get_path_cost(path), engine.get_path_cost(expected))
+
+    def test_paths(self):
+        """ Test that unpacked paths are optimal and that shortcuts were added. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        hierarchy = ContractionHierarchy(engine)
+        self.assertGreater(hierarchy.get_stats()['shortcuts'], 0)
+        self.assert_optimal(engine, hierarchy)
+
+    def test_cached(self):
+        """ Test that a hierarchy read back from a PrecomputeCache gives the same paths. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        with tempfile.TemporaryDirectory() as directory:
+            with PrecomputeCache(directory) as cache:
+                built = ContractionHierarchy.cached(engine, cache)
+                loaded = ContractionHierarchy.cached(engine, cache)
+                self.assertEqual(cache.get_stats()['builds'], 1)
+                self.assertEqual([list(a) for a in loaded.get_arrays()],
+                                 [list(a) for a in built.get_arrays()])
+                self.assert_optimal(engine, loaded)
+                del built, loaded
+
+
+class TestMovingTargetSearch(unittest.TestCase):
+    """ Unittest class for testing MovingTargetSearch class """
+
+    def assert_cheapest(self, engine, chase, start, target):
+        """ Asserts that the moving-target search finds a path as cheap as A*. """
+
+        path = chase.find_path()
+        expected = engine.find_path(start, target)
+        if expected is None:
+            self.assertIsNone(path)
+            return
+        self.assertEqual(path[0], start)
+        self.assertEqual(path[-1], target)
+        self.assertEqual(engine.get_path_cost(path), engine.get_path_cost(expected))
+        self.assertEqual(chase.get_cost(), engine.get_path_cost(expected))
+
+    def test_moving_target(self):
+        """ Test that paths stay optimal and reuse the tree as the target moves. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        chase = MovingTargetSearch(engine, 0, 42)
+        self.assert_cheapest(engine, chase, 0, 42)
+        first = chase.get_stats()['expanded']
+
+        for target in 43, 33, 23, 24, 25, 44, 15, 9, 99:
+            chase.set_target(target)
+            self.assert_cheapest(engine, chase, 0, target)
+
+        # Targets inside the search tree are answered without expanding any cell
+        chase.set_target(42)
+        self.assert_cheapest(engine, chase, 0, 42)
+        self.assertEqual(chase.get_stats()['expanded'], 0)
+        self.assertGreater(first, 0)
+
+        chase.set_target(11)
+        self.assertIsNone(chase.find_path())
+
+    def test_moving_start(self):
+        """ Test that paths stay optimal when the start moves along the path. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        start = 0
+        chase = MovingTargetSearch(engine, start, 42)
+        for target in 42, 9, 19, 29, 39, 59, 79, 78, 99, 98:
+            chase.set_target(target)
+            self.assert_cheapest(engine, chase, start, target)
+            path = chase.find_path()
+            start = path[min(2, len(path) - 1)]
+            chase.set_start(start)
+            if len(path) > 1:
+                self.assertGreater(chase.get_stats()['kept'], 0)
+            self.assert_cheapest(engine, chase, start, target)
+
+        # A start outside of the tree discards it
+        chase.set_start(44)
+        self.assertEqual(chase.get_stats()['kept'], 0)
+        self.assert_cheapest(engine, chase, 44, target)
+
+
+class TestLayeredEngine(unittest.TestCase):
+    """ Unittest class for testing LayeredEngine class """
+
+    def make_building(self, shortcut=False):
+        """ Builds three 10x10 layers: the maze, an open floor and the maze again.
+
+        The ground floor is linked to the middle floor by stairs at (9, 9) and to the top floor
+        by an elevator at (0, 0). With shortcut, a cheap ramp also joins (2, 5) in the middle
+        to (9, 0) on the top floor, shorter than the octile distance between its ends.
+        """
+
+        middle = bytearray([1]) * 100
+        for col in range(1, 10):
+            middle[50 + col] = 0
+        engine = LayeredEngine.from_layers([make_walkable(MAZE), middle, make_walkable(MAZE)],
+                                           10, 10)
+        engine.add_link(engine.get_cell(0, 9, 9), engine.get_cell(1, 9, 9), 30)
+        engine.add_link(engine.get_cell(0, 0, 0), engine.get_cell(2, 0, 0), 80)
+        if shortcut:
+            engine.add_link(engine.get_cell(1, 2, 5), engine.get_cell(2, 9, 0), 20)
+        return engine
+
+    def test_layout(self):
+        """ Test the layer-major indices, the layer views and the links. """
+
+        engine = self.make_building()
+        self.assertEqual((engine.get_layers(), engine.get_layer_rows()), (3, 10))
+        self.assertEqual(engine.get_columns() * engine.get_rows(), 300)
+        self.assertEqual(engine.get_position(engine.get_cell(2, 4, 7)), (2, 4, 7))
+        self.assertEqual(bytes(engine.get_layer_walkable(2)), bytes(make_walkable(MAZE)))
+        self.assertEqual(engine.get_link_count(), 2)
+        self.assertEqual(engine.get_all_links(), [(0, 200, 80), (99, 199, 30)])
+
+        # Layers do not touch: the top row of the middle floor is above nothing
+        self.assertNotIn(99, [adj for adj, _ in engine.get_neighbours(109)])
+        self.assertIn((199, 30), engine.get_neighbours(99))
+        self.assertIsNone(engine.get_neighbour(100, 0))
+
+        with self.assertRaises(ValueError):
+            engine.add_link(0, engine.get_cell(0, 1, 1), 10)
+        with self.assertRaises(ValueError):
+            engine.add_link(0, 0, 10)
+        with self.assertRaises(ValueError):
+            LayeredEngine(bytearray(299), 10, 10, 3)
+
+        # A link between adjacent cells never makes the step dearer than moving
+        engine.add_link(engine.get_cell(1, 0, 0), engine.get_cell(1, 1, 1), 25)
+        self.assertEqual(engine.get_path_cost([engine.get_cell(1, 0, 0),
+                                               engine.get_cell(1, 1, 1)]), 14)
+        self.assertEqual(engine.get_path_cost([99, 199]), 30)
+
+        self.assertTrue(engine.has_path(0, engine.get_cell(1, 4, 2)))
+        self.assertFalse(engine.has_path(0, engine.get_cell(0, 4, 4)))
+        self.assertFalse(engine.has_path(engine.get_cell(0, 1, 1), 0))
+        self.assertTrue(engine.has_path(engine.get_cell(0, 4, 2), engine.get_cell(2, 9, 9)))
+        self.assertFalse(engine.has_path(engine.get_cell(1, 9, 5), engine.get_cell(2, 4, 4)))
+
+    def test_engines(self):
+        """ Test that the headless engines find the cheapest paths through the links. """
+
+        for shortcut in False, True:
+            engine = self.make_building(shortcut)
+
+            # A link dearer than the step between the adjacent cells it joins
+            engine.add_link(engine.get_cell(1, 0, 0), engine.get_cell(1, 1, 1), 25)
+            target = engine.get_cell(2, 4, 2)
+            exact = FlowField(engine, target)
+            ida = IDAStar(engine)
+            hierarchy = ContractionHierarchy(engine)
+            starts = [start for start in range(0, 300, 7) if engine.is_walkable(start)]
+            result = engine.solve_many([(start, target) for start in starts])
+
+            for i, start in enumerate(starts):
+                distance = exact.get_distance(start)
+                if distance is not None:
+                    self.assertLessEqual(engine.get_h_cost(start, target), distance)
+                self.assertEqual(result.get_cost(i), distance)
+                for solver in engine, ida, hierarchy:
+                    path = solver.find_path(start, target)
+                    if distance is None:
+                        self.assertIsNone(path)
+                    else:
+                        self.assertEqual(engine.get_path_cost(path), distance)
+                if distance is not None:
+                    self.assertEqual(exact.get_path(start)[-1], target)
+
+            # Paths on the middle floor, where the link is never cheaper than a step
+            middle = FlowField(engine, engine.get_cell(1, 4, 4))
+            for start in range(100, 200):
+                path = hierarchy.find_path(start, engine.get_cell(1, 4, 4))
+                if middle.get_distance(start) is None:
+                    self.assertIsNone(path)
+                else:
+                    self.assertEqual(engine.get_path_cost(path), middle.get_distance(start))
+
+            area = engine.find_reachable(target, 400)
+            for index in range(300):
+                distance = exact.get_distance(index)
+                if distance is not None and distance <= 400:
+                    self.assertEqual(area.get_distance(index), distance)
+
+        # Crossing a floor costs at least what the stairs add
+        engine = self.make_building()
+        self.assertEqual(engine.get_h_cost(engine.get_cell(0, 9, 9), engine.get_cell(1, 9, 9)),
+                         30)
+        with self.assertRaises(ValueError):
+            ThetaStar(engine)
+
+
+class TestBitboard(unittest.TestCase):
+    """ Unittest class for testing Bitboard class """
+
+    def test_search(self):
+        """ Test that the bit-parallel searches match searches over single cells. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        board = Bitboard(engine)
+        self.assertEqual(board.get_cells(board.get_walkable()),
+                         [i for i in range(100) if engine.is_walkable(i)])
+
+        for source in 0, 42, 44, 99:
+            field = FlowField(engine, source)
+            reachable = [i for i in range(100) if field.get_distance(i) is not None]
+            self.assertEqual(board.get_cells(board.get_reachable(source)), reachable)
+
+            # Every step of a breadth-first search costs at least one straight move
+            steps = board.get_step_distances(source)
+            for index in range(100):
+                if index in reachable:
+                    self.assertLessEqual(steps[index] * Engine.VERT_HORZ_COST,
+                                         field.get_distance(index))
+                    self.assertGreaterEqual(steps[index] * Engine.DIAG_COST,
+                                            field.get_distance(index))
+                else:
+                    self.assertEqual(steps[index], Bitboard.UNREACHABLE)
+
+            for target in range(0, 100, 3):
+                self.assertEqual(board.has_path(source, target),
+                                 engine.find_path(source, target) is not None
+                                 and engine.is_walkable(source) and engine.is_walkable(target))
+
+        bands = board.get_bands(0, max_steps=3)
+        self.assertEqual(len(bands), 4)
+        self.assertEqual(board.get_cells(bands[1]), [1, 10])
+        self.assertTrue(engine.has_path(0, 42))
+        self.assertFalse(engine.has_path(0, 44))
+
+    def test_components(self):
+        """ Test that the enclosed box forms a component of its own. """
+
+        board = Bitboard(Engine(make_walkable(MAZE), 10, 10))
+        components = board.get_components()
+        self.assertEqual([board.get_count(component) for component in components], [57, 4])
+        self.assertEqual(board.get_cells(components[1]), [44, 45, 54, 55])
+        self.assertEqual(board.to_bytes(components[1])[44], 1)
+
+        with self.assertRaises(ValueError):
+            Bitboard(LayeredEngine(bytearray(200), 10, 10, 2))
+
+
+class TestGoalBounding(unittest.TestCase):
+    """ Unittest class for testing GoalBounding class """
+
+    def test_optimal(self):
+        """ Test that pruned searches stay optimal and the pool builds the same boxes. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        bounding = GoalBounding(engine)
+        with ParallelSolver(engine.get_walkable(), 10, 10, processes=2) as solver:
+            self.assertEqual(GoalBounding(engine, solver).get_boxes(), bounding.get_boxes())
+
+        self.assertEqual(bounding.get_box(0, 3)[:2], (0, 1))
+        self.assertIsNone(bounding.get_box(0, 0))
+        self.assertIsNone(bounding.get_box(engine.get_index(4, 4), 0))
+
+        for start in 0, 42, engine.get_index(4, 4), 99:
+            for target in range(100):
+                expected = engine.find_path(start, target)
+                path = bounding.find_path(start, target)
+                if expected is None:
+                    self.assertIsNone(path)
+                else:
+                    self.assertEqual(engine.get_path_cost(path), engine.get_path_cost(expected))
+
+        self.assertEqual(engine.get_path_cost(bounding.find_path(0, 42)), 230)
+        self.assertGreater(bounding.get_stats()['pruned'], 0)
+
+    def test_save_load(self):
+        """ Test that boxes survive a round trip through a file and a PrecomputeCache. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        bounding = GoalBounding(engine)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'maze.bounds')
+            bounding.save(path)
+            self.assertEqual(GoalBounding.load(path, engine).get_boxes(), bounding.get_boxes())
+
+            walkable = make_walkable(MAZE)
+            walkable[0] = 0
+            with self.assertRaises(ValueError):
+                GoalBounding.load(path, Engine(walkable, 10, 10))
+
+            with PrecomputeCache(directory) as cache:
+                cached = GoalBounding.cached(engine, cache)
+                self.assertEqual(cached.get_boxes().tolist(), bounding.get_boxes().tolist())
+                GoalBounding.cached(engine, cache)
+                self.assertEqual(cache.get_stats()['builds'], 1)
+                del cached
+
+
+class TestSubgoalGraph(unittest.TestCase):
+    """ Unittest class for testing SubgoalGraph class """
+
+    def test_paths(self):
+        """ Test that refined paths are optimal and that subgoals sit at obstacle corners. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        graph = SubgoalGraph(engine)
+        self.assertIn(engine.get_index(0, 1), graph.get_subgoals())
+        self.assertNotIn(engine.get_index(0, 5), graph.get_subgoals())
+        self.assertNotIn(engine.get_index(2, 2), graph.get_subgoals())
+        self.assertIn((engine.get_index(0, 8), 70), graph.get_edges(engine.get_index(0, 1)))
+
+        for start in range(100):
+            for target in range(0, 100, 3):
+                path = graph.find_path(start, target)
+                expected = engine.find_path(start, target)
+                if expected is None or not engine.is_walkable(start):
+                    self.assertIsNone(path)
+                    continue
+                self.assertEqual((path[0], path[-1]), (start, target))
+                for a, b in zip(path, path[1:]):
+                    self.assertIn(b, [adj for adj, _ in engine.get_neighbours(a)])
+                self.assertEqual(engine.get_path_cost(path), engine.get_path_cost(expected))
+                self.assertEqual(graph.get_stats()['cost'], engine.get_path_cost(path))
+
+        subgoals = graph.find_subgoals(0, 42)
+        self.assertLess(len(subgoals), len(engine.find_path(0, 42)))
+        cells = graph.refine(subgoals)
+        self.assertEqual(next(cells), 0)
+        self.assertEqual(engine.get_path_cost([0] + list(cells)), 230)
+
+    def test_cached(self):
+        """ Test that a graph read back from a PrecomputeCache has the same arrays. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        with tempfile.TemporaryDirectory() as directory:
+            with PrecomputeCache(directory) as cache:
+                built = SubgoalGraph.cached(engine, cache)
+                loaded = SubgoalGraph.cached(engine, cache)
+                self.assertEqual(cache.get_stats()['builds'], 1)
+                self.assertEqual([list(a) for a in loaded.get_arrays()],
+                                 [list(a) for a in built.get_arrays()])
+                self.assertEqual(engine.get_path_cost(loaded.find_path(0, 42)), 230)
+                del built, loaded
+
+
+class TestMemoryProfiler(unittest.TestCase):
+    """ Unittest class for testing MemoryProfiler class """
+
+    def test_solve(self):
+        """ Test that a profiled search reports its peak and the sizes of its structures. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        profiler = MemoryProfiler()
+        search = Search(engine, 0, 42)
+        profiler.begin()
+        search.run()
+        profiler.record(**search.get_structures())
+        report = profiler.end()
+
+        self.assertEqual(search.get_cost(), 230)
+        self.assertIs(profiler.get_report(), report)
+        self.assertFalse(profiler.is_profiling())
+        self.assertEqual(list(report['structures']), ['opened', 'closed', 'g_costs', 'prev'])
+        self.assertTrue(all(size > 0 for size in report['structures'].values()))
+        self.assertGreater(report['peak_bytes'], 0)
+        self.assertLessEqual(report['retained_bytes'], report['peak_bytes'])
+
+        path = profiler.measure(engine.find_path, 0, 42)
+        self.assertEqual(engine.get_path_cost(path), 230)
+        self.assertEqual(len(profiler.get_reports()), 2)
+        self.assertEqual(profiler.get_report()['structures'], {})
+        self.assertEqual(profiler.get_peak_bytes(),
+                         max(report['peak_bytes'] for report in profiler.get_reports()))
+        self.assertTrue(profiler.get_summary()[0].startswith('peak '))
+
+    def test_deep_size(self):
+        """ Test that shared objects are counted once and buffers with their contents. """
+
+        cells = array('I', bytes(4000))
+        self.assertGreaterEqual(MemoryProfiler.get_deep_size(cells), 4000)
+
+        seen = set()
+        first = MemoryProfiler.get_deep_size({'cells': cells}, seen)
+        second = MemoryProfiler.get_deep_size([cells], seen)
+        self.assertGreater(first, 4000)
+        self.assertLess(second, 4000)
+        self.assertEqual(MemoryProfiler.format_bytes(512), '512 B')
+        self.assertEqual(MemoryProfiler.format_bytes(3 * 1024 * 1024), '3.0 MiB')
+
+
+class TestSearch(unittest.TestCase):
+    """ Unittest class for testing Search and SearchScheduler classes """
+
+    def test_step(self):
+        """ Test that a search advanced in slices finds the same path as a full run. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        target = engine.get_index(4, 2)
+        expected = engine.find_path(0, target)
+
+        events = []
+        search = Search(engine, 0, target, on_event=lambda event, index: events.append(event))
+        steps = 0
+        while search.step(max_expansions=3) == Search.RUNNING:
+            self.assertLessEqual(search.get_stats()['expanded'], 3 * (steps + 1))
+            steps += 1
+
+        self.assertGreater(steps, 1)
+        self.assertEqual(search.get_status(), Search.FOUND)
+        self.assertListEqual(search.get_path(), expected)
+        self.assertEqual(search.get_cost(), 230)
+        self.assertIn(Search.CLOSED, events)
+
+        search = Search(engine, 0, engine.get_index(4, 4))
+        self.assertEqual(search.step(), Search.NO_PATH)
+        self.assertIsNone(search.get_path())
+
+        # Obstacles are neither start nor target cells
+        obstacle = engine.get_index(1, 1)
+        self.assertEqual(Search(engine, obstacle, 0).get_status(), Search.NO_PATH)
+        for solver in engine, ThetaStar(engine), IDAStar(engine):
+            self.assertIsNone(solver.find_path(obstacle, 0))
+            self.assertIsNone(solver.find_path(0, obstacle))
+
+    def test_scheduler(self):
+        """ Test that the scheduler finishes every search within its per-frame budget. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        searches = [Search(engine, start, engine.get_index(4, 2)) for start in (0, 9, 90, 99)]
+
+        scheduler = SearchScheduler(max_expansions=10)
+        for search in searches:
+            scheduler.add(search)
+
+        finished = []
+        frames = 0
+        while len(scheduler) > 0:
+            before = sum(search.get_stats()['expanded'] for search in searches)
+            finished.extend(scheduler.run_frame())
+            after = sum(search.get_stats()['expanded'] for search in searches)
+            self.assertLessEqual(after - before, 10)
+            frames += 1
+
+        self.assertGreater(frames, 1)
+        self.assertEqual(len(finished), 4)
+        for search in searches:
+            self.assertEqual(search.get_status(), Search.FOUND)
+
+        with self.assertRaises(ValueError):
+            SearchScheduler()
+
+
+class TestSearchTrace(unittest.TestCase):
+    """ Unittest class for testing SearchTrace and TracePlayer classes """
+
+    def test_capture(self):
+        """ Test that a trace records every event of the search and its path. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        trace = SearchTrace.capture(engine, 0, 42)
+        path = engine.find_path(0, 42)
+        stats = engine.get_stats()
+
+        events = list(trace.get_events())
+        self.assertEqual(events.count(SearchTrace.OPENED), stats['opened'])
+        self.assertEqual(events.count(SearchTrace.CLOSED), stats['expanded'])
+        self.assertEqual(trace.get_path(), path)
+
+        trace = SearchTrace.capture(engine, 0, engine.get_index(4, 4))
+        self.assertIsNone(trace.get_path())
+        self.assertEqual(trace.get_entry(len(trace) - 1),
+                         (SearchTrace.NO_PATH, engine.get_index(4, 4)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'search.trace')
+            trace.save(path)
+            loaded = SearchTrace.load(path)
+            with open(path, 'r+b') as file:
+                file.truncate(os.path.getsize(path) - 1)
+            with self.assertRaises(ValueError):
+                SearchTrace.load(path)
+
+        self.assertEqual(loaded.get_events(), trace.get_events())
+        self.assertEqual(loaded.get_cells(), trace.get_cells())
+        self.assertEqual(loaded.get_walkable(), bytes(make_walkable(MAZE)))
+        self.assertEqual((loaded.get_start(), loaded.get_target()), (0, 44))
+
+    def test_seek(self):
+        """ Test that seeking in any direction gives the states of playing from the start. """
+
+        engine = Engine(make_walkable(MAZE), 10, 10)
+        trace = SearchTrace.capture(engine, 0, 42)
+
+        def expected(position):
+            states = [None] * 100
+            for i in range(position):
+                event, index = trace.get_entry(i)
+                states[index] = event
+            return states
+
+        states = [None] * 100
+        player = TracePlayer(trace, states.__setitem__)
+        for position in 17, len(trace), 3, 0, 40, 39, len(trace) + 5, -1:
+            player.seek(position)
+            self.assertEqual(states, expected(player.get_position()))
+        self.assertEqual(player.get_position(), 0)
+
+        player.set_speed(7)
+        player.play()
+        frames = 0
+        while player.step():
+            frames += 1
+        self.assertTrue(player.is_finished())
+        self.assertEqual(frames, (len(trace) - 1) // 7)
+        self.assertEqual(states, expected(len(trace)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+""" Test file for the visualizer: Grid.py, FrameProfiler.py and Percentiles.py, and the memory
+profiling of Grid solves with MemoryProfiler.py, run under the SDL dummy video driver """
+
+import csv
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+# The driver has to be selected before pygame is first imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame  # pylint: disable=wrong-import-position
+from Grid import Grid, Node  # pylint: disable=wrong-import-position
+from FrameProfiler import FrameProfiler  # pylint: disable=wrong-import-position
+from MemoryProfiler import MemoryProfiler  # pylint: disable=wrong-import-position
+from Percentiles import get_percentile, get_percentiles  # pylint: disable=wrong-import-position
+
+
+def make_grid(columns=30, rows=20):
+    """ Creates a Grid drawn on an off-screen surface. """
+
+    surface = pygame.Surface((10 * columns, 10 * rows))
+    Node.set_surface(surface)
+    return Grid(surface, surface.get_rect(), columns, rows)
+
+
+class TestGrid(unittest.TestCase):
+    """ Unittest class for testing Grid class """
+
+    def test_smoothed_path(self):
+        """ Test that visual and non-visual solves smooth to the same waypoints. """
+
+        grid = make_grid()
+        self.assertIsNone(grid.get_smoothed_path())
+
+        grid.solve(False)
+        expected = grid.get_smoothed_path()
+        self.assertEqual(expected, [(Grid.DEFAULT_START_ROW, Grid.DEFAULT_START_COL),
+                                    (Grid.DEFAULT_TARGET_ROW, 30 + Grid.DEFAULT_TARGET_COL)])
+
+        grid.create_grid()
+        grid.set_start_node()
+        grid.set_target_node()
+        grid.start_search()
+        self.assertTrue(grid.step_search())
+        self.assertEqual(grid.get_smoothed_path(), expected)
+
+    def test_layout_obstacles(self):
+        """ Test that the default start and target never replace obstacles of a layout. """
+
+        surface = pygame.Surface((300, 200))
+        Node.set_surface(surface)
+        walkable = bytearray([1]) * 600
+        default_start = Grid.DEFAULT_START_ROW * 30 + Grid.DEFAULT_START_COL
+        walkable[default_start] = 0
+        grid = Grid.from_array(surface, surface.get_rect(), walkable, 30, 20)
+
+        before = bytes(grid.create_engine().get_walkable())
+        start = grid.get_start_index()
+        self.assertEqual(bytes(grid.create_engine().get_walkable()), before)
+        self.assertNotEqual(start, default_start)
+        self.assertTrue(walkable[start])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'layout.map')
+            grid.save_layout(path)
+            grid.load_layout(path)
+        self.assertEqual(bytes(grid.create_engine().get_walkable()), before)
+
+        grid = Grid.from_array(surface, surface.get_rect(), bytearray(9), 3, 3)
+        self.assertEqual(sum(grid.get_walkable_array()), 0)
+        with self.assertRaises(AttributeError):
+            grid.solve(False)
+
+    def test_layers(self):
+        """ Test that the single-layer tools refuse a grid with several layers. """
+
+        grid = make_grid()
+        grid.switch_layer(1)
+        for action in (grid.start_search, grid.show_distance_field, grid.start_replay,
+                       lambda: grid.show_reachable_area(100)):
+            with self.assertRaises(ValueError):
+                action()
+
+        grid.switch_layer(0)
+        grid.toggle_link(grid.get_nodes()[Grid.DEFAULT_START_ROW][Grid.DEFAULT_START_COL])
+        self.assertIsNotNone(grid.solve_layers())
+        self.assertTrue(grid.create_layered_engine().has_path(grid.get_start_index(),
+                                                              grid.get_target_index()))
+
+    def test_agents(self):
+        """ Test that added agents are planned together with the start and target. """
+
+        grid = make_grid()
+        nodes = grid.get_nodes()
+        self.assertFalse(grid.add_agent(nodes[0][0], nodes[0][0]))
+        self.assertTrue(grid.add_agent(nodes[0][0], nodes[19][29]))
+        self.assertFalse(grid.add_agent(nodes[0][0], nodes[5][5]))
+
+        paths = grid.solve_agents(8)
+        self.assertEqual([path[-1] for path in paths],
+                         [target for _, target in grid.get_agent_pairs()])
+
+        grid.create_grid()
+        grid.switch_layer(1)
+        with self.assertRaises(ValueError):
+            grid.solve_agents(8)
+
+    def test_memory_profiler(self):
+        """ Test that visual and non-visual solves are profiled and that tracing stops. """
+
+        grid = make_grid()
+        profiler = MemoryProfiler()
+        grid.set_memory_profiler(profiler)
+
+        grid.start_search()
+        self.assertTrue(profiler.is_profiling())
+        self.assertTrue(grid.step_search())
+        report = profiler.get_report()
+        self.assertEqual(list(report['structures']),
+                         ['nodes', 'opened', 'closed', 'g_costs', 'prev'])
+        self.assertGreater(report['peak_bytes'], 0)
+
+        grid.solve(False)
+        self.assertEqual(len(profiler.get_reports()), 2)
+        self.assertEqual(list(profiler.get_report()['structures']),
+                         ['nodes', 'opened', 'closed'])
+        self.assertFalse(tracemalloc.is_tracing())
+
+        grid.start_search()
+        grid.set_memory_profiler(None)
+        self.assertFalse(profiler.is_profiling())
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(len(profiler.get_reports()), 2)
+
+
+class TestFrameProfiler(unittest.TestCase):
+    """ Unittest class for testing FrameProfiler class and the Percentiles functions """
+
+    def record_frames(self, profiler, count):
+        """ Records frames where phase 'a' of frame k takes k seconds and every frame takes 50
+        seconds and expands k cells. """
+
+        for k in range(count):
+            base = 100 * k
+            clock = iter([base, base + 1, base + 1 + k, base + 50])
+            with mock.patch('time.perf_counter', lambda: next(clock)):
+                profiler.begin_frame()
+                profiler.measure('a', len, ())
+                profiler.add_expansions(k)
+                profiler.end_frame()
+
+    def test_ring_buffer(self):
+        """ Test that the most recent frames are kept in order once the buffers wrap. """
+
+        profiler = FrameProfiler(('a', 'b'), capacity=3)
+        self.assertEqual(profiler.get_times('a'), [])
+        self.assertEqual(profiler.get_fps(), 0.0)
+
+        self.record_frames(profiler, 2)
+        self.assertEqual(list(profiler.get_slots()), [0, 1])
+        self.assertEqual(profiler.get_times('a'), [0, 1])
+
+        profiler = FrameProfiler(('a', 'b'), capacity=3)
+        self.record_frames(profiler, 5)
+        self.assertEqual((profiler.get_frames(), len(profiler)), (5, 3))
+        self.assertEqual(list(profiler.get_slots()), [2, 0, 1])
+        self.assertEqual(profiler.get_times('a'), [2, 3, 4])
+        self.assertEqual(profiler.get_times('b'), [0, 0, 0])
+        self.assertEqual(profiler.get_times('frame'), [50, 50, 50])
+        self.assertAlmostEqual(profiler.get_fps(), 3 / 150)
+        self.assertAlmostEqual(profiler.get_expansion_rate(), 9 / 150)
+        self.assertEqual(len(profiler.get_summary()), 5)
+
+        with self.assertRaises(ValueError):
+            profiler.get_times('c')
+        with self.assertRaises(ValueError):
+            FrameProfiler(('a',), capacity=0)
+
+    def test_percentiles(self):
+        """ Test the percentiles of empty, small and full lists of values. """
+
+        self.assertEqual(get_percentile([], 0.5), 0.0)
+        self.assertEqual(get_percentile([3, 1, 2], 0.5), 2)
+        self.assertEqual(get_percentile([3, 1, 2], 0.99), 3)
+        self.assertEqual(get_percentiles(range(1, 101)), {'p50': 51, 'p95': 96, 'p99': 100})
+        self.assertEqual(get_percentiles([0.5, 0.25], (0.5,), scale=1000), {'p50': 500})
+
+        profiler = FrameProfiler(('a',), capacity=4)
+        self.record_frames(profiler, 6)
+        times = profiler.get_times('a')
+        self.assertEqual(times, [2, 3, 4, 5])
+        self.assertEqual(get_percentiles(times), {'p50': 4, 'p95': 5, 'p99': 5})
+
+    def test_write_csv(self):
+        """ Test the columns and rows of the CSV file of the kept frames. """
+
+        profiler = FrameProfiler(('a', 'b'), capacity=3)
+        self.record_frames(profiler, 5)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'frames.csv')
+            profiler.write_csv(path)
+            with open(path, newline='') as file:
+                rows = list(csv.reader(file))
+
+        self.assertEqual(rows[0], ['frame', 'frame_ms', 'a_ms', 'b_ms', 'expansions'])
+        self.assertEqual(rows[1:], [[str(k), '50000.000', '%d000.000' % k, '0.000', str(k)]
+                                    for k in (2, 3, 4)])
+
+
+if __name__ == '__main__':
+    unittest.main()
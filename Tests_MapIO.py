@@ -0,0 +1,238 @@
+""" Test file for reading and writing grid files and the headless front ends: MapIO.py,
+SearchTrace.py, Cli.py, Server.py and Client.py """
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import Cli
+import MapIO
+from SearchTrace import SearchTrace
+from Batch import BatchResult
+from Server import PathServer
+from Client import PathClient
+
+MAP = """type octile
+height 4
+width 5
+map
+.....
+.@@@.
+.@T..
+.@...
+"""
+
+SCENARIOS = """version 1
+0\tarena.map\t5\t4\t0\t0\t4\t3\t64.14
+0\tarena.map\t5\t4\t0\t3\t0\t0\t30
+0\tarena.map\t5\t4\t0\t0\t2\t1\t0
+0\tarena.map\t5\t4\t0\t0\t9\t9\t0
+"""
+
+
+class TestMapIO(unittest.TestCase):
+    """ Unittest class for testing MapIO functions and the command-line mode """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.map_path = os.path.join(self.directory.name, 'arena.map')
+        self.scen_path = os.path.join(self.directory.name, 'arena.map.scen')
+        with open(self.map_path, 'w') as file:
+            file.write(MAP)
+        with open(self.scen_path, 'w') as file:
+            file.write(SCENARIOS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read_map(self):
+        """ Test for read_map function. """
+
+        engine = MapIO.read_map(self.map_path)
+        self.assertEqual((engine.get_columns(), engine.get_rows()), (5, 4))
+        self.assertTrue(engine.is_walkable(engine.get_index(2, 3)))
+        self.assertFalse(engine.is_walkable(engine.get_index(2, 2)))
+        self.assertFalse(engine.is_walkable(engine.get_index(1, 1)))
+        self.assertEqual(engine.get_path_cost(engine.find_path(0, engine.get_index(3, 4))), 64)
+
+        with open(self.map_path, 'w') as file:
+            file.write(MAP.replace('.@...\n', '.@..\n'))
+        with self.assertRaises(ValueError):
+            MapIO.read_map(self.map_path)
+
+    def test_read_scenarios(self):
+        """ Test for read_scenarios function. """
+
+        queries = list(MapIO.read_scenarios(self.scen_path))
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(queries[0], ('arena.map', 0, 0, 3, 4))
+        self.assertEqual(queries[1], ('arena.map', 3, 0, 0, 0))
+
+    def test_write_map(self):
+        """ Test for write_map function. """
+
+        engine = MapIO.read_map(self.map_path)
+        path = os.path.join(self.directory.name, 'copy.map')
+        MapIO.write_map(path, engine)
+        self.assertEqual(MapIO.read_map(path).get_walkable(), engine.get_walkable())
+
+    def test_grid_file(self):
+        """ Test for write_grid function and GridFile class. """
+
+        engine = MapIO.read_map(self.map_path)
+        path = os.path.join(self.directory.name, 'arena.grid')
+        costs = bytes(range(20))
+        target = engine.get_index(3, 4)
+
+        for packed in False, True:
+            MapIO.write_grid(path, engine, packed, costs)
+            with MapIO.open_grid(path) as grid_file:
+                self.assertEqual(grid_file.is_packed(), packed)
+                self.assertEqual(MapIO.as_bytes(grid_file.get_walkable()),
+                                 bytes(engine.get_walkable()))
+                self.assertEqual(bytes(grid_file.get_costs()), costs)
+                mapped = grid_file.get_engine()
+                self.assertEqual(mapped.get_path_cost(mapped.find_path(0, target)), 64)
+
+        MapIO.write_grid(path, engine)
+        with MapIO.open_grid(path) as grid_file:
+            self.assertIsNone(grid_file.get_costs())
+
+        with open(path, 'r+b') as file:
+            file.truncate(20)
+        with self.assertRaises(ValueError):
+            MapIO.open_grid(path)
+
+    def test_cli(self):
+        """ Test for the command-line mode in Cli.py. """
+
+        output_path = os.path.join(self.directory.name, 'results.jsonl')
+        for engine in Cli.ENGINES:
+            with contextlib.redirect_stderr(io.StringIO()):
+                code = Cli.main(['run', self.scen_path, '--engine', engine,
+                                 '--batch-size', '3', '--output', output_path])
+            self.assertEqual(code, Cli.EXIT_FAILURES)
+
+            with open(output_path) as file:
+                records = [json.loads(line) for line in file]
+            self.assertEqual([record['id'] for record in records], [0, 1, 2, 3])
+            self.assertAlmostEqual(records[0]['cost'], 64 if engine != 'theta' else 64.142)
+            self.assertAlmostEqual(records[1]['cost'], 30)
+            self.assertIsNone(records[2]['cost'])
+            self.assertIn('error', records[3])
+
+        trace_dir = os.path.join(self.directory.name, 'traces')
+        with contextlib.redirect_stderr(io.StringIO()):
+            Cli.main(['run', self.scen_path, '--engine', 'astar', '--trace-dir', trace_dir,
+                      '--output', output_path])
+        self.assertEqual(len(os.listdir(trace_dir)), 3)
+        trace = SearchTrace.load(os.path.join(trace_dir, 'arena-0-19.trace'))
+        self.assertEqual(MapIO.read_map(self.map_path).get_path_cost(trace.get_path()), 64)
+
+
+class TestServer(unittest.TestCase):
+    """ Unittest class for testing PathServer and PathClient classes """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.map_path = os.path.join(self.directory.name, 'arena.map')
+        with open(self.map_path, 'w') as file:
+            file.write(MAP)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_queries(self):
+        """ Test JSON and binary queries over a Unix socket and over TCP. """
+
+        maps = PathServer.read_maps([self.map_path])
+
+        async def run():
+            server = PathServer(maps)
+            path = await server.start(os.path.join(self.directory.name, 'server.sock'))
+            client = await PathClient.connect(path=path)
+
+            self.assertEqual(await client.get_maps(), {'arena': [5, 4]})
+            costs, lengths = await client.solve('arena', [(0, 0, 3, 4), (3, 0, 0, 0),
+                                                          (0, 0, 2, 1)])
+            self.assertEqual(costs, [64, 30, None])
+            self.assertEqual(lengths[2], 0)
+
+            costs, lengths = await client.solve_indices('arena', [(0, 19), (0, 11), (0, 0)])
+            self.assertEqual(list(costs[:1]) + list(lengths[1:]), [64, 0, 1])
+            self.assertEqual(costs[1], BatchResult.NO_PATH)
+
+            with self.assertRaises(ValueError):
+                await client.solve('arena', [(0, 0, 9, 9)])
+            with self.assertRaises(ValueError):
+                await client.solve_indices('unknown', [(0, 1)])
+
+            await client.close()
+            await server.close()
+
+            server = PathServer(maps)
+            host, port = await server.start()
+            client = await PathClient.connect(host=host, port=port)
+            costs, _ = await client.solve('arena', [(0, 0, 3, 4)])
+            self.assertEqual(costs, [64])
+            await client.close()
+            await server.close()
+
+        asyncio.run(run())
+
+    def test_coalescing(self):
+        """ Test that identical queries in flight are solved once and metrics are reported. """
+
+        async def run():
+            server = PathServer(PathServer.read_maps([self.map_path]))
+            path = await server.start(os.path.join(self.directory.name, 'server.sock'))
+            clients = [await PathClient.connect(path=path) for _ in range(4)]
+
+            requests = [client.solve('arena', [(0, 0, 3, 4)] * 5) for client in clients]
+            for costs, _ in await asyncio.gather(*requests):
+                self.assertEqual(costs, [64] * 5)
+
+            metrics = await clients[0].get_metrics()
+            self.assertEqual(metrics['queries'], 20)
+            self.assertEqual(metrics['coalesced'], 19)
+            self.assertEqual(metrics['batches'], 1)
+            self.assertEqual(metrics['queue_depth'], 0)
+            self.assertEqual(metrics['open_connections'], 4)
+            self.assertIn('p99', metrics['latency_ms'])
+
+            for client in clients:
+                await client.close()
+            await server.close()
+
+        asyncio.run(run())
+
+    def test_solve_failure(self):
+        """ Test that requests whose solve fails are answered with an error. """
+
+        async def run():
+            server = PathServer(PathServer.read_maps([self.map_path]))
+            path = await server.start(os.path.join(self.directory.name, 'server.sock'))
+            client = await PathClient.connect(path=path)
+
+            with mock.patch.object(PathServer, 'solve_pairs',
+                                   side_effect=RuntimeError('worker pool is broken')):
+                for request in (client.solve('arena', [(0, 0, 3, 4)]),
+                                client.solve_indices('arena', [(0, 19)])):
+                    with self.assertRaisesRegex(ValueError, 'RuntimeError'):
+                        await asyncio.wait_for(request, 5)
+
+            self.assertEqual((await client.get_metrics())['errors'], 2)
+            costs, _ = await client.solve('arena', [(0, 0, 3, 4)])
+            self.assertEqual(costs, [64])
+            await client.close()
+            await server.close()
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
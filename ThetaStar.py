@@ -0,0 +1,289 @@
+""" Python script that contains the ThetaStar class definition.
+
+ThetaStar class finds any-angle paths with the Theta* and Lazy Theta* algorithms. Unlike A*,
+which can only move between adjacent cells, Theta* lets a cell's parent be any cell it has line
+of sight to. Paths are returned as a compact list of waypoints instead of one entry per cell.
+The class can also smooth paths found by A* after the fact.
+"""
+
+import math
+import MinPriorityQueue
+from Engine import Engine
+
+
+class ThetaStar:
+    """ Any-angle pathfinding over the walkability array of an Engine.
+
+    Line of sight between two cells is traced with Bresenham's line algorithm. Consecutive
+    cells of a Bresenham line are always adjacent, so a straight segment between two waypoints
+    can always be walked cell by cell with the 8-connected movement of the Engine. Line of sight
+    results are cached because Theta* checks the same pairs of cells many times.
+
+    Attributes:
+        engine: the Engine object that describes the grid
+        lazy: bool that determines if Lazy Theta* is used instead of Theta*
+        cache: dict mapping (cell, cell) pairs to their line of sight result
+        cache_size: the number of results kept in the cache before it is cleared
+        stats: dict of counters recorded during the most recent search
+    """
+
+    def __init__(self, engine, lazy=False, cache_size=1 << 16):
+        """ Initializes an instance of the ThetaStar class.
+
+        Args:
+            engine: the Engine object that describes the grid
+            lazy: bool that determines if Lazy Theta* is used instead of Theta*
+            cache_size: the number of line of sight results to cache
+
+        Raises:
+            ValueError: the grid has more than one layer, where straight lines are undefined
+        """
+
+        if engine.get_layers() > 1:
+            raise ValueError('Any-angle paths are only defined on grids with a single layer')
+
+        self.__engine = engine
+        self.__lazy = lazy
+        self.__cache = {}
+        self.__cache_size = cache_size
+        self.__stats = {}
+
+    def get_stats(self):
+        """ Gets the counters recorded during the most recent search. """
+
+        return self.__stats
+
+
+    # ---------------------------------------------
+    # Methods related to line of sight
+    # ---------------------------------------------
+
+    def trace_line(self, a, b):
+        """ Gets the cells on the Bresenham line between two cells.
+
+        The line is always traced from the lower to the higher index, so the result does not
+        depend on the order of the arguments.
+
+        Args:
+            a: the index of the first cell
+            b: the index of the second cell
+
+        Returns:
+            List of cell indices from a to b (inclusive)
+        """
+
+        first, last = min(a, b), max(a, b)
+        columns = self.__engine.get_columns()
+        row, col = divmod(first, columns)
+        row1, col1 = divmod(last, columns)
+
+        d_row = abs(row1 - row)
+        d_col = abs(col1 - col)
+        s_row = 1 if row1 > row else -1
+        s_col = 1 if col1 > col else -1
+        error = d_col - d_row
+
+        cells = [first]
+        while (row, col) != (row1, col1):
+            doubled = 2 * error
+            if doubled > -d_row:
+                error -= d_row
+                col += s_col
+            if doubled < d_col:
+                error += d_col
+                row += s_row
+            cells.append(row * columns + col)
+
+        if first != a:
+            cells.reverse()
+        return cells
+
+    def has_line_of_sight(self, a, b):
+        """ Returns True if every cell on the line between two cells is walkable. """
+
+        key = (a, b) if a < b else (b, a)
+        result = self.__cache.get(key)
+        if result is not None:
+            self.__stats['cache_hits'] = self.__stats.get('cache_hits', 0) + 1
+            return result
+
+        self.__stats['los_checks'] = self.__stats.get('los_checks', 0) + 1
+        walkable = self.__engine.get_walkable()
+        result = all(walkable[cell] for cell in self.trace_line(a, b))
+
+        if len(self.__cache) >= self.__cache_size:
+            self.__cache.clear()
+        self.__cache[key] = result
+        return result
+
+    def clear_cache(self):
+        """ Removes all cached line of sight results, for example after the grid has changed. """
+
+        self.__cache.clear()
+
+    def get_distance(self, a, b):
+        """ Gets the straight-line distance between two cells in movement cost units. """
+
+        columns = self.__engine.get_columns()
+        row, col = divmod(a, columns)
+        row1, col1 = divmod(b, columns)
+        return Engine.VERT_HORZ_COST * math.hypot(row1 - row, col1 - col)
+
+
+    # ---------------------------------------------
+    # Methods related to any-angle search
+    # ---------------------------------------------
+
+    def find_path(self, start, target):
+        """ Find an any-angle path from the start cell to the target cell.
+
+        Args:
+            start: the index of the start cell
+            target: the index of the target cell
+
+        Returns:
+            List of waypoint cell indices from start to target (inclusive), or None if there is
+            no path
+        """
+
+        opened = MinPriorityQueue.MinPriorityQueue()
+        closed = set()
+        g_costs = {start: 0}
+        parents = {start: start}
+        self.__stats = {'expanded': 0, 'los_checks': 0, 'cache_hits': 0}
+        if not self.__engine.is_walkable(start) or not self.__engine.is_walkable(target):
+            return None
+
+        opened.insert(self.get_distance(start, target), start)
+
+        while True:
+            try:
+                current = opened.extract_min()
+            except IndexError:
+                return None
+
+            if self.__lazy:
+                self.set_vertex(current, closed, g_costs, parents)
+
+            if current == target:
+                return self.build_waypoints(parents, start, target)
+
+            closed.add(current)
+            self.__stats['expanded'] += 1
+
+            for adj, _ in self.__engine.get_neighbours(current):
+                if adj in closed:
+                    continue
+                self.update_vertex(current, adj, target, opened, g_costs, parents)
+
+    def update_vertex(self, current, adj, target, opened, g_costs, parents):
+        """ Relaxes a neighbour of the cell being expanded.
+
+        Theta* first tries to connect the neighbour straight to the parent of the current cell
+        (path 2) and falls back to the current cell (path 1) when there is no line of sight.
+        Lazy Theta* always assumes line of sight and checks it when the neighbour is expanded.
+        """
+
+        parent = parents[current]
+        if self.__lazy or self.has_line_of_sight(parent, adj):
+            source = parent
+        else:
+            source = current
+
+        g_cost = g_costs[source] + self.get_distance(source, adj)
+        if adj not in g_costs or g_cost < g_costs[adj]:
+            g_costs[adj] = g_cost
+            parents[adj] = source
+            f_cost = g_cost + self.get_distance(adj, target)
+            if opened.element_exists(adj):
+                opened.decrease_key(adj, f_cost)
+            else:
+                opened.insert(f_cost, adj)
+
+    def set_vertex(self, current, closed, g_costs, parents):
+        """ Checks the assumed line of sight of a cell that Lazy Theta* is about to expand.
+
+        If the cell cannot see its parent, the parent is replaced by the closed neighbour
+        that gives the cheapest path.
+        """
+
+        parent = parents[current]
+        if parent == current or self.has_line_of_sight(parent, current):
+            return
+
+        best, best_cost = None, None
+        for adj, _ in self.__engine.get_neighbours(current):
+            if adj not in closed:
+                continue
+            # Straight-line distances, like every other g_cost of the search
+            cost = g_costs[adj] + self.get_distance(adj, current)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = adj, cost
+
+        parents[current] = best
+        g_costs[current] = best_cost
+
+    def build_waypoints(self, parents, start, target):
+        """ Walks parent pointers back from target to start.
+
+        Returns:
+            List of waypoint cell indices from start to target (inclusive)
+        """
+
+        waypoints = [target]
+        current = target
+        while current != start:
+            current = parents[current]
+            waypoints.append(current)
+        waypoints.reverse()
+        return waypoints
+
+
+    # ---------------------------------------------
+    # Methods related to waypoint paths
+    # ---------------------------------------------
+
+    def smooth_path(self, path):
+        """ Removes unnecessary waypoints from a path of adjacent cells found by A*.
+
+        Starting from the first cell, the path is followed as far as the current waypoint has
+        line of sight, and the last visible cell becomes the next waypoint.
+
+        Args:
+            path: list of cell indices where consecutive cells are adjacent
+
+        Returns:
+            List of waypoint cell indices with the same start and end as path
+        """
+
+        if len(path) <= 2:
+            return list(path)
+
+        waypoints = [path[0]]
+        anchor = path[0]
+        for previous, cell in zip(path, path[1:]):
+            if not self.has_line_of_sight(anchor, cell):
+                waypoints.append(previous)
+                anchor = previous
+        waypoints.append(path[-1])
+        return waypoints
+
+    def expand_waypoints(self, waypoints):
+        """ Converts a list of waypoints back into a path of adjacent cells.
+
+        Args:
+            waypoints: list of waypoint cell indices with line of sight between consecutive ones
+
+        Returns:
+            List of cell indices where consecutive cells are adjacent
+        """
+
+        path = waypoints[:1]
+        for a, b in zip(waypoints, waypoints[1:]):
+            path.extend(self.trace_line(a, b)[1:])
+        return path
+
+    def get_path_cost(self, waypoints):
+        """ Gets the total straight-line length of a list of waypoints. """
+
+        return sum(self.get_distance(a, b) for a, b in zip(waypoints, waypoints[1:]))
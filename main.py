@@ -1,11 +1,29 @@
-""" File that acts as main script for program. """
+""" File that acts as main script for program.
 
-from Program import Program
+With no arguments, the interactive visualizer is started. With arguments, the program runs
+headless in command-line mode (see Cli.py), e.g. python main.py run maps/arena.scen
+"""
+
+import sys
+import Cli
 
 def main():
-    """ Executes main loop of Program class. """
+    """ Executes main loop of Program class, or the command-line mode if arguments are given. """
+
+    if len(sys.argv) > 1:
+        sys.exit(Cli.main(sys.argv[1:]))
+
+    # Imported here so that the command-line mode never has to load pygame
+    from Program import Program
 
     program = Program()
     program.main()
 
-main()
+    try:
+        program.get_profiler().write_csv(Program.PROFILE_PATH)
+    except OSError as error:
+        sys.exit('Could not write frame profile: {0}'.format(error))
+
+# Worker processes of the command-line mode import this file, so only run it as a script
+if __name__ == '__main__':
+    main()